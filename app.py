@@ -1,37 +1,60 @@
 import streamlit as st
-import pandas as pd
 import time
 from datetime import datetime
 from pytz import timezone
-import firebase_admin
-from firebase_admin import credentials, firestore
 import json
 import tempfile
 import re
 import os
 import bcrypt
-import matplotlib.pyplot as plt
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
+from lazy_imports import lazy_import
+from static_assets import asset_url, inject_css
+from warmup import start_warmup
+from content_source import local_file_cache, local_first_source, repo_url
+from cache_registry import budget_mb
+from perf_metrics import page_timer, step, timed_step
+from firestore_trace import trace_client
+import fake_firestore
+from diagnostics import render_diagnostics
+from session_memory import track_session
+from result_rollups import create_if_absent, record_result, user_rollup_id
+
+# --- 重いモジュールは使うページで初めて読み込む (ログインページを軽くするため) ---
+pd = lazy_import("pandas")
+plt = lazy_import("matplotlib.pyplot")
+firebase_admin = lazy_import("firebase_admin")
+credentials = lazy_import("firebase_admin.credentials")
+# FIRESTORE_BACKEND=fake のときはインメモリの Firestore を使う (オフラインでの確認・ベンチマーク用)
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
 
 # --- 定数設定 ---
 GITHUB_DATA_URL = "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/data.csv"
 HEADER_IMAGE_URL = "https://github.com/boost-ogawa/english-booster/blob/main/English%20Booster_header.jpg?raw=true"
+HEADER_IMAGE_PATH = "English Booster_header.jpg"
+GITHUB_USER_CSV = "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/user.csv"
+VIDEOS_PATH = "videos.csv"
 
 # --- Firebaseの初期化 ---
-firebase_creds_dict = dict(st.secrets["firebase"])
-with tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".json") as f:
-    json.dump(firebase_creds_dict, f)
-    f.flush()
-    cred = credentials.Certificate(f.name)
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    os.unlink(f.name)
-db = firestore.client()
+@st.cache_resource
+def init_firestore():
+    """Firestoreクライアントを一度だけ初期化する (最初にFirestoreを使うページで呼ばれる)"""
+    if fake_firestore.enabled():
+        return trace_client(firestore.client())
+    firebase_creds_dict = dict(st.secrets["firebase"])
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".json") as f:
+        json.dump(firebase_creds_dict, f)
+        f.flush()
+        cred = credentials.Certificate(f.name)
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(cred)
+        os.unlink(f.name)
+    return trace_client(firestore.client())
 
 # --- Firestoreから設定を読み込む関数 ---
+@timed_step("firestore_read")
 def load_config():
     try:
+        db = init_firestore()
         doc_ref = db.collection("settings").document("app_config")
         doc = doc_ref.get()
         if doc.exists:
@@ -43,8 +66,10 @@ def load_config():
         return {}
 
 # --- Firestoreに設定を保存する関数 ---
+@timed_step("firestore_write")
 def save_config(fixed_row_index):
     try:
+        db = init_firestore()
         doc_ref = db.collection("settings").document("app_config")
         doc_ref.set({"fixed_row_index": fixed_row_index})
         print(f"設定を保存しました: fixed_row_index = {fixed_row_index}")
@@ -52,25 +77,96 @@ def save_config(fixed_row_index):
     except Exception as e:
         st.error(f"設定の保存に失敗しました: {e}")
 
+# --- 生徒ごとのWPM記録 (wpm_history/{nickname}) ---
+# 各月初回の結果ごとに entries 配列へ {timestamp, wpm, correct_answers, material_id} を追加するだけのドキュメントで、
+# 過去の結果の表・グラフは 1 回の読み込みで作れる。読み込んだ記録はセッションに持ち、保存時に追記する。
+# (ArrayUnion は同じ値を 1 つにまとめるため、列ごとの配列ではなく時刻を含む記録の配列にしている)
+WPM_HISTORY_COLLECTION = "wpm_history"
+
+@timed_step("firestore_read")
+def load_wpm_history(nickname):
+    try:
+        db = init_firestore()
+        doc = db.collection(WPM_HISTORY_COLLECTION).document(nickname).get()
+        return list(doc.to_dict().get("entries", [])) if doc.exists else []
+    except Exception as e:
+        print(f"WPM記録の読み込みに失敗しました: {e}")
+        return []
+
 # --- Firestoreに結果を保存する関数 ---
+# results のドキュメント ID は (ニックネーム, 年月, 教材ID) で決まり、create() で「なければ作る」。
+# その月の 2 回目以降の測定は、同じドキュメントの practice 配列 (新しい PRACTICE_LIMIT 件) に追加する。
+# 読み取りと書き込みを 1 つのトランザクションで行うので、同時に保存しても記録は消えず、配列は上限を超えない。
+# WPM記録と教材完了履歴を更新するのは各月初回の結果だけ。月別集計 (result_rollups) には練習も含めて加える。
+RESULTS_COLLECTION = "results"
+PRACTICE_LIMIT = 20
+
+def result_document_id(nickname, month, material_id):
+    return f"{nickname}_{month}_{material_id}".replace("/", "-")
+
+def _append_practice(transaction, doc_ref, practice_entry):
+    doc = doc_ref.get(transaction=transaction)
+    if not doc.exists:
+        return False
+    practice = list(doc.to_dict().get("practice", []))
+    transaction.update(doc_ref, {
+        "practice": (practice + [practice_entry])[-PRACTICE_LIMIT:],
+        "practice_count": firestore.Increment(1),
+        "updated_at": firestore.SERVER_TIMESTAMP
+    })
+    return True
+
+def save_practice(db, doc_ref, practice_entry):
+    """practice に追加する。結果のドキュメントがなければ (消されていた) 何もせずに False を返す"""
+    return firestore.transactional(_append_practice)(db.transaction(), doc_ref, practice_entry)
+
+@timed_step("firestore_write")
 def save_results(wpm, correct_answers, material_id, nickname):
     jst = timezone('Asia/Tokyo')
-    timestamp = datetime.now(jst).isoformat()
+    now = datetime.now(jst)
+    timestamp = now.isoformat()
+    month = now.strftime("%Y-%m")
     result_data = {
         "nickname": nickname,
         "timestamp": timestamp,
+        "month": month,
         "material_id": material_id,
         "wpm": round(wpm, 1),
-        "correct_answers": correct_answers
+        "correct_answers": correct_answers,
+        "updated_at": firestore.SERVER_TIMESTAMP
     }
+    history_entry = {key: result_data[key] for key in ("timestamp", "wpm", "correct_answers", "material_id")}
+    doc_id = result_document_id(nickname, month, material_id)
+    # このセッションですでに保存した月・教材 (と月別集計) は、create() を試さずに練習の記録 (と update()) へ回す
+    recorded = st.session_state.get("recorded_results", [])
+    rollup_id = user_rollup_id("english", now, nickname)
     try:
-        db.collection("results").add(result_data)
-        print("結果が保存されました")
-        user_profile_ref = db.collection("user_profiles").document(nickname)
-        user_profile_ref.update({
-            "watched_materials": firestore.ArrayUnion([material_id])
-        })
-        print(f"ユーザー {nickname} の教材完了履歴が更新されました: {material_id}")
+        db = init_firestore()
+        result_ref = db.collection(RESULTS_COLLECTION).document(doc_id)
+        created = doc_id not in recorded and create_if_absent(result_ref, result_data)
+        practice_entry = {key: result_data[key] for key in ("timestamp", "wpm", "correct_answers")}
+        if not created and not save_practice(db, result_ref, practice_entry):
+            created = create_if_absent(result_ref, result_data) # 保存済みのはずの結果が消されていた
+        if created:
+            print("結果が保存されました")
+            db.collection(WPM_HISTORY_COLLECTION).document(nickname).set({
+                "nickname": nickname,
+                "entries": firestore.ArrayUnion([history_entry]),
+                "updated_at": firestore.SERVER_TIMESTAMP
+            }, merge=True)
+            if st.session_state.get("wpm_history") is not None:
+                st.session_state.wpm_history = st.session_state.wpm_history + [history_entry]
+            user_profile_ref = db.collection("user_profiles").document(nickname)
+            user_profile_ref.update({
+                "watched_materials": firestore.ArrayUnion([material_id])
+            })
+            print(f"ユーザー {nickname} の教材完了履歴が更新されました: {material_id}")
+        else:
+            print(f"{month} の結果は保存済みのため、練習の記録に追加しました")
+        recorded_now = [doc_id]
+        if record_result(db, "english", nickname, now, wpm, correct_answers, 2, known_user=rollup_id in recorded):
+            recorded_now.append(rollup_id)
+        st.session_state.recorded_results = recorded + [i for i in recorded_now if i not in recorded]
     except Exception as e:
         st.error(f"結果の保存に失敗しました: {e}")
 
@@ -78,39 +174,7 @@ def save_results(wpm, correct_answers, material_id, nickname):
 st.set_page_config(page_title="Speed Reading App", layout="wide", initial_sidebar_state="collapsed")
 
 # --- スタイル設定 ---
-st.markdown(
-    """
-    <style>
-    .stApp {
-        background-color: #000D36;
-        color: #ffffff;
-    }
-    .custom-paragraph {
-        font-family: Georgia, serif;
-        line-height: 1.8;
-        font-size: 1.5rem;
-    }
-    div.stButton > button:first-child {
-        background-color: #28a745;
-        color: white;
-        font-weight: bold;
-        border-radius: 8px;
-        padding: 20px 40px;
-        font-size: 1.8rem;
-    }
-    div.stButton > button:first-child:hover {
-        background-color: #218838;
-    }
-    div[data-testid="stRadio"] label p {
-        font-size: 1.2rem !important;
-        line-height: 1.4 !important;
-        color: #FFFFFF !important;
-        margin-bottom: 0.3rem !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+inject_css("assets/app.css")
 
 # -----------------------------------------------------------
 # 画像表示の修正 (iOS互換性を高めるために st.markdown + <img> を使用)
@@ -120,17 +184,22 @@ st.markdown(
 st.markdown(
     f"""
     <div style='text-align: center;'>
-        <img src='{HEADER_IMAGE_URL}' style='max-width: 100%; height: auto; border-radius: 8px;'>
+        <img src='{asset_url(HEADER_IMAGE_PATH, repo_url(HEADER_IMAGE_URL))}' style='max-width: 100%; height: auto; border-radius: 8px;'>
     </div>
     """,
     unsafe_allow_html=True
 )
 
+# --- 教材・WPM記録の読み込み元 ---
+# 同梱の data.csv / user.csv を先に使い、GitHub上の更新は裏で確認して差し替える
+MATERIAL_SOURCE = local_first_source("data.csv", GITHUB_DATA_URL)
+USER_WPM_SOURCE = local_first_source("user.csv", GITHUB_USER_CSV)
+
 # --- データ読み込み関数 ---
-@st.cache_data(ttl=3600)
-def load_material(github_url, row_index):
+@timed_step("content_load")
+def load_material(source, row_index):
     try:
-        df = pd.read_csv(github_url)
+        df = source.get()
         if 0 <= row_index < len(df):
             material_data = df.iloc[row_index].to_dict()
             material_data['material_id_for_save'] = str(row_index)
@@ -139,15 +208,60 @@ def load_material(github_url, row_index):
             st.error(f"指定された行番号 ({row_index + 1}) はファイルに存在しません。")
             return None
     except Exception as e:
-        st.error(f"GitHubからのデータ読み込みに失敗しました: {e}")
+        st.error(f"教材データの読み込みに失敗しました: {e}")
         return None
 
+# --- 動画一覧を読み込む関数 (videos.csv が変わったときだけ読み直す。全セッション共有のため書き換えないこと) ---
+APP_FILES = local_file_cache("app_files", max_bytes=budget_mb(2))
+
+def load_videos():
+    def build(df):
+        video_data = df.copy()
+        video_data["date"] = pd.to_datetime(video_data["date"])
+        return video_data
+    return APP_FILES.derive(VIDEOS_PATH, "videos", build)
+
+# --- 移行前のWPM記録 (手動で更新していた user.csv) を読み込む関数 ---
+def load_user_wpm():
+    return USER_WPM_SOURCE.get()
+
+# --- 過去のWPM記録 (各月の初回の結果) を日付の昇順で返す関数 ---
+def user_wpm_history(nickname):
+    """Firestore の記録 (セッションで 1 回だけ読み込む) と user.csv の記録を合わせ、月ごとに最初の測定を残す"""
+    if st.session_state.get("wpm_history") is None:
+        st.session_state.wpm_history = load_wpm_history(nickname)
+
+    df_wpm = load_user_wpm()
+    df_legacy = df_wpm[df_wpm["nickname"] == nickname][["date", "wpm"]]
+    df_legacy = df_legacy.assign(date=pd.to_datetime(df_legacy["date"], errors='coerce'))
+
+    df_live = pd.DataFrame(st.session_state.wpm_history, columns=["timestamp", "wpm"])
+    df_live = pd.DataFrame({
+        "date": pd.to_datetime(df_live["timestamp"], format="ISO8601", errors='coerce', utc=True)
+                  .dt.tz_convert('Asia/Tokyo').dt.tz_localize(None),
+        "wpm": df_live["wpm"],
+    })
+
+    df_user = pd.concat([df_legacy, df_live], ignore_index=True).dropna(subset=["date"])
+    df_user = df_user.sort_values("date", ascending=True)
+    df_user = df_user.groupby(df_user["date"].dt.to_period("M"), sort=False).head(1)
+    return df_user.reset_index(drop=True)
+
+# --- 起動時ウォームアップ (プロセスで一度だけ、ログイン入力中に裏で実行) ---
+def warm_material():
+    config = load_config()
+    load_material(MATERIAL_SOURCE, config.get("fixed_row_index", 2))
+
+start_warmup({
+    "firestore": init_firestore,
+    "data.csv": warm_material,
+    "videos.csv": load_videos,
+    "user.csv": load_user_wpm,
+})
+
 # --- セッション変数の初期化 ---
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
-if "fixed_row_index" not in st.session_state:
-    config = load_config()
-    st.session_state.fixed_row_index = config.get("fixed_row_index", 2)
 if "page" not in st.session_state:
     st.session_state.page = 0
 if "start_time" not in st.session_state:
@@ -173,7 +287,12 @@ def go_to_main_page(nickname, user_id, is_admin):
     st.session_state.user_id = user_id.strip()
     st.session_state.is_admin = is_admin
     st.session_state.logged_in = True
+    st.session_state.pop("wpm_history", None)
     st.session_state.page = 1
+    # 表示行番号の設定はログイン後に読み込む (ログインページでFirestoreを使わないため)
+    if "fixed_row_index" not in st.session_state:
+        config = load_config()
+        st.session_state.fixed_row_index = config.get("fixed_row_index", 2)
     time.sleep(0.1)
     st.rerun()
 # --- YouTube URLを埋め込み形式に正規化する関数 ---
@@ -202,414 +321,413 @@ def start_reading(page_number):
     st.session_state.start_time = time.time()
     st.session_state.page = page_number
 
-# --- 認証ページ（page 0） ---
-if st.session_state.page == 0:
-    if st.session_state.logged_in:
-        st.session_state.page = 1
-        st.rerun()
-        st.stop()
-
-    st.title("ニックネームとIDを入力してください")
-    col1, _ = st.columns(2)
-    with col1:
-        nickname = st.text_input("ニックネーム (半角英数字、_、-、半角スペース可)", key="nickname_input", value=st.session_state.get("nickname", ""))
-        user_id_input = st.text_input("パスワード（お伝えしているパスワードを入力してください。半角英数字)", type="password", key="user_id_input", value="")
-        if st.button("次へ"):
-            if not nickname:
-                st.warning("ニックネームを入力してください。")
-            elif not user_id_input:
-                st.warning("IDを入力してください。")
-            elif not re.fullmatch(r'[0-9a-zA-Z_\- ]+', nickname):
-                st.error("ニックネームは半角英数字、_、-、半角スペースで入力してください。")
-            elif not re.fullmatch(r'[0-9a-zA-Z]+', user_id_input):
-                st.error("IDは半角英数字で入力してください。")
-            else:
-                admin_nickname = st.secrets.get("ADMIN_USERNAME")
-                admin_hashed_password = st.secrets.get("ADMIN_PASSWORD")
-                user_entered_password_bytes = user_id_input.strip().encode('utf-8')
-                authenticated = False
-                is_admin_user = False
-                if nickname.strip() == admin_nickname:
-                    if admin_hashed_password and bcrypt.checkpw(user_entered_password_bytes, admin_hashed_password.encode('utf-8')):
-                        authenticated = True
-                        is_admin_user = True
-                if not authenticated:
-                    users_from_secrets = st.secrets.get("users", [])
-                    for user_info in users_from_secrets:
-                        if nickname.strip() == user_info.get("nickname"):
-                            stored_hashed_id = user_info.get("user_id")
-                            if stored_hashed_id and bcrypt.checkpw(user_entered_password_bytes, stored_hashed_id.encode('utf-8')):
-                                authenticated = True
-                                is_admin_user = False
-                                break
-                if authenticated:
-                    go_to_main_page(nickname, user_id_input, is_admin_user)
-                else:
-                    st.error("ニックネームまたはIDが正しくありません。")
-
-# --- 認証後のメインメニューページ（page 1） ---
-elif st.session_state.page == 1:
-    # -----------------------------------------------------------
-    # 1. ヘッダーとログアウトボタンの配置 (3カラムに変更)
-    # -----------------------------------------------------------
-    col1_header, col2_header, col3_header = st.columns([0.68, 0.12, 0.2])
-
-    with col1_header:
-        st.title(f"こんにちは、{st.session_state.nickname}さん！")
-
-    with col2_header:
-        # STOPWATCHリンクを中央カラムに配置
-        stopwatch_url = "https://english-booster-mlzrmgb7mftcynzupjqkyn.streamlit.app/"
-        st.markdown(f"[⏱️STOPWATCH]({stopwatch_url})", unsafe_allow_html=True)
-        st.write("(別ウィンドウ)")
-    with col3_header:
-        # ログアウトボタンを右端カラムに配置
-        if st.button("ログアウト"):
-            st.session_state.clear()
+# --- セッションの登録 (診断ページのメモリ集計・アイドルセッションの整理用) ---
+track_session("app")
+
+# --- ページ描画 ---
+def render_page():
+    # --- 認証ページ（page 0） ---
+    if st.session_state.page == 0:
+        if st.session_state.logged_in:
+            st.session_state.page = 1
             st.rerun()
-    # -----------------------------------------------------------
-    # 2. 管理者設定 (既存のロジックを維持)
-    # -----------------------------------------------------------
-    if st.session_state.is_admin:
-        st.subheader("管理者設定")
-        manual_index = st.number_input("表示する行番号 (0から始まる整数)", 0, value=st.session_state.get("fixed_row_index", 0), key="admin_fixed_row_index")
-        if st.button("表示行番号を保存", key="save_fixed_row_index"):
-            st.session_state.fixed_row_index = manual_index
-            save_config(manual_index)
-        st.markdown("---")
-        st.subheader("ユーザー登録日設定 (管理者のみ)")
-        target_nickname = st.text_input("登録日を設定するユーザーのニックネーム", key="target_nickname_input")
-        today_jst_date = datetime.now(timezone('Asia/Tokyo')).date()
-        selected_enrollment_date = st.date_input("登録日を選択", value=today_jst_date, key="enrollment_date_picker")
-        if st.button("登録日を設定", key="set_enrollment_date_button"):
-            if target_nickname:
-                target_user_profile_ref = db.collection("user_profiles").document(target_nickname)
-                enrollment_date_str = selected_enrollment_date.strftime('%Y-%m-%d')
-                target_user_profile_ref.set(
-                    {"enrollment_date": enrollment_date_str},
-                    merge=True
-                )
-                st.success(f"ユーザー **{target_nickname}** の登録日を **{enrollment_date_str}** に設定しました。")
-            else:
-                st.warning("登録日を設定するユーザーのニックネームを入力してください。")
+            st.stop()
+
+        st.title("ニックネームとIDを入力してください")
+        col1, _ = st.columns(2)
+        with col1:
+            nickname = st.text_input("ニックネーム (半角英数字、_、-、半角スペース可)", key="nickname_input", value=st.session_state.get("nickname", ""))
+            user_id_input = st.text_input("パスワード（お伝えしているパスワードを入力してください。半角英数字)", type="password", key="user_id_input", value="")
+            if st.button("次へ"):
+                if not nickname:
+                    st.warning("ニックネームを入力してください。")
+                elif not user_id_input:
+                    st.warning("IDを入力してください。")
+                elif not re.fullmatch(r'[0-9a-zA-Z_\- ]+', nickname):
+                    st.error("ニックネームは半角英数字、_、-、半角スペースで入力してください。")
+                elif not re.fullmatch(r'[0-9a-zA-Z]+', user_id_input):
+                    st.error("IDは半角英数字で入力してください。")
+                else:
+                    admin_nickname = st.secrets.get("ADMIN_USERNAME")
+                    admin_hashed_password = st.secrets.get("ADMIN_PASSWORD")
+                    user_entered_password_bytes = user_id_input.strip().encode('utf-8')
+                    authenticated = False
+                    is_admin_user = False
+                    if nickname.strip() == admin_nickname:
+                        if admin_hashed_password and bcrypt.checkpw(user_entered_password_bytes, admin_hashed_password.encode('utf-8')):
+                            authenticated = True
+                            is_admin_user = True
+                    if not authenticated:
+                        users_from_secrets = st.secrets.get("users", [])
+                        for user_info in users_from_secrets:
+                            if nickname.strip() == user_info.get("nickname"):
+                                stored_hashed_id = user_info.get("user_id")
+                                if stored_hashed_id and bcrypt.checkpw(user_entered_password_bytes, stored_hashed_id.encode('utf-8')):
+                                    authenticated = True
+                                    is_admin_user = False
+                                    break
+                    if authenticated:
+                        go_to_main_page(nickname, user_id_input, is_admin_user)
+                    else:
+                        st.error("ニックネームまたはIDが正しくありません。")
+
+    # --- 認証後のメインメニューページ（page 1） ---
+    elif st.session_state.page == 1:
+        # -----------------------------------------------------------
+        # 1. ヘッダーとログアウトボタンの配置 (3カラムに変更)
+        # -----------------------------------------------------------
+        col1_header, col2_header, col3_header = st.columns([0.68, 0.12, 0.2])
+
+        with col1_header:
+            st.title(f"こんにちは、{st.session_state.nickname}さん！")
+
+        with col2_header:
+            # STOPWATCHリンクを中央カラムに配置
+            stopwatch_url = "https://english-booster-mlzrmgb7mftcynzupjqkyn.streamlit.app/"
+            st.markdown(f"[⏱️STOPWATCH]({stopwatch_url})", unsafe_allow_html=True)
+            st.write("(別ウィンドウ)")
+        with col3_header:
+            # ログアウトボタンを右端カラムに配置
+            if st.button("ログアウト"):
+                st.session_state.clear()
+                st.rerun()
+        # -----------------------------------------------------------
+        # 2. 管理者設定 (既存のロジックを維持)
+        # -----------------------------------------------------------
+        if st.session_state.is_admin:
+            st.subheader("管理者設定")
+            manual_index = st.number_input("表示する行番号 (0から始まる整数)", 0, value=st.session_state.get("fixed_row_index", 0), key="admin_fixed_row_index")
+            if st.button("表示行番号を保存", key="save_fixed_row_index"):
+                st.session_state.fixed_row_index = manual_index
+                save_config(manual_index)
+            st.markdown("---")
+            st.subheader("ユーザー登録日設定 (管理者のみ)")
+            target_nickname = st.text_input("登録日を設定するユーザーのニックネーム", key="target_nickname_input")
+            today_jst_date = datetime.now(timezone('Asia/Tokyo')).date()
+            selected_enrollment_date = st.date_input("登録日を選択", value=today_jst_date, key="enrollment_date_picker")
+            if st.button("登録日を設定", key="set_enrollment_date_button"):
+                if target_nickname:
+                    db = init_firestore()
+                    target_user_profile_ref = db.collection("user_profiles").document(target_nickname)
+                    enrollment_date_str = selected_enrollment_date.strftime('%Y-%m-%d')
+                    target_user_profile_ref.set(
+                        {"enrollment_date": enrollment_date_str},
+                        merge=True
+                    )
+                    st.success(f"ユーザー **{target_nickname}** の登録日を **{enrollment_date_str}** に設定しました。")
+                else:
+                    st.warning("登録日を設定するユーザーのニックネームを入力してください。")
+            st.markdown("---")
+            if st.button("🩺 診断ページ", key="open_diagnostics"):
+                st.session_state.page = 99
+                st.rerun()
     
-    # -----------------------------------------------------------
-    # 3. 動画と測定結果の統合UI (新しい3カラム構成)
-    # -----------------------------------------------------------
+        # -----------------------------------------------------------
+        # 3. 動画と測定結果の統合UI (新しい3カラム構成)
+        # -----------------------------------------------------------
     
-    # --- ユーザー情報と視聴可能日数の計算 ---
-    user_profile_ref = db.collection("user_profiles").document(st.session_state.nickname)
-    user_profile_doc = user_profile_ref.get()
-    user_profile_data = user_profile_doc.to_dict() if user_profile_doc.exists else {}
-    enrollment_date_str = user_profile_data.get("enrollment_date")
-
-    st.markdown("---") # 管理者設定とメインコンテンツの間に区切りを追加
-
-    if enrollment_date_str is None:
-        st.info("あなたの動画視聴開始日はまだ設定されていません。管理者に連絡してください。")
-    else:
-        today_jst = datetime.now(timezone('Asia/Tokyo')).date()
-        enrollment_dt = datetime.strptime(enrollment_date_str, '%Y-%m-%d').date()
-        days_since_enrollment = (today_jst - enrollment_dt).days + 1
+        # --- ユーザー情報と視聴可能日数の計算 ---
+        db = init_firestore()
+        user_profile_ref = db.collection("user_profiles").document(st.session_state.nickname)
+        with step("firestore_read"):
+            user_profile_doc = user_profile_ref.get()
+        user_profile_data = user_profile_doc.to_dict() if user_profile_doc.exists else {}
+        enrollment_date_str = user_profile_data.get("enrollment_date")
+
+        st.markdown("---") # 管理者設定とメインコンテンツの間に区切りを追加
+
+        if enrollment_date_str is None:
+            st.info("あなたの動画視聴開始日はまだ設定されていません。管理者に連絡してください。")
+        else:
+            today_jst = datetime.now(timezone('Asia/Tokyo')).date()
+            enrollment_dt = datetime.strptime(enrollment_date_str, '%Y-%m-%d').date()
+            days_since_enrollment = (today_jst - enrollment_dt).days + 1
         
-        # ★★★ 新しい3カラム定義 ★★★
-        # [動画選択リスト(小)] : [動画埋め込み(大)] : [スピード測定/情報(中)]
-        col_video_list, col_video_main, col_speed_test = st.columns([0.25, 0.5, 0.25])
+            # ★★★ 新しい3カラム定義 ★★★
+            # [動画選択リスト(小)] : [動画埋め込み(大)] : [スピード測定/情報(中)]
+            col_video_list, col_video_main, col_speed_test = st.columns([0.25, 0.5, 0.25])
 
-        try:
-            video_data = pd.read_csv("videos.csv")
-            video_data["date"] = pd.to_datetime(video_data["date"])
+            try:
+                video_data = load_videos()
             
-            # 視聴可能な動画のみにフィルタリング
-            available_videos = video_data[video_data["release_day"] <= days_since_enrollment] \
-                                .sort_values(by="release_day", ascending=False)
+                # 視聴可能な動画のみにフィルタリング
+                available_videos = video_data[video_data["release_day"] <= days_since_enrollment] \
+                                    .sort_values(by="release_day", ascending=False)
             
-            if available_videos.empty:
-                with col_video_main:
-                    st.header("授業動画")
-                    st.info("現在、表示できる動画はありません。")
-            else:
-                # --- 左カラム (動画選択リスト) ---
-                with col_video_list:
-                    st.header("動画一覧")
-                    st.markdown("""
-                        <style>
-                        /* st.radioの選択肢のテキスト部分（pタグに相当するdiv）のフォントサイズを小さくする */
-                        /* サイズは0.85remに設定。必要に応じて0.8remなどに変更してください。 */
-                        div[data-testid="stRadio"] label > div > div {
-                            font-size: 0.85rem; 
-                        }
-                        </style>
-                    """, unsafe_allow_html=True)
+                if available_videos.empty:
+                    with col_video_main:
+                        st.header("授業動画")
+                        st.info("現在、表示できる動画はありません。")
+                else:
+                    # --- 左カラム (動画選択リスト) ---
+                    with col_video_list:
+                        st.header("動画一覧")
+                        inject_css("assets/video_list.css")
                     
-                    # 動画タイトルをリスト化
-                    video_options = available_videos["title"].tolist()
+                        # 動画タイトルをリスト化
+                        video_options = available_videos["title"].tolist()
                     
-                    # ユーザーに動画を選択させる
+                        # ユーザーに動画を選択させる
                     
-                    # ★★★ 修正箇所: st.container(height=300) を使用し、ネイティブにスクロールを有効化 ★★★
+                        # ★★★ 修正箇所: st.container(height=300) を使用し、ネイティブにスクロールを有効化 ★★★
                     
-                    # 1. ラベルをコンテナの外に配置
-                    st.write("視聴する動画を選択：") 
+                        # 1. ラベルをコンテナの外に配置
+                        st.write("視聴する動画を選択：") 
                     
-                    # 2. 高さ300pxのスクロール可能なコンテナを作成
-                    # コンテナ内のコンテンツが溢れた場合、自動的にスクロールバーが表示されます
-                    with st.container(height=300):
-                        # 3. st.radio をコンテナ内に配置し、ラベルは非表示にする
-                        selected_title = st.radio(
-                            "動画選択リスト", # ラベル自体は必須だが、非表示にする
-                            video_options,
-                            key="video_radio",
-                            label_visibility="collapsed" # ラベルを非表示
-                        )
+                        # 2. 高さ300pxのスクロール可能なコンテナを作成
+                        # コンテナ内のコンテンツが溢れた場合、自動的にスクロールバーが表示されます
+                        with st.container(height=300):
+                            # 3. st.radio をコンテナ内に配置し、ラベルは非表示にする
+                            selected_title = st.radio(
+                                "動画選択リスト", # ラベル自体は必須だが、非表示にする
+                                video_options,
+                                key="video_radio",
+                                label_visibility="collapsed" # ラベルを非表示
+                            )
                     
-                    # -----------------------------------------------------------------
+                        # -----------------------------------------------------------------
                     
-                    # 選択された動画のデータ行を取得
-                    # st.radio も st.selectbox と同じく選択値を返すため、以下のロジックは変更不要
-                    selected_row = available_videos[available_videos["title"] == selected_title].iloc[0]
+                        # 選択された動画のデータ行を取得
+                        # st.radio も st.selectbox と同じく選択値を返すため、以下のロジックは変更不要
+                        selected_row = available_videos[available_videos["title"] == selected_title].iloc[0]
 
 
-                # --- 中央カラム (動画埋め込み) ---
-                with col_video_main:
-                    st.header(selected_row["title"])
-                    st.write(selected_row["description"])
+                    # --- 中央カラム (動画埋め込み) ---
+                    with col_video_main:
+                        st.header(selected_row["title"])
+                        st.write(selected_row["description"])
                    
-                    # 埋め込み動画（メイン）
-                    st.video(normalize_youtube_url(selected_row["url"]))
-                    # st.write(f"**公開日:** {selected_row['date'].strftime('%Y年%m月%d日')}")
-
-                # --- 右カラム (情報/スピード測定) ---
-                with col_speed_test:
-                    st.header("スピード測定")
-                    st.write("ボタンを押して英文を読みましょう")
+                        # 埋め込み動画（メイン）
+                        st.video(normalize_youtube_url(selected_row["url"]))
+                        # st.write(f"**公開日:** {selected_row['date'].strftime('%Y年%m月%d日')}")
+
+                    # --- 右カラム (情報/スピード測定) ---
+                    with col_speed_test:
+                        st.header("スピード測定")
+                        st.write("ボタンを押して英文を読みましょう")
                     
-                    if st.button("スピード測定開始", key="start_reading_button", use_container_width=True, on_click=start_reading, args=(2,)):
-                        pass
-                    st.write("　※　文章は毎月更新されます")
-                    st.write("　※　測定は何回でもできます")
-                    st.write("　※　各月初回の結果が保存されます")
-
-                    st.markdown("---")
-                    st.subheader("過去の結果")
-
-                    try:
-                        # GitHub 上の CSV を読み込む
-                        GITHUB_USER_CSV = "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/user.csv"
-                        df_wpm = pd.read_csv(GITHUB_USER_CSV)
-                        df_user = df_wpm[df_wpm["nickname"] == st.session_state.nickname]
-
-                        if not df_user.empty:
-                            # 日付順に降順ソート（最新が上）
-                            df_user["date"] = pd.to_datetime(df_user["date"])
-                            df_user = df_user.sort_values("date", ascending=False)
-
-                            # 表示列を WPM グラフ用に合わせる
-                            df_display = df_user[["date", "wpm"]]
-                            df_display = df_display.rename(columns={
-                                "date": "測定年月日",
-                                "wpm": "WPM"
-                            })
-                            # 日付を文字列に変換
-                            df_display["測定年月日"] = df_display["測定年月日"].dt.strftime('%Y/%m/%d')
-                            st.dataframe(df_display.reset_index(drop=True), hide_index=True)
-                        else:
-                            st.info("過去の結果データはまだありません。")
-                    except FileNotFoundError:
-                        st.error("user.csv が見つかりません。")
-                    except Exception as e:
-                        st.error(f"結果表表示中にエラーが発生しました: {e}")
+                        if st.button("スピード測定開始", key="start_reading_button", use_container_width=True, on_click=start_reading, args=(2,)):
+                            pass
+                        st.write("　※　文章は毎月更新されます")
+                        st.write("　※　測定は何回でもできます")
+                        st.write("　※　各月初回の結果が保存されます")
+
+                        st.markdown("---")
+                        st.subheader("過去の結果")
+
+                        try:
+                            # Firestore のWPM記録 (と移行前の user.csv) を読み込む
+                            df_user = user_wpm_history(st.session_state.nickname)
+
+                            if not df_user.empty:
+                                # 日付順に降順ソート（最新が上）
+                                df_user = df_user.sort_values("date", ascending=False)
+
+                                # 表示列を WPM グラフ用に合わせる
+                                df_display = df_user[["date", "wpm"]]
+                                df_display = df_display.rename(columns={
+                                    "date": "測定年月日",
+                                    "wpm": "WPM"
+                                })
+                                # 日付を文字列に変換
+                                df_display["測定年月日"] = df_display["測定年月日"].dt.strftime('%Y/%m/%d')
+                                st.dataframe(df_display.reset_index(drop=True), hide_index=True)
+                            else:
+                                st.info("過去の結果データはまだありません。")
+                        except Exception as e:
+                            st.error(f"結果表表示中にエラーが発生しました: {e}")
                     
-                    st.markdown("---")
-
-        except FileNotFoundError:
-            st.error("動画情報ファイル (videos.csv) が見つかりません。")
-        except Exception as e:
-            st.error(f"動画情報の読み込み中にエラーが発生しました: {e}")
-
-    # -----------------------------------------------------------
-    # 4. フッター (既存のロジックを維持)
-    # -----------------------------------------------------------
-    st.markdown("© 2025 英文速解English Booster", unsafe_allow_html=True)
-
-# --- 英文読解ページ（page 2） ---
-elif st.session_state.page == 2:
-    data = load_material(GITHUB_DATA_URL, st.session_state.fixed_row_index)
-    if data is None:
-        st.stop()
-    st.info("読み終わったらStopボタンを押しましょう")
-    col1, _ = st.columns([2, 1])
-    with col1:
-        st.markdown(
-            f"""
-            <div class="custom-paragraph">
-            {data['main']}
-            </div>
-            """, unsafe_allow_html=True
-        )
-    if st.button("Stop"):
-        st.session_state.stop_time = time.time()
-        st.session_state.page = 3
-        st.rerun()
-
-# --- 問題解答ページ（page 3） ---
-elif st.session_state.page == 3:
-    data = load_material(GITHUB_DATA_URL, st.session_state.fixed_row_index)
-    if data is None:
-        st.stop()
-    st.info("問題を解いてSubmitボタンを押しましょう")
-    col1, col2 = st.columns([2, 1])
-    with col1:
-        st.markdown(f'<div class="custom-paragraph">{data["main"]}</div>', unsafe_allow_html=True)
-    with col2:
-        st.subheader("Questions")
-        q1_choice = st.radio(data["Q1"], [data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']], key="q1",
-                             index=([data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']].index(st.session_state.q1)
-                                    if st.session_state.get('q1') in [data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']] else None))
-        q2_choice = st.radio(data["Q2"], [data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']], key="q2",
-                             index=([data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']].index(st.session_state.q2)
-                                    if st.session_state.get('q2') in [data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']] else None))
-    if st.button("Submit"):
-        if st.session_state.q1 is not None and st.session_state.q2 is not None:
-            st.session_state.page = 4
+                        st.markdown("---")
+
+            except FileNotFoundError:
+                st.error("動画情報ファイル (videos.csv) が見つかりません。")
+            except Exception as e:
+                st.error(f"動画情報の読み込み中にエラーが発生しました: {e}")
+
+        # -----------------------------------------------------------
+        # 4. フッター (既存のロジックを維持)
+        # -----------------------------------------------------------
+        st.markdown("© 2025 英文速解English Booster", unsafe_allow_html=True)
+
+    # --- 英文読解ページ（page 2） ---
+    elif st.session_state.page == 2:
+        data = load_material(MATERIAL_SOURCE, st.session_state.fixed_row_index)
+        if data is None:
+            st.stop()
+        st.info("読み終わったらStopボタンを押しましょう")
+        col1, _ = st.columns([2, 1])
+        with col1:
+            st.markdown(
+                f"""
+                <div class="custom-paragraph">
+                {data['main']}
+                </div>
+                """, unsafe_allow_html=True
+            )
+        if st.button("Stop"):
+            st.session_state.stop_time = time.time()
+            st.session_state.page = 3
             st.rerun()
-        else:
-            st.error("両方の質問に答えてください。")
-# --- 結果表示ページ（page 4） ---
-elif st.session_state.page == 4:
-    st.success("結果を記録しました。")
-    col1, col2 = st.columns([1, 2])
-
-    # --- 右カラム: WPM推移グラフ ---
-    with col2:
-        st.subheader(f"{st.session_state.nickname}さんのWPM推移（過去の結果）")
-
-        try:
-            GITHUB_USER_CSV = "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/user.csv"
-            df_wpm = pd.read_csv(GITHUB_USER_CSV)
-            df_user = df_wpm[df_wpm["nickname"] == st.session_state.nickname]
-
-            if not df_user.empty:
-                # ★★★ 修正箇所: 日付処理を改善し、時系列でソートを確実に行う ★★★
-                
-                # 1. 'date' 列をDatetime型に変換（エラーが発生する場合は 'coerce' で無効な値をNaTに）
-                df_user["date"] = pd.to_datetime(df_user["date"], errors='coerce')
-                
-                # 2. NaT（無効な日付）を削除
-                df_user = df_user.dropna(subset=["date"])
-                
-                # 3. 日付（Datetimeオブジェクト）で昇順ソート（古いものが左に来るように）
-                df_user = df_user.sort_values("date", ascending=True)
-
-                # 4. グラフ描画用に、X軸の表示形式を文字列に変換（ソート後に実施）
-                df_user["display_date"] = df_user["date"].dt.strftime('%Y/%m/%d')
-
-                # グラフ描画
-                fig, ax = plt.subplots(figsize=(8, 4))
-                # グラフのX軸には、ソートされた日付文字列（display_date）を使用
-                ax.plot(df_user["display_date"], df_user["wpm"], marker='o', linestyle='-')
-
-                # 縦軸固定
-                ax.set_ylim(0, 400)
-                ax.set_yticks(range(0, 401, 50))
-                ax.set_ylabel("WPM")
-                ax.set_xlabel("Measurement Date")
+
+    # --- 問題解答ページ（page 3） ---
+    elif st.session_state.page == 3:
+        data = load_material(MATERIAL_SOURCE, st.session_state.fixed_row_index)
+        if data is None:
+            st.stop()
+        st.info("問題を解いてSubmitボタンを押しましょう")
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.markdown(f'<div class="custom-paragraph">{data["main"]}</div>', unsafe_allow_html=True)
+        with col2:
+            st.subheader("Questions")
+            q1_choice = st.radio(data["Q1"], [data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']], key="q1",
+                                 index=([data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']].index(st.session_state.q1)
+                                        if st.session_state.get('q1') in [data['Q1A'], data['Q1B'], data['Q1C'], data['Q1D']] else None))
+            q2_choice = st.radio(data["Q2"], [data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']], key="q2",
+                                 index=([data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']].index(st.session_state.q2)
+                                        if st.session_state.get('q2') in [data['Q2A'], data['Q2B'], data['Q2C'], data['Q2D']] else None))
+        if st.button("Submit"):
+            if st.session_state.q1 is not None and st.session_state.q2 is not None:
+                st.session_state.page = 4
+                st.rerun()
+            else:
+                st.error("両方の質問に答えてください。")
+    # --- 結果表示ページ（page 4） ---
+    elif st.session_state.page == 4:
+        st.success("結果を記録しました。")
+        col1, col2 = st.columns([1, 2])
+
+        # --- 左カラム: 今回の結果表示 (保存してからグラフを描くため先に実行) ---
+        with col1:
+            data = load_material(MATERIAL_SOURCE, st.session_state.fixed_row_index)
+            if data is None:
+                st.stop()
+            st.subheader("Result")
+            correct_answers_to_store = 0
+            wpm = 0.0
+            if st.session_state.start_time and st.session_state.stop_time:
+                total_time = st.session_state.stop_time - st.session_state.start_time
+                word_count = len(data['main'].split())
+                wpm = (word_count / total_time) * 60
+                st.write(f"総単語数: {word_count} 語")
+                st.write(f"所要時間: {total_time:.2f} 秒")
+                st.write(f"単語数/分: **{wpm:.1f}** WPM")
+
+                # --- 判定と記録 ---
+                correct1 = st.session_state.q1 == data['A1']
+                correct2 = st.session_state.q2 == data['A2']
+
+                # 判定を固定しておく（訳ページ遷移時に一瞬Falseになるのを防ぐ）
+                st.session_state["final_correct1"] = correct1
+                st.session_state["final_correct2"] = correct2
+
+                st.write(f"Q1: {'✅ 正解' if correct1 else '❌ 不正解'}")
+                st.write(f"あなたの解答: {st.session_state.q1}")
+                st.write(f"正しい答え: {data['A1']}")
+
+                st.write(f"Q2: {'✅ 正解' if correct2 else '❌ 不正解'}")
+                st.write(f"あなたの解答: {st.session_state.q2}")
+                st.write(f"正しい答え: {data['A2']}")
+
+                correct_answers_to_store = int(correct1) + int(correct2)
+                if not st.session_state.submitted:
+                    material_id_to_save = data.get('material_id_for_save', str(st.session_state.fixed_row_index))
+                    save_results(wpm, correct_answers_to_store, material_id_to_save, st.session_state.nickname)
+                    st.session_state.submitted = True
+
+            if st.button("意味を確認"):
+                # 遷移時に判定結果を保持したままpage変更
+                st.session_state.page = 5
+                st.rerun()
+
+        # --- 右カラム: WPM推移グラフ ---
+        with col2:
+            st.subheader(f"{st.session_state.nickname}さんのWPM推移（過去の結果）")
+
+            try:
+                # 日付の昇順 (古いものが左)。左カラムで保存した今回の結果も含まれる
+                df_user = user_wpm_history(st.session_state.nickname)
+
+                if not df_user.empty:
+                    # グラフ描画用に、X軸の表示形式を文字列に変換
+                    df_user["display_date"] = df_user["date"].dt.strftime('%Y/%m/%d')
+
+                    # グラフ描画
+                    with step("chart_render"):
+                        fig, ax = plt.subplots(figsize=(8, 4))
+                        # グラフのX軸には、ソートされた日付文字列（display_date）を使用
+                        ax.plot(df_user["display_date"], df_user["wpm"], marker='o', linestyle='-')
+
+                        # 縦軸固定
+                        ax.set_ylim(0, 400)
+                        ax.set_yticks(range(0, 401, 50))
+                        ax.set_ylabel("WPM")
+                        ax.set_xlabel("Measurement Date")
                 
-                # X軸のラベルが重ならないように45度回転
-                plt.xticks(rotation=45)
-                # X軸の目盛りをデータポイントの数に応じて設定 (省略されるのを防ぐ)
-                ax.set_xticks(df_user["display_date"])
+                        # X軸のラベルが重ならないように45度回転
+                        plt.xticks(rotation=45)
+                        # X軸の目盛りをデータポイントの数に応じて設定 (省略されるのを防ぐ)
+                        ax.set_xticks(df_user["display_date"])
                 
-                plt.grid(axis='y', linestyle='--', alpha=0.7)
+                        plt.grid(axis='y', linestyle='--', alpha=0.7)
 
-                st.pyplot(fig)
-            else:
-                st.info("WPMデータがまだありません。")
-        except FileNotFoundError:
-            st.error("user.csv が見つかりません。")
-        except Exception as e:
-            st.error(f"WPMグラフ描画中にエラーが発生しました: {e}")
-
-    # --- 左カラム: 今回の結果表示 ---
-    with col1:
-        data = load_material(GITHUB_DATA_URL, st.session_state.fixed_row_index)
+                        st.pyplot(fig)
+                else:
+                    st.info("WPMデータがまだありません。")
+            except Exception as e:
+                st.error(f"WPMグラフ描画中にエラーが発生しました: {e}")
+
+
+    # --- 意味確認ページ（page 5） ---
+    elif st.session_state.page == 5:
+        data = load_material(MATERIAL_SOURCE, st.session_state.fixed_row_index)
         if data is None:
             st.stop()
-        st.subheader("Result")
-        correct_answers_to_store = 0
-        wpm = 0.0
-        if st.session_state.start_time and st.session_state.stop_time:
-            total_time = st.session_state.stop_time - st.session_state.start_time
-            word_count = len(data['main'].split())
-            wpm = (word_count / total_time) * 60
-            st.write(f"総単語数: {word_count} 語")
-            st.write(f"所要時間: {total_time:.2f} 秒")
-            st.write(f"単語数/分: **{wpm:.1f}** WPM")
-
-            # --- 判定と記録 ---
-            correct1 = st.session_state.q1 == data['A1']
-            correct2 = st.session_state.q2 == data['A2']
-
-            # 判定を固定しておく（訳ページ遷移時に一瞬Falseになるのを防ぐ）
-            st.session_state["final_correct1"] = correct1
-            st.session_state["final_correct2"] = correct2
-
-            st.write(f"Q1: {'✅ 正解' if correct1 else '❌ 不正解'}")
-            st.write(f"あなたの解答: {st.session_state.q1}")
-            st.write(f"正しい答え: {data['A1']}")
-
-            st.write(f"Q2: {'✅ 正解' if correct2 else '❌ 不正解'}")
-            st.write(f"あなたの解答: {st.session_state.q2}")
-            st.write(f"正しい答え: {data['A2']}")
-
-            correct_answers_to_store = int(correct1) + int(correct2)
-            if not st.session_state.submitted:
-                material_id_to_save = data.get('material_id_for_save', str(st.session_state.fixed_row_index))
-                save_results(wpm, correct_answers_to_store, material_id_to_save, st.session_state.nickname)
-                st.session_state.submitted = True
-
-        if st.button("意味を確認"):
-            # 遷移時に判定結果を保持したままpage変更
-            st.session_state.page = 5
-            st.rerun()
 
-
-# --- 意味確認ページ（page 5） ---
-elif st.session_state.page == 5:
-    data = load_material(GITHUB_DATA_URL, st.session_state.fixed_row_index)
-    if data is None:
-        st.stop()
-
-    st.title("英文と日本語訳")
-    col_en, col_ja = st.columns(2)
-    with col_en:
-        st.subheader("英文")
-        st.markdown(
-            f"""
-            <div class="custom-paragraph">
-            {data['main']}
-            </div>
-            """, unsafe_allow_html=True
-        )
-    with col_ja:
-        st.subheader("日本語訳")
-        if 'japanese' in data:
+        st.title("英文と日本語訳")
+        col_en, col_ja = st.columns(2)
+        with col_en:
+            st.subheader("英文")
             st.markdown(
                 f"""
-                <div style="font-family: Georgia, serif; line-height: 1.8; font-size: 1.5rem;">
-                {data['japanese']}
+                <div class="custom-paragraph">
+                {data['main']}
                 </div>
-                """,
-                unsafe_allow_html=True
+                """, unsafe_allow_html=True
             )
-        else:
-            st.error("CSVファイルに'japanese'列が存在しません。")
-            st.stop()
+        with col_ja:
+            st.subheader("日本語訳")
+            if 'japanese' in data:
+                st.markdown(
+                    f"""
+                    <div style="font-family: Georgia, serif; line-height: 1.8; font-size: 1.5rem;">
+                    {data['japanese']}
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+            else:
+                st.error("CSVファイルに'japanese'列が存在しません。")
+                st.stop()
+
+        if st.button("終了"):
+            # 終了時に状態をクリア
+            for key in ["page", "start_time", "stop_time", "submitted",
+                        "q1", "q2", "final_correct1", "final_correct2"]:
+                st.session_state[key] = None
+            st.session_state.page = 1
+            st.rerun()
+
+    # --- 診断ページ（page 99, 管理者のみ） ---
+    elif st.session_state.page == 99:
+        if not st.session_state.is_admin:
+            st.session_state.page = 1
+            st.rerun()
+        render_diagnostics()
+        if st.button("メニューに戻る", key="back_from_diagnostics"):
+            st.session_state.page = 1
+            st.rerun()
 
-    if st.button("終了"):
-        # 終了時に状態をクリア
-        for key in ["page", "start_time", "stop_time", "submitted",
-                    "q1", "q2", "final_correct1", "final_correct2"]:
-            st.session_state[key] = None
-        st.session_state.page = 1
-        st.rerun()
+# --- ページごとの所要時間を計測 (st.rerun() / st.stop() で抜けた場合も記録される) ---
+with page_timer("app", st.session_state.page):
+    render_page()
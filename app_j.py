@@ -1,16 +1,37 @@
+from __future__ import annotations
+
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
 import tempfile
 import json
+import hashlib
 import bcrypt
 import re
 import os
 import time
-import pandas as pd
 import random
 import string
-from typing import List, Tuple
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from lazy_imports import lazy_import
+from static_assets import inject_css
+from warmup import start_warmup
+from perf_metrics import page_timer, timed_step
+from content_source import local_file_cache
+from cache_registry import budget_mb
+from firestore_trace import trace_client
+import fake_firestore
+from diagnostics import render_diagnostics
+from session_memory import track_session
+from item_stats import add_answer, format_top_wrong, item_key, load_item_stats, submit_answer_details
+from class_progress import render_class_progress
+from review_schedule import REVIEW_LIMIT, add_review_answer, due_items, load_schedule, read_schedule
+
+# 重いモジュールは使うページで初めて読み込む (ログインページを軽くするため)
+pd = lazy_import("pandas")
+firebase_admin = lazy_import("firebase_admin")
+credentials = lazy_import("firebase_admin.credentials")
+# FIRESTORE_BACKEND=fake のときはインメモリの Firestore を使う (オフラインでの確認・ベンチマーク用)
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
 
 # ==========================================
 # 🔹 Firebase 初期化
@@ -18,8 +39,11 @@ from typing import List, Tuple
 @st.cache_resource
 def init_firestore():
     """Streamlitのキャッシュを利用し、Firestoreクライアントを一度だけ初期化する"""
+    if fake_firestore.enabled():
+        return trace_client(firestore.client())
     if "firebase" not in st.secrets:
-        st.warning("⚠️ Streamlit Secretsに 'firebase' の設定が見つかりませんでした。", icon="🔒")
+        # オフラインで確認するときは FIRESTORE_BACKEND=fake を使う。ここでは何も保存しない (保存しようとするとエラーを表示する)
+        st.warning("⚠️ Streamlit Secretsに 'firebase' の設定が見つかりませんでした。結果は保存されません。", icon="🔒")
         class DummyFirestoreClient:
             def collection(self, *args, **kwargs): return self
             def document(self, *args, **kwargs): return self
@@ -38,7 +62,7 @@ def init_firestore():
             firebase_admin.initialize_app(cred)
             
         os.unlink(f.name)
-    return firestore.client()
+    return trace_client(firestore.client())
 
 # ==========================================
 # 🔹 ファイルパス設定
@@ -48,15 +72,21 @@ PROPER_NOUNS_PATH = os.path.join(BASE_DIR, "shuffle_data", "proper_nouns.csv")
 QUESTIONS_SELECT_PATH = os.path.join(BASE_DIR, "shuffle_data", "questions_select.csv")
 AUDIO_CORRECT_PATH = os.path.join(BASE_DIR, "shuffle_data", "audio_correct.mp3")
 AUDIO_FALSE_PATH = os.path.join(BASE_DIR, "shuffle_data", "audio_false.mp3")
+DEFAULT_PROPER_NOUNS = ("New York", "Osaka", "Tokyo", "Sunday", "Monday", "Japan", "America", "I")
 VOCABOOSTER_URL = "https://filedn.com/lTkchLpf4Vo0aRMDYi0tvk5/VocaBooster/VocaBooster.html"
 
 # ==========================================
 # 🔹 ログイン関連関数
 # ==========================================
+def student_key(nickname):
+    """Firestore のドキュメント ID に使う生徒のキー (ニックネームのハッシュ。入力されたパスワードは ID に入れない)"""
+    return hashlib.sha256(nickname.strip().encode("utf-8")).hexdigest()[:16]
+
 def go_to_main_page(nickname, user_id, is_admin):
     """認証成功後、セッションステートを更新しメインページへ遷移"""
     st.session_state.nickname = nickname.strip()
     st.session_state.user_id = user_id.strip()
+    st.session_state.student_key = student_key(nickname)
     st.session_state.is_admin = is_admin
     st.session_state.logged_in = True
     st.session_state.page = 1 
@@ -81,47 +111,101 @@ def logout():
 # ==========================================
 # 🔹 Firestore データ保存関数
 # ==========================================
-# 💡 question_japanese, question_english_correct の保存を削除し、id を追加
-def save_quiz_result(id, quiz_set, user_answer, is_correct, quiz_type):
-    """Firestoreにクイズ結果を保存する (コレクション名: shuffle_results)"""
+# 結果は 1 回の問題セットの挑戦ごとに 1 つのドキュメント (shuffle_attempts) にまとめる。
+# ドキュメント ID は 生徒のキー (student_key) + 問題セット + 開始時刻 で、解答するたびに answers 配列へ
+# {id, quiz_set, quiz_type, user_answer, is_correct, answered_at} を追加し、集計 (answered / correct / incorrect) を加算する。
+# 以前の 1 問 1 ドキュメントの shuffle_results は、復習の予定を初めて作るときにだけ読み込む。
+# 復習の出題予定 (review_schedules) も解答ごとに更新する (予定を読むのはセッションで最初の 1 回だけ。review_schedule.py)。
+ATTEMPTS_COLLECTION = "shuffle_attempts"
+LEGACY_RESULTS_COLLECTION = "shuffle_results"
+
+def begin_quiz_attempt(quiz_set, total_questions):
+    """問題セットの開始時に、挑戦ドキュメントの ID を決める (ドキュメントは最初の解答の保存で作られる)"""
+    started_at = datetime.now(timezone.utc)
+    attempt_id = f"{st.session_state.student_key}_{quiz_set}_{started_at.strftime('%Y%m%d-%H%M%S')}"
+    st.session_state.attempt_id = attempt_id.replace("/", "-")
+    st.session_state.attempt_started_at = started_at
+    st.session_state.attempt_total_questions = total_questions
+
+@timed_step("firestore_write")
+def save_quiz_result(id, quiz_set, user_answer, is_correct, quiz_type, question_set=None):
+    """Firestoreの挑戦ドキュメント (コレクション名: shuffle_attempts) に 1 問分の結果を追加する
+
+    question_set は問題の元の CSV 名 (復習モードでは quiz_set が "復習モード" になるため)。
+    """
     db = init_firestore()
     
     if not hasattr(db, 'collection'):
         return
 
-    collection_ref = db.collection("shuffle_results")
-    
+    if not st.session_state.get('attempt_id'):
+        begin_quiz_attempt(quiz_set, st.session_state.get('total_questions', 0))
+
+    answer = {
+        "id": id, # 💡 問題特定用のIDのみを保存
+        "quiz_set": question_set or quiz_set,
+        "quiz_type": quiz_type,
+        "user_answer": user_answer,
+        "is_correct": is_correct,
+        "answered_at": datetime.now(timezone.utc), # 配列の中では SERVER_TIMESTAMP を使えない
+    }
     data = {
         "user_id": st.session_state.user_id,
         "nickname": st.session_state.nickname,
         "quiz_set": quiz_set, # CSVファイル名
-        "quiz_type": quiz_type, 
-        "id": id, # 💡 問題特定用のIDのみを保存
-        "user_answer": user_answer,
-        "is_correct": is_correct,
-        "timestamp": firestore.SERVER_TIMESTAMP
+        "started_at": st.session_state.attempt_started_at,
+        "total_questions": st.session_state.attempt_total_questions,
+        "answers": firestore.ArrayUnion([answer]),
+        "answered": firestore.Increment(1),
+        "correct": firestore.Increment(1 if is_correct else 0),
+        "incorrect": firestore.Increment(0 if is_correct else 1),
+        "updated_at": firestore.SERVER_TIMESTAMP
     }
     
+    # 挑戦ドキュメント・先生向けの問題ごとの集計 (item_stats)・復習の予定は 1 回の commit で書き込む
+    stats_set = question_set or quiz_set
     try:
-        collection_ref.add(data)
+        batch = db.batch()
+        batch.set(db.collection(ATTEMPTS_COLLECTION).document(st.session_state.attempt_id), data, merge=True)
+        add_answer(batch, db, stats_set, id, quiz_type, st.session_state.student_key, is_correct)
+        add_review_answer(batch, db, st.session_state.student_key, session_review_schedule(db),
+                          stats_set, id, is_correct)
+        batch.commit()
     except Exception as e:
         st.error(f"⚠️ 結果の保存中にエラーが発生しました: {e}")
+        return
+
+    # 解いた生徒の数 (このセッションで初めて解く問題のときだけ確認) とよくある誤答は、バックグラウンドで更新する
+    seen = st.session_state.setdefault('item_stats_seen', set())
+    key = item_key(stats_set, id)
+    submit_answer_details(db, stats_set, id, st.session_state.student_key, user_answer, is_correct,
+                          check_user=key not in seen)
+    seen.add(key)
 
 
 # ==========================================
 # 🔹 復習用データロード関数
 # ==========================================
-@st.cache_data(show_spinner="復習問題を準備中...")
+# 問題データ (問題セット一覧・各問題CSV・固有名詞) はプロセスで 1 つだけ持ち、全セッションで共有する。
+# 取り出すたびのコピー (st.cache_data の pickle 復元) はなく、CSV の内容が変わったときだけ読み直す。
+# 返された DataFrame は読み取り専用 (絞り込み・並べ替えの結果は新しいオブジェクトになるので問題ない)。
+# セッションには問題セット名 (selected_csv)・復習する問題のキー (review_keys)・現在位置 (index) だけを持つ。
+QUESTION_FILES = local_file_cache("shuffle_data", max_bytes=budget_mb(4))
+
+def quiz_csv_path(csv_name) -> str:
+    return os.path.join(BASE_DIR, "shuffle_data", csv_name)
+
+@timed_step("content_load")
 def load_quiz_data(csv_name):
-    """指定されたCSVファイルをロードし、idが存在することを確認する"""
-    quiz_file_path = os.path.join(BASE_DIR, "shuffle_data", csv_name)
+    """指定されたCSVファイルをロードし、idが存在することを確認する (共有・読み取り専用)"""
+    quiz_file_path = quiz_csv_path(csv_name)
     
     if not os.path.exists(quiz_file_path):
         st.error(f"❌ 問題ファイル (`{csv_name}`) が見つかりません。")
         return pd.DataFrame()
         
     try:
-        df = pd.read_csv(quiz_file_path)
+        df = QUESTION_FILES.get(quiz_file_path)
         if 'id' not in df.columns:
             st.error("❌ 問題CSVに 'id' 列がありません。この問題セットでは復習機能は利用できません。")
             return pd.DataFrame()
@@ -130,109 +214,129 @@ def load_quiz_data(csv_name):
         st.error(f"問題データ読み込み中にエラーが発生しました: {e}")
         return pd.DataFrame()
 
-def load_review_data(user_id, target_quiz_set=None):
-    """Firestoreから過去の不正解問題を抽出し、復習用DataFrameを返す (アプローチA)"""
+def question_index(csv_name) -> Dict[str, dict]:
+    """問題セットの id (文字列) → 問題の行 (dict) (共有・読み取り専用)"""
+    df = load_quiz_data(csv_name)
+    if df.empty:
+        return {}
+    def build(df):
+        return {str(record['id']): record for record in df.to_dict('records')}
+    return QUESTION_FILES.derive(quiz_csv_path(csv_name), "question_index", build)
+
+def quiz_types_by_csv() -> Dict[str, str]:
+    """問題セット一覧の csv_name → 問題形式 (type)"""
+    df_select = load_selection_data()
+    if df_select.empty or 'csv_name' not in df_select.columns or 'type' not in df_select.columns:
+        return {}
+    def build(df):
+        df_unique = df.drop_duplicates('csv_name')
+        return dict(zip(df_unique['csv_name'], df_unique['type']))
+    return QUESTION_FILES.derive(QUESTIONS_SELECT_PATH, "quiz_types", build)
+
+def build_review_df(review_keys: List[Tuple[str, str]]) -> pd.DataFrame:
+    """復習する問題のキー (quiz_set, id) から、その順番どおりの復習用 DataFrame を組み立てる"""
+    quiz_types = quiz_types_by_csv()
+    indexes: Dict[str, Dict[str, dict]] = {}
+    records = []
+    for quiz_set, qid in review_keys:
+        if quiz_set not in indexes:
+            indexes[quiz_set] = question_index(quiz_set)
+        record = indexes[quiz_set].get(str(qid))
+        if record is not None:
+            records.append({**record, 'original_quiz_set': quiz_set,
+                            'quiz_type_review': quiz_types.get(quiz_set, 'shuffling')})  # 見つからなければ並べかえと仮定
+    return pd.DataFrame(records)
+
+def load_mistake_keys(db, user_id) -> List[Tuple[str, object]]:
+    """過去の結果 (shuffle_attempts / shuffle_results) から不正解だった問題の (quiz_set, id) を重複なく集める
+
+    すべての結果を読むため、まだ seeded でない生徒が復習を始めたときにだけ使う。
+    """
+    mistakes = []
+    for doc in db.collection(ATTEMPTS_COLLECTION).where("user_id", "==", user_id).get():
+        data = doc.to_dict()
+        if not data.get('incorrect'):
+            continue
+        mistakes.extend(a for a in data.get('answers', []) if a.get('is_correct') is False)
+    legacy_query = db.collection(LEGACY_RESULTS_COLLECTION).where("user_id", "==", user_id).where("is_correct", "==", False)
+    mistakes.extend(doc.to_dict() for doc in legacy_query.get())
+
+    keys = {}
+    for data in mistakes:
+        q_set = data.get('quiz_set')
+        q_id = data.get('id')
+        if q_set and q_id is not None:
+            keys.setdefault((q_set, str(q_id)), (q_set, q_id))
+    return list(keys.values())
+
+def session_review_schedule(db) -> Dict[str, dict]:
+    """このセッションの復習予定 (まだ読んでいなければ 1 回だけ読む。以前の結果からの作成は復習を始めたときに行う)"""
+    if st.session_state.get('review_schedule') is None:
+        st.session_state.review_schedule = read_schedule(db, st.session_state.student_key)
+    return st.session_state.review_schedule
+
+@timed_step("firestore_read")
+def load_review_data(user_id, target_quiz_set=None) -> List[Tuple[str, str]]:
+    """復習予定から出題日時を過ぎた問題のキー (quiz_set, id) を、優先順に REVIEW_LIMIT 問まで返す
+
+    予定は復習を始めるたびに読み直し、セッションに持っておく (その後の正解で箱を進めるのに使う)。
+    """
     db = init_firestore()
     if not hasattr(db, 'collection'):
-        return pd.DataFrame()
+        return []
 
-    review_questions_list = []
-    
     try:
-        # 1. Firestoreから不正解記録 (id, quiz_set) を抽出
-        collection_ref = db.collection("shuffle_results")
-        query = collection_ref.where("user_id", "==", user_id).where("is_correct", "==", False)
-        
-        if target_quiz_set and target_quiz_set != "復習モード": 
-            query = query.where("quiz_set", "==", target_quiz_set) 
-            
-        results = query.get()
-        
-        # 2. 不正解だった問題の (quiz_set, id) をユニークに抽出
-        unique_mistakes = set()
-        mistake_map = {} # {quiz_set: {id1, id2, ...}}
-        
-        for doc in results:
-            data = doc.to_dict()
-            q_set = data.get('quiz_set')
-            q_id = data.get('id')
-            
-            if q_set and q_id is not None:
-                key = (q_set, q_id)
-                if key not in unique_mistakes:
-                    unique_mistakes.add(key)
-                    if q_set not in mistake_map:
-                        mistake_map[q_set] = set()
-                    mistake_map[q_set].add(q_id)
-        
-        if not unique_mistakes:
-            return pd.DataFrame()
-
-        # 3. 各CSVファイル (quiz_set) をロードし、不正解だった問題の行を抽出
-        for csv_name, q_ids in mistake_map.items():
-            df_original = load_quiz_data(csv_name)
-            
-            if not df_original.empty and 'id' in df_original.columns:
-                # Firestoreに保存されているIDはint/strが混在する可能性があるため、型を統一してフィルタリング
-                q_ids_safe = [str(qid) for qid in q_ids]
-                
-                df_filtered = df_original[df_original['id'].astype(str).isin(q_ids_safe)].copy()
-                
-                # 抽出したデータに quiz_set と quiz_type の情報を追加（復習画面で利用可能にするため）
-                df_filtered['original_quiz_set'] = csv_name
-                
-                # df_select から quiz_type を取得して追加
-                if 'df_select' in st.session_state:
-                    type_row = st.session_state.df_select[st.session_state.df_select['csv_name'] == csv_name]
-                    if not type_row.empty:
-                        df_filtered['quiz_type_review'] = type_row.iloc[0]['type']
-                    else:
-                        df_filtered['quiz_type_review'] = 'shuffling' # 見つからなければ並べかえと仮定
-                
-                review_questions_list.append(df_filtered)
-                
-        if not review_questions_list:
-            return pd.DataFrame()
-            
-        # 4. すべての不正解問題を結合し、シャッフルして返す
-        review_df = pd.concat(review_questions_list, ignore_index=True)
-        review_df = review_df.sample(frac=1).reset_index(drop=True)
-        return review_df
+        # 予定は生徒のキーで持つ。以前の結果は user_id (パスワード) のフィールドで探す
+        items = load_schedule(db, st.session_state.student_key, seed=lambda: load_mistake_keys(db, user_id))
+        st.session_state.review_schedule = items
+        quiz_set = target_quiz_set if target_quiz_set and target_quiz_set != "復習モード" else None
+
+        # 問題CSVに残っている問題だけをキーにする
+        # (Firestoreに保存されているIDはint/strが混在する可能性があるため、文字列に統一する)
+        review_keys = []
+        for csv_name, qid in due_items(items, quiz_set=quiz_set, limit=None):
+            if str(qid) in question_index(csv_name):
+                review_keys.append((csv_name, str(qid)))
+                if len(review_keys) >= REVIEW_LIMIT:
+                    break
+        return review_keys
 
     except Exception as e:
         st.error(f"⚠️ 復習問題のロード中にエラーが発生しました: {e}")
-        return pd.DataFrame()
+        return []
 
 # ==========================================
 # 🔹 クイズロジック: データロード・シャッフル
 # ==========================================
 # (省略: load_selection_data, load_proper_nouns, tokenize, detokenize, shuffle_question, generate_shuffling_data は変更なし)
 
-@st.cache_data
+@timed_step("content_load")
 def load_selection_data() -> pd.DataFrame:
+    """問題セット一覧 (共有・読み取り専用)"""
     try:
         if not os.path.exists(QUESTIONS_SELECT_PATH):
             st.error(f"❌ questions_select.csv が見つかりません。")
             return pd.DataFrame()
-        return pd.read_csv(QUESTIONS_SELECT_PATH)
+        return QUESTION_FILES.get(QUESTIONS_SELECT_PATH)
     except Exception as e:
         st.error(f"問題セット選択リストの読み込み中にエラーが発生しました: {e}")
         return pd.DataFrame()
 
-@st.cache_data
-def load_proper_nouns() -> List[str]:
+def load_proper_nouns() -> Tuple[str, ...]:
+    """固有名詞の一覧 (共有・読み取り専用の tuple)"""
+    def build(df):
+        proper_nouns = [str(x).strip() for x in df["proper_noun"].dropna()]
+        if "I" not in proper_nouns:
+            proper_nouns.append("I")
+        return proper_nouns
     try:
         if os.path.exists(PROPER_NOUNS_PATH):
-            df = pd.read_csv(PROPER_NOUNS_PATH)
-            proper_nouns = [str(x).strip() for x in df["proper_noun"].dropna()]
-            if "I" not in proper_nouns:
-                proper_nouns.append("I")
-            return proper_nouns
+            return QUESTION_FILES.derive(PROPER_NOUNS_PATH, "proper_nouns", build)
         else:
-            return ["New York", "Osaka", "Tokyo", "Sunday", "Monday", "Japan", "America", "I"]
+            return DEFAULT_PROPER_NOUNS
     except Exception as e:
         st.error(f"固有名詞の読み込みエラー: {e}")
-        return ["New York", "Osaka", "Tokyo", "Sunday", "Monday", "Japan", "America", "I"]
+        return DEFAULT_PROPER_NOUNS
 
 def tokenize(sentence: str, proper_nouns: List[str]) -> List[str]:
     temp_sentence = sentence
@@ -340,6 +444,13 @@ def handle_word_click(i: int, word: str):
     st.session_state.selected.append(word_to_append)
     st.session_state.used_indices.append(i) 
 
+def normalize_user_answer(selected: List[str]) -> str:
+    """選択した語句を回答文にする (文末記号の前の空白を詰め、先頭を大文字にする)"""
+    user_answer_cleaned = re.sub(r'\s+([\.\?!])$', r'\1', " ".join(selected))
+    if user_answer_cleaned and user_answer_cleaned[0].islower():
+        return user_answer_cleaned[0].upper() + user_answer_cleaned[1:]
+    return user_answer_cleaned
+
 def undo_selection():
     if st.session_state.selected:
         st.session_state.selected.pop()
@@ -385,8 +496,8 @@ def show_result_page():
     
     if st.session_state.get('app_mode') == 'review_quiz':
         st.info("お疲れ様でした！復習クイズを完了しました。")
-        if 'review_df' in st.session_state:
-            del st.session_state.review_df
+        if 'review_keys' in st.session_state:
+            del st.session_state.review_keys
     
     if st.button("📚 問題セット選択に戻る", type="primary", use_container_width=True):
         
@@ -397,6 +508,40 @@ def show_result_page():
         st.session_state.app_mode = 'selection'
         st.rerun()
 
+# ==========================================
+# 🔹 問題ごとの集計ページ (管理者のみ)
+# ==========================================
+def show_item_stats_page():
+    """問題セットを選び、問題ごとの正答率とよくある誤答を正答率の低い順に表示する (集計ドキュメントだけを読む)"""
+    st.markdown("## 📊 問題ごとの集計")
+    df_select = load_selection_data()
+    if df_select.empty or 'csv_name' not in df_select.columns:
+        st.error("問題セットの選択リストが空です。")
+        return
+    quiz_set = st.selectbox("問題セット", df_select['csv_name'].drop_duplicates().tolist(), key="item_stats_csv")
+
+    db = init_firestore()
+    if not hasattr(db, 'collection'):
+        return
+    try:
+        rows = load_item_stats(db, quiz_set)
+    except Exception as e:
+        st.error(f"⚠️ 問題ごとの集計の読み込み中にエラーが発生しました: {e}")
+        return
+    if not rows:
+        st.info("この問題セットの集計はまだありません。")
+        return
+
+    index = question_index(quiz_set)
+    st.dataframe([{
+        "id": r["id"],
+        "英文": index.get(r["id"], {}).get("english", ""),
+        "解答数": r["attempts"],
+        "生徒数": r["users"],
+        "正答率 (%)": r["accuracy"],
+        "よくある誤答": format_top_wrong(r["top_wrong"]),
+    } for r in rows], hide_index=True, use_container_width=True)
+
 # ==========================================
 # 🔹 1. 問題セット選択ページ (インデックス計算・完全永続化版)
 # ==========================================
@@ -408,7 +553,6 @@ def show_selection_page():
         st.link_button("📖 VocaBooster", VOCABOOSTER_URL, use_container_width=True)
 
     df_select = load_selection_data()
-    st.session_state.df_select = df_select
 
     if df_select.empty:
         st.error("問題セットの選択リストが空です。")
@@ -556,9 +700,9 @@ def show_selection_page():
             # 💡 択一も復習可能にするために quiz_type のチェックを削除
             if st.button("復習 ↺", key="review_quiz_new", type="secondary", use_container_width=True):
                 # 💡 選択されたCSVに関連する不正解データをロード
-                review_df = load_review_data(st.session_state.user_id, target_quiz_set=csv_name)
+                review_keys = load_review_data(st.session_state.user_id, target_quiz_set=csv_name)
                 
-                if review_df.empty:
+                if not review_keys:
                     st.toast("🎉 このセットに復習すべき問題はありません！", icon="✅")
                 else:
                     # 💡 削除するキーに id 関連を追加
@@ -566,7 +710,7 @@ def show_selection_page():
                         st.session_state.pop(key, None)
                         
                     st.session_state.app_mode = 'review_quiz'
-                    st.session_state.review_df = review_df
+                    st.session_state.review_keys = review_keys
                     st.session_state.selected_csv = "復習モード" # 特殊なCSV名を設定
                     # 💡 復習モードでは、問題を解くたびに quiz_type を設定し直す
                     st.rerun()
@@ -725,12 +869,7 @@ def show_quiz_page(df: pd.DataFrame, proper_nouns: List[str]):
         if len(st.session_state.selected) == len(st.session_state.shuffled):
             is_ready_to_check = True
             
-            user_answer_raw = " ".join(st.session_state.selected)
-            user_answer_cleaned = re.sub(r'\s+([\.\?!])$', r'\1', user_answer_raw)
-            if user_answer_cleaned and user_answer_cleaned[0].islower():
-                user_answer_final = user_answer_cleaned[0].upper() + user_answer_cleaned[1:]
-            else:
-                user_answer_final = user_answer_cleaned
+            user_answer_final = normalize_user_answer(st.session_state.selected)
                 
             is_correct = (user_answer_final == current_correct)
 
@@ -754,8 +893,9 @@ def show_quiz_page(df: pd.DataFrame, proper_nouns: List[str]):
 
 
         if not st.session_state.quiz_saved:
-            # 💡 id と current_quiz_set を渡して保存
-            save_quiz_result(int(id), current_quiz_set, user_answer_final, is_correct, quiz_type)
+            # 💡 id と current_quiz_set を渡して保存 (復習モードでは元の問題セット名も渡す)
+            save_quiz_result(int(id), current_quiz_set, user_answer_final, is_correct, quiz_type,
+                             question_set=row.get('original_quiz_set', current_quiz_set))
             st.session_state.quiz_saved = True
 
         if is_correct:
@@ -795,111 +935,7 @@ def show_quiz_page(df: pd.DataFrame, proper_nouns: List[str]):
     st.progress(progress_ratio, text=f"**進捗: {current_index + 1} / {total_questions} 問**")
 
 def quiz_main():
-    st.markdown("""
-    <style>
-    /* ==========================================
-       Streamlit 標準の primary ボタン（水色）
-       ========================================== */
-    .stButton button[data-testid="baseButton-primary"] {
-        background-color: #38bdf8;
-        color: #164e63;
-        border: none;
-        transition: background-color 0.1s;
-    }
-    .stButton button[data-testid="baseButton-primary"]:hover {
-        background-color: #0ea5e9;
-    }
- 
-    /* Dark Mode */
-    .stApp.stApp.stApp > div > section > div > button[data-testid="baseButton-primary"] {
-        background-color: #0ea5e9 !important;
-        color: white !important;
-        border: none !important;
-    }
-    .stApp.stApp.stApp > div > section > div > button[data-testid="baseButton-primary"]:hover {
-        background-color: #0284c7 !important;
-    }
- 
-    /* ==========================================
-       VocaBooster リンクボタン
-       ブランドカラー（山吹 #ffcc00 → #ff9900）に合わせた立体ボタン
-       ========================================== */
-    .stLinkButton a,
-    a[data-testid="stBaseLinkButton-secondary"],
-    a[data-testid="baseLinkButton-secondary"],
-    a[data-testid^="stBaseLinkButton"],
-    a[data-testid^="baseLinkButton"] {
-        background: linear-gradient(180deg, #ffd94d 0%, #ffcc00 45%, #ff9900 100%) !important;
-        color: #5c3d00 !important;
-        border: 2px solid #e68a00 !important;
-        min-height: 60px !important;
-        padding: 18px 12px !important;
-        border-radius: 14px !important;
-        box-shadow: 0 4px 0 #d97706, 0 7px 14px rgba(217, 119, 6, 0.28) !important;
-        display: flex !important;
-        align-items: center !important;
-        justify-content: center !important;
-        text-decoration: none !important;
-        letter-spacing: 0.02em !important;
-        transition: transform 0.1s ease, box-shadow 0.1s ease, background 0.15s ease !important;
-    }
- 
-    /* Streamlit はラベルを内側の p に入れるため、そちらにもサイズ指定が必要 */
-    .stLinkButton a p,
-    .stLinkButton a div,
-    .stLinkButton a span,
-    a[data-testid^="stBaseLinkButton"] p,
-    a[data-testid^="baseLinkButton"] p {
-        font-size: 22px !important;
-        font-weight: 800 !important;
-        color: #5c3d00 !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        line-height: 1.25 !important;
-        white-space: nowrap !important;
-    }
- 
-    /* ホバー：少し沈ませる */
-    .stLinkButton a:hover,
-    a[data-testid^="stBaseLinkButton"]:hover,
-    a[data-testid^="baseLinkButton"]:hover {
-        background: linear-gradient(180deg, #ffcc00 0%, #ffb300 45%, #f57c00 100%) !important;
-        color: #4a3000 !important;
-        transform: translateY(2px) !important;
-        box-shadow: 0 2px 0 #d97706, 0 4px 8px rgba(217, 119, 6, 0.25) !important;
-    }
- 
-    /* クリック中：完全に沈む */
-    .stLinkButton a:active,
-    a[data-testid^="stBaseLinkButton"]:active,
-    a[data-testid^="baseLinkButton"]:active {
-        transform: translateY(4px) !important;
-        box-shadow: 0 0 0 #d97706 !important;
-    }
- 
-    /* キーボード操作時のフォーカスリング */
-    .stLinkButton a:focus-visible,
-    a[data-testid^="stBaseLinkButton"]:focus-visible {
-        outline: 3px solid #1e40af !important;
-        outline-offset: 3px !important;
-    }
- 
-    /* ダークモードでも黄色地＋濃茶文字を維持 */
-    @media (prefers-color-scheme: dark) {
-        .stLinkButton a,
-        a[data-testid^="stBaseLinkButton"],
-        a[data-testid^="baseLinkButton"] {
-            background: linear-gradient(180deg, #ffd94d 0%, #ffc400 45%, #ff9000 100%) !important;
-            color: #4a3000 !important;
-            border-color: #b45309 !important;
-        }
-        .stLinkButton a p,
-        a[data-testid^="stBaseLinkButton"] p {
-            color: #4a3000 !important;
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    inject_css("assets/quiz.css")
     
     if st.session_state.app_mode == 'selection':
         show_selection_page()
@@ -908,13 +944,13 @@ def quiz_main():
         
         # 💡 quiz_type の初期値設定
         if st.session_state.app_mode == 'review_quiz':
-            if 'review_df' not in st.session_state or st.session_state.review_df.empty:
+            if not st.session_state.get('review_keys'):
                 st.error("復習データが見つからないか、空です。")
                 st.session_state.app_mode = 'selection'
                 st.rerun()
                 return
             
-            df = st.session_state.review_df
+            df = build_review_df(st.session_state.review_keys)
             proper_nouns = load_proper_nouns()
             header_text = "🔄 不正解問題に再挑戦"
             # 💡 復習モードでは、問題ごとの quiz_type_review を使用するため、ここでは特に設定しない
@@ -948,7 +984,7 @@ def quiz_main():
             if st.button("⬅️ 選択に戻る", key="back_to_selection_main", use_container_width=True):
                 st.session_state.app_mode = 'selection'
                 # 💡 削除するキーに id 関連を追加
-                for key in ['index', 'current_correct', 'current_id', 'shuffled', 'selected', 'used_indices', 'quiz_complete', 'quiz_saved', 'loaded_csv_name', 'quiz_type', 'mc_options', 'mc_correct_answer', 'multiple_choice_selection', 'correct_tokens', 'review_df']:
+                for key in ['index', 'current_correct', 'current_id', 'shuffled', 'selected', 'used_indices', 'quiz_complete', 'quiz_saved', 'loaded_csv_name', 'quiz_type', 'mc_options', 'mc_correct_answer', 'multiple_choice_selection', 'correct_tokens', 'review_keys']:
                     st.session_state.pop(key, None)
                 st.rerun()
                 return
@@ -965,12 +1001,43 @@ def quiz_main():
 
             st.session_state.correct_count = 0
             st.session_state.total_questions = len(df) 
+            begin_quiz_attempt(st.session_state.selected_csv, len(df))
             
 
         show_quiz_page(df, proper_nouns)
 
     elif st.session_state.app_mode == 'quiz_result':
         show_result_page()
+
+    elif st.session_state.app_mode == 'diagnostics':
+        if not st.session_state.is_admin:
+            st.session_state.app_mode = 'selection'
+            st.rerun()
+            return
+        render_diagnostics()
+        if st.button("📚 問題セット選択に戻る", key="back_from_diagnostics", use_container_width=True):
+            st.session_state.app_mode = 'selection'
+            st.rerun()
+
+    elif st.session_state.app_mode == 'item_stats':
+        if not st.session_state.is_admin:
+            st.session_state.app_mode = 'selection'
+            st.rerun()
+            return
+        show_item_stats_page()
+        if st.button("📚 問題セット選択に戻る", key="back_from_item_stats", use_container_width=True):
+            st.session_state.app_mode = 'selection'
+            st.rerun()
+
+    elif st.session_state.app_mode == 'class_progress':
+        if not st.session_state.is_admin:
+            st.session_state.app_mode = 'selection'
+            st.rerun()
+            return
+        render_class_progress(init_firestore())
+        if st.button("📚 問題セット選択に戻る", key="back_from_class_progress", use_container_width=True):
+            st.session_state.app_mode = 'selection'
+            st.rerun()
         
     st.markdown("---")
     
@@ -984,11 +1051,42 @@ def quiz_main():
             if st.session_state.is_admin:
                 user_info += " (管理者)"
             st.caption(user_info)
+            if st.session_state.is_admin and st.session_state.app_mode != 'diagnostics':
+                if st.button("🩺 診断ページ", key="open_diagnostics"):
+                    st.session_state.app_mode = 'diagnostics'
+                    st.rerun()
+            if st.session_state.is_admin and st.session_state.app_mode != 'item_stats':
+                if st.button("📊 問題ごとの集計", key="open_item_stats"):
+                    st.session_state.app_mode = 'item_stats'
+                    st.rerun()
+            if st.session_state.is_admin and st.session_state.app_mode != 'class_progress':
+                if st.button("👩‍🏫 クラスの進み具合", key="open_class_progress"):
+                    st.session_state.app_mode = 'class_progress'
+                    st.rerun()
 
         with col_logout:
             st.button("ログアウト", on_click=logout, key="logout_button_footer", use_container_width=True)
 
 
+# ==========================================
+# 🔹 起動時ウォームアップ
+# ==========================================
+# 問題セット一覧・固有名詞・各問題CSVと Firestore クライアントを並列に読み込んでおく
+WARMUP_EXCLUDED_CSV = {"questions_select.csv", "proper_nouns.csv"}
+
+def warmup_tasks():
+    tasks = {
+        "firestore": init_firestore,
+        "questions_select.csv": load_selection_data,
+        "proper_nouns.csv": load_proper_nouns,
+    }
+    shuffle_dir = os.path.join(BASE_DIR, "shuffle_data")
+    if os.path.isdir(shuffle_dir):
+        for csv_name in sorted(os.listdir(shuffle_dir)):
+            if csv_name.endswith(".csv") and csv_name not in WARMUP_EXCLUDED_CSV:
+                tasks[csv_name] = lambda name=csv_name: load_quiz_data(name)
+    return tasks
+
 # ==========================================
 # 🔹 アプリケーション実行のメインロジック
 # ==========================================
@@ -1001,6 +1099,7 @@ def run_app():
         "page": 0,
         "nickname": "",
         "user_id": "",
+        "student_key": "", # 💡 ドキュメント ID に使う生徒のキー (ログイン時にセット)
         "is_admin": False,
         "index": 0,
         "app_mode": 'selection',
@@ -1023,75 +1122,84 @@ def run_app():
         "mc_correct_answer": "",
         "multiple_choice_selection": None,
         "correct_tokens": [],
-        "df_select": None, 
-        "review_df": pd.DataFrame(), # 💡 新規追加
+        "review_keys": None, # 💡 復習開始時に (quiz_set, id) のリストをセット
+        "attempt_id": None, # 💡 問題セットの開始時に挑戦ドキュメントの ID をセット
+        "review_schedule": None, # 💡 復習予定 (最初の解答の保存か復習の開始のときに Firestore から読み込む)
     }
     for key, val in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = val
 
-    db = init_firestore()
+    # プロセスで最初の実行時のみ、裏でキャッシュを温める
+    start_warmup(warmup_tasks())
 
-    # (省略: ログインページのロジック)
-    if st.session_state.page == 0:
-        if st.session_state.logged_in:
-            st.session_state.page = 1
-            st.rerun()
-            st.stop()
+    # セッションを登録する (問題データは共有なので、セッションにはキーと現在位置だけが残る)
+    track_session("app_j")
 
-        st.title("ログインページ")
-        st.caption("管理者としてログインするには、secrets.tomlに設定したADMIN_USERNAMEとADMIN_PASSWORDを使用してください。")
-        st.markdown("---")
+    # ページ (モード) ごとの所要時間を計測。st.rerun() / st.stop() で抜けた場合も記録される
+    page_label = "login" if st.session_state.page == 0 else st.session_state.app_mode
+    with page_timer("app_j", page_label):
+        # (省略: ログインページのロジック)
+        if st.session_state.page == 0:
+            if st.session_state.logged_in:
+                st.session_state.page = 1
+                st.rerun()
+                st.stop()
+
+            st.title("ログインページ")
+            st.caption("管理者としてログインするには、secrets.tomlに設定したADMIN_USERNAMEとADMIN_PASSWORDを使用してください。")
+            st.markdown("---")
         
-        nickname = st.text_input("ニックネーム", key="nickname_input")
-        user_id_input = st.text_input("パスワード", type="password", key="user_id_input")
-
-        if st.button("ログイン", type="primary"):
-            if not nickname:
-                st.warning("ニックネームを入力してください。")
-            elif not user_id_input:
-                st.warning("パスワードを入力してください。")
-            elif not re.fullmatch(r'[0-9a-zA-Z_\- ]+', nickname):
-                st.error("ニックネームは半角英数字、_、-、スペースで入力してください。")
-            elif not re.fullmatch(r'[0-9a-zA-Z]+', user_id_input):
-                st.error("パスワードは半角英数字で入力してください。")
-            else:
-                admin_nickname = st.secrets.get("ADMIN_USERNAME")
-                admin_hashed_password = st.secrets.get("ADMIN_PASSWORD")
-                user_entered_password_bytes = user_id_input.strip().encode('utf-8')
-                authenticated = False
-                is_admin_user = False
-
-                if nickname.strip() == admin_nickname:
-                    if admin_hashed_password and bcrypt.checkpw(user_entered_password_bytes, admin_hashed_password.encode('utf-8')):
-                        authenticated = True
-                        is_admin_user = True
-
-                if not authenticated:
-                    users_from_secrets = st.secrets.get("users", [])
-                    for user_info in users_from_secrets:
-                        if nickname.strip() == user_info.get("nickname"):
-                            stored_hashed_id = user_info.get("user_id")
-                            if stored_hashed_id and bcrypt.checkpw(user_entered_password_bytes, stored_hashed_id.encode('utf-8')):
-                                authenticated = True
-                                break
-
-                if authenticated:
-                    go_to_main_page(nickname, user_id_input, is_admin_user)
+            nickname = st.text_input("ニックネーム", key="nickname_input")
+            user_id_input = st.text_input("パスワード", type="password", key="user_id_input")
+
+            if st.button("ログイン", type="primary"):
+                if not nickname:
+                    st.warning("ニックネームを入力してください。")
+                elif not user_id_input:
+                    st.warning("パスワードを入力してください。")
+                elif not re.fullmatch(r'[0-9a-zA-Z_\- ]+', nickname):
+                    st.error("ニックネームは半角英数字、_、-、スペースで入力してください。")
+                elif not re.fullmatch(r'[0-9a-zA-Z]+', user_id_input):
+                    st.error("パスワードは半角英数字で入力してください。")
                 else:
-                    st.error("ニックネームまたはパスワードが正しくありません。")
+                    admin_nickname = st.secrets.get("ADMIN_USERNAME")
+                    admin_hashed_password = st.secrets.get("ADMIN_PASSWORD")
+                    user_entered_password_bytes = user_id_input.strip().encode('utf-8')
+                    authenticated = False
+                    is_admin_user = False
+
+                    if nickname.strip() == admin_nickname:
+                        if admin_hashed_password and bcrypt.checkpw(user_entered_password_bytes, admin_hashed_password.encode('utf-8')):
+                            authenticated = True
+                            is_admin_user = True
+
+                    if not authenticated:
+                        users_from_secrets = st.secrets.get("users", [])
+                        for user_info in users_from_secrets:
+                            if nickname.strip() == user_info.get("nickname"):
+                                stored_hashed_id = user_info.get("user_id")
+                                if stored_hashed_id and bcrypt.checkpw(user_entered_password_bytes, stored_hashed_id.encode('utf-8')):
+                                    authenticated = True
+                                    break
+
+                    if authenticated:
+                        go_to_main_page(nickname, user_id_input, is_admin_user)
+                    else:
+                        st.error("ニックネームまたはパスワードが正しくありません。")
 
 
-    # ------------------------------------------
-    # 🔹 Page 1: メインコンテンツ (問題セット選択/クイズ実行)
-    # ------------------------------------------
-    elif st.session_state.page == 1:
-        if not st.session_state.logged_in:
-            st.session_state.page = 0
-            st.rerun()
-            st.stop()
-            
-        quiz_main()
+        # ------------------------------------------
+        # 🔹 Page 1: メインコンテンツ (問題セット選択/クイズ実行)
+        # ------------------------------------------
+        elif st.session_state.page == 1:
+            if not st.session_state.logged_in:
+                st.session_state.page = 0
+                st.rerun()
+                st.stop()
+
+            init_firestore()
+            quiz_main()
 
 
 # === 実行 ===
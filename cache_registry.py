@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List
+
+# ==========================================
+# 🔹 キャッシュの一覧 (サイズ上限・追い出し・ヒット率)
+# ==========================================
+# コンテンツ・索引・メディアのキャッシュはすべてここに登録し、診断ページでヒット率・サイズ・
+# 最終更新を確認したり、個別に消去・上限の変更をしたりできるようにする。
+#
+# 登録するオブジェクトは次を持つこと:
+#   name / policy ("LRU" / "TTL+LRU" など) / max_bytes (0 なら上限なし)
+#   cache_stats() -> {"entries", "bytes", "hits", "misses", "evictions", "last_refresh"}
+#   clear()
+#   set_max_bytes(max_bytes)  (超えていればすぐに追い出す)
+#
+# 各キャッシュの上限は budget_mb() で決め、CACHE_BUDGET_SCALE (既定 1.0) 倍される
+# (メモリの少ない環境でまとめて絞る用)。
+
+BUDGET_SCALE = float(os.environ.get("CACHE_BUDGET_SCALE", "1.0"))
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def budget_mb(mb: float) -> int:
+    """キャッシュの上限 (MB) をバイト数にする (CACHE_BUDGET_SCALE を反映)"""
+    return int(mb * 1024 * 1024 * BUDGET_SCALE)
+
+
+class ByteBudget:
+    """キーごとのサイズを使用順に記録し、上限を超えたら古いものから追い出すキーを返す
+
+    ロックは持たないので、呼び出し側のキャッシュのロックの中で使うこと。
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._sizes: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def touch(self, key: Hashable):
+        if key in self._sizes:
+            self._sizes.move_to_end(key)
+
+    def add(self, key: Hashable, size: int) -> List[Hashable]:
+        """key を最新として記録し、追い出すべきキーを返す (key 自身は追い出さない)"""
+        self.discard(key)
+        self._sizes[key] = size
+        self.total += size
+        return self.overflow(keep=key)
+
+    def discard(self, key: Hashable):
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self.total -= size
+
+    def overflow(self, keep: Hashable = None) -> List[Hashable]:
+        evicted = []
+        while self.max_bytes and self.total > self.max_bytes:
+            oldest = next(iter(self._sizes))
+            if oldest == keep:
+                break
+            self.discard(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def clear(self):
+        self._sizes.clear()
+        self.total = 0
+
+
+def register(cache):
+    """キャッシュを登録する (同じ名前なら置き換える)"""
+    with _registry_lock:
+        _registry[cache.name] = cache
+    return cache
+
+
+def registered() -> Dict[str, object]:
+    with _registry_lock:
+        return dict(_registry)
+
+
+def report() -> List[dict]:
+    """診断ページ用の一覧 (サイズの大きい順)"""
+    rows = []
+    for name, cache in registered().items():
+        try:
+            stats = cache.cache_stats()
+        except Exception as e:
+            print(f"キャッシュ {name} の集計に失敗しました: {e}")
+            continue
+        lookups = stats["hits"] + stats["misses"]
+        rows.append({
+            "cache": name,
+            "policy": cache.policy,
+            "entries": stats["entries"],
+            "kb": round(stats["bytes"] / 1024, 1),
+            "budget_kb": round(cache.max_bytes / 1024, 1) if cache.max_bytes else None,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_rate": round(stats["hits"] / lookups * 100, 1) if lookups else None,
+            "evictions": stats["evictions"],
+            "last_refresh": (time.strftime("%m/%d %H:%M:%S", time.localtime(stats["last_refresh"]))
+                             if stats["last_refresh"] else "-"),
+        })
+    return sorted(rows, key=lambda r: r["kb"], reverse=True)
+
+
+def total_bytes() -> int:
+    total = 0
+    for cache in registered().values():
+        try:
+            total += cache.cache_stats()["bytes"]
+        except Exception:
+            pass
+    return total
+
+
+def flush(name: str) -> bool:
+    cache = registered().get(name)
+    if cache is None:
+        return False
+    cache.clear()
+    print(f"キャッシュ {name} を消去しました")
+    return True
+
+
+def set_budget(name: str, max_bytes: int) -> bool:
+    cache = registered().get(name)
+    if cache is None:
+        return False
+    cache.set_max_bytes(max_bytes)
+    return True
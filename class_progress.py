@@ -0,0 +1,232 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from result_rollups import ROLLUP_COLLECTION
+from session_memory import touch_session
+
+# ==========================================
+# 🔹 クラスの今日の進み具合 (管理者・先生用、リスナーで更新)
+# ==========================================
+# プロセスで 1 つだけ、コレクションごとに今日 (日本時間) 更新されたドキュメントのリスナー (on_snapshot) を持ち、
+# 変わったドキュメントだけを受け取って生徒ごとの状態表をメモリ上で更新する。
+# 先生の画面は数秒ごとにこの表を描き直すだけで Firestore を読まないので、何人が見ても読み取り件数は 1 人分と同じ。
+#
+#   shuffle_attempts   (app_j.py)         問題セット・解答数 / 問題数・正答率
+#   reading_attempts   (app_j_summer.py)  教材・終わったステージ数・正答率・最後の WPM
+#   monthly_rollups    (app.py)           今月の回数・最後の WPM (source が english の生徒の集計)
+#
+# 表の行はそれぞれ更新されたときの版 (version) を持ち、画面は前回表示した版より新しい行に印をつける。
+# 日付が変わったら、表を空にして今日の分のリスナーを作り直す。
+
+JST = timezone(timedelta(hours=9))
+REFRESH_SECONDS = 5
+IDLE_MINUTES = 15          # これ以上更新がない途中の生徒は「休止中」と表示する
+READING_STAGES = ("english", "english_text", "japanese")
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    """ISO 形式の文字列 / Firestore の日時を、タイムゾーンつきの datetime にする"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _accuracy(results: List[Optional[bool]]) -> Optional[float]:
+    answered = [r for r in results if r is not None]
+    return round(sum(1 for r in answered if r) / len(answered) * 100, 1) if answered else None
+
+
+def quiz_row(data: dict) -> Optional[dict]:
+    answered = data.get("answered", 0)
+    total = data.get("total_questions") or 0
+    return {
+        "student": data.get("nickname") or data.get("user_id"),
+        "app": "並べかえ・択一",
+        "activity": data.get("quiz_set"),
+        "progress": f"{answered}/{total}" if total else str(answered),
+        "done": bool(total) and answered >= total,
+        "accuracy": round(data.get("correct", 0) / answered * 100, 1) if answered else None,
+        "wpm": None,
+        "updated_at": _as_datetime(data.get("updated_at")),
+    }
+
+
+def reading_row(data: dict) -> Optional[dict]:
+    stages = [data.get(stage) for stage in READING_STAGES]
+    done = [stage for stage in stages if isinstance(stage, dict)]
+    results = []
+    wpm = None
+    for stage in done:
+        results.extend(v for k, v in stage.items() if k.startswith("is_correct_"))
+        wpm = stage.get("wpm", stage.get("wpm_japanese", wpm))
+    return {
+        "student": data.get("nickname"),
+        "app": "夏休み 読書",
+        "activity": f"教材 {data.get('material_id')}",
+        "progress": f"{len(done)}/{len(READING_STAGES)}",
+        "done": isinstance(data.get("japanese"), dict),
+        "accuracy": _accuracy(results),
+        "wpm": wpm,
+        "updated_at": _as_datetime(data.get("updated_at")),
+    }
+
+
+def rollup_row(data: dict) -> Optional[dict]:
+    if data.get("kind") != "user" or data.get("source") != "english":
+        return None
+    return {
+        "student": data.get("nickname"),
+        "app": "速読",
+        "activity": "-",
+        "progress": f"今月 {data.get('count', 0)} 回",
+        "done": True,
+        "accuracy": None,
+        "wpm": data.get("last_wpm"),
+        "updated_at": _as_datetime(data.get("last_at")),
+    }
+
+
+# (コレクション, 今日の分に絞るフィールド, 文字列で比べるか, 行の作り方)
+SOURCES: Tuple[Tuple[str, str, bool, Callable[[dict], Optional[dict]]], ...] = (
+    ("shuffle_attempts", "updated_at", False, quiz_row),
+    ("reading_attempts", "updated_at", True, reading_row),
+    (ROLLUP_COLLECTION, "updated_at", False, rollup_row),
+)
+
+
+class ClassProgress:
+    """生徒ごとの今日の状態表 (プロセスで共有)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[Tuple[str, str], dict] = {}
+        self._version = 0
+        self._day = None
+        self._watches = []
+
+    def ensure_listening(self, db) -> bool:
+        """今日の分のリスナーがなければ作る (日付が変わったときは作り直す)。作ったら True"""
+        today = datetime.now(JST).date()
+        with self._lock:
+            if self._day == today:
+                return False
+            self._day = today
+            watches, self._watches = self._watches, []
+            self._rows.clear()
+            self._version += 1
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print(f"前日のリスナーの停止に失敗しました: {e}")
+
+        start = datetime(today.year, today.month, today.day, tzinfo=JST)
+        new_watches = []
+        try:
+            for collection, field, as_string, build_row in SOURCES:
+                query = db.collection(collection).where(field, ">=", start.isoformat() if as_string else start)
+                new_watches.append(query.on_snapshot(self._callback(build_row)))
+        except Exception as e:
+            print(f"クラスの進み具合のリスナーを開始できませんでした: {e}")
+            with self._lock:
+                self._day = None   # 次に画面を開いたときにやり直す
+        with self._lock:
+            self._watches.extend(new_watches)
+        return True
+
+    def _callback(self, build_row: Callable[[dict], Optional[dict]]):
+        def on_snapshot(docs, changes, read_time):
+            with self._lock:
+                for change in changes:
+                    if change.type.name == "REMOVED":
+                        continue
+                    row = build_row(change.document.to_dict() or {})
+                    if row and row["student"]:
+                        self._update(row)
+        return on_snapshot
+
+    def _update(self, row: dict):
+        """同じ生徒・アプリの行は、より新しい更新のときだけ置き換える (ロックの中で呼ぶ)"""
+        key = (row["app"], row["student"])
+        current = self._rows.get(key)
+        if current and current["updated_at"] and row["updated_at"] and row["updated_at"] < current["updated_at"]:
+            return
+        self._version += 1
+        self._rows[key] = dict(row, version=self._version)
+
+    def snapshot(self) -> Tuple[int, List[dict]]:
+        """(現在の版, 更新の新しい順の行)"""
+        with self._lock:
+            rows = [dict(r) for r in self._rows.values()]
+            version = self._version
+        oldest = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        return version, sorted(rows, key=lambda r: r["updated_at"] or oldest, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            watches, self._watches = self._watches, []
+            self._rows.clear()
+            self._day = None
+        for watch in watches:
+            watch.unsubscribe()
+
+
+CLASS_PROGRESS = ClassProgress()
+
+
+# ==========================================
+# 🔹 画面
+# ==========================================
+def _status(row: dict, now: datetime) -> str:
+    if row["done"]:
+        return "✅ 完了"
+    if row["updated_at"] and now - row["updated_at"] > timedelta(minutes=IDLE_MINUTES):
+        return "💤 休止中"
+    return "✏️ 取り組み中"
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def _live_table(db):
+    touch_session()   # 表を見ているだけの先生も、アイドルとして破棄しない
+    CLASS_PROGRESS.ensure_listening(db)   # 日付が変わったらここで表を空にしてリスナーを作り直す
+    version, rows = CLASS_PROGRESS.snapshot()
+    last_seen = st.session_state.get("class_progress_version", 0)
+    st.session_state.class_progress_version = version
+    now = datetime.now(JST)
+
+    statuses = [_status(r, now) for r in rows]
+    col_active, col_students, col_changed = st.columns(3)
+    col_active.metric("取り組み中", statuses.count("✏️ 取り組み中"))
+    col_students.metric("今日の生徒", len({r["student"] for r in rows}))
+    col_changed.metric("前回の表示からの更新", sum(1 for r in rows if r["version"] > last_seen))
+    if not rows:
+        st.info("今日の記録はまだありません。")
+        return
+    st.dataframe([{
+        "": "🆕" if r["version"] > last_seen else "",
+        "生徒": r["student"],
+        "状態": status,
+        "アプリ": r["app"],
+        "内容": r["activity"],
+        "進み具合": r["progress"],
+        "正答率 (%)": r["accuracy"],
+        "WPM": r["wpm"],
+        "更新": r["updated_at"].astimezone(JST).strftime("%H:%M:%S") if r["updated_at"] else "-",
+    } for r, status in zip(rows, statuses)], hide_index=True, use_container_width=True)
+
+
+def render_class_progress(db):
+    st.title("👩‍🏫 クラスの今日の進み具合 (管理者のみ)")
+    st.caption(f"{REFRESH_SECONDS} 秒ごとに自動で更新します。表はこのサーバーのリスナーで更新され、表示しても Firestore は読みません。")
+    if db is None or not hasattr(db, "collection"):
+        st.warning("Firestore に接続できないため、表示できません。")
+        return
+    _live_table(db)
@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import cache_registry
+from session_memory import deep_sizeof
+
+# ==========================================
+# 🔹 コンテンツキャッシュ (stale-while-revalidate + single-flight)
+# ==========================================
+# TTL が切れた瞬間に全生徒が一斉に GitHub へ取りに行く (thundering herd) のを防ぐ。
+#
+# - 期限切れ後も max_stale 秒までは古い値を返し、裏で 1 キーにつき 1 本だけ更新する
+# - 期限には ±jitter の揺らぎを入れ、複数キーの期限が同時に来ないようにする
+# - キャッシュがない / max_stale を超えた場合だけ同期的に読み込む (同時要求は 1 回にまとめる)
+# - 更新に失敗した場合は最後に成功した値を返し続ける
+# - max_bytes を超えたら最近使われていないキーから追い出す (期限 + max_stale を過ぎたキーも捨てる)
+#
+#   cache = SwrCache(pd.read_csv, ttl=3600, max_stale=6 * 3600, name="csv", max_bytes=cache_registry.budget_mb(8))
+#   df = cache.get(url)
+
+RETRY_AFTER_ERROR = 60  # 更新失敗後、次に更新を試みるまでの秒数
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "expires_at", "refreshing")
+
+    def __init__(self, value, fetched_at: float, expires_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.refreshing = False
+
+
+class SwrCache:
+    """キーごとに最後の値を保持し、期限切れ時は古い値を返しつつ裏で 1 回だけ更新する"""
+
+    policy = "TTL+LRU"
+
+    def __init__(self, loader: Callable, ttl: float, max_stale: float, jitter: float = 0.1, name: Optional[str] = None,
+                 max_bytes: int = 0):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.jitter = jitter
+        self.name = name or getattr(loader, "__qualname__", repr(loader))
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._budget = cache_registry.ByteBudget(max_bytes)
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "evictions": 0}
+        self.last_error: Optional[str] = None
+        self.last_refresh: Optional[float] = None
+        cache_registry.register(self)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._budget.max_bytes
+
+    def _expiry(self, now: float) -> float:
+        return now + self.ttl * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def get(self, *args) -> Any:
+        key = args
+        while True:
+            now = time.time()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and now < entry.expires_at:
+                    self.stats["hits"] += 1
+                    self._budget.touch(key)
+                    return entry.value
+                if entry is not None and now < entry.expires_at + self.max_stale:
+                    self.stats["stale_hits"] += 1
+                    self._budget.touch(key)
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(target=self._refresh, args=(key,), name=f"swr-refresh:{self.name}", daemon=True).start()
+                    return entry.value
+
+                # キャッシュなし / 古すぎる場合は同期読み込み (同じキーの同時要求は 1 回にまとめる)
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            waiter.wait()
+            with self._lock:
+                if key in self._entries and time.time() < self._entries[key].expires_at + self.max_stale:
+                    continue
+            # 先行した読み込みが失敗した場合は自分で読み込む
+            with self._lock:
+                if key in self._inflight:
+                    continue
+                self._inflight[key] = threading.Event()
+                self.stats["misses"] += 1
+            break
+
+        try:
+            value = self.loader(*args)
+            self._store(key, value)
+            return value
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _refresh(self, key: Hashable):
+        try:
+            value = self.loader(*key)
+            self._store(key, value)
+            with self._lock:
+                self.stats["refreshes"] += 1
+        except Exception as e:
+            print(f"キャッシュ {self.name} の更新に失敗しました (古い値を使い続けます): {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+                    entry.expires_at = time.time() + RETRY_AFTER_ERROR
+
+    def _store(self, key: Hashable, value):
+        """値を保存し、上限を超えた分と max_stale を過ぎた分を追い出す"""
+        size = deep_sizeof(value)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = _Entry(value, now, self._expiry(now))
+            self.last_refresh = now
+            evicted = self._budget.add(key, size)
+            evicted += [k for k, e in self._entries.items()
+                        if k != key and k not in evicted and now >= e.expires_at + self.max_stale]
+            for k in evicted:
+                self._entries.pop(k, None)
+                self._budget.discard(k)
+            self.stats["evictions"] += len(evicted)
+
+    def peek(self, *args) -> Any:
+        """期限に関係なく、保持している値を返す (なければ None)"""
+        with self._lock:
+            entry = self._entries.get(args)
+            return entry.value if entry is not None else None
+
+    def prime(self, value, *args):
+        """読み込み済みの値を登録する (次の更新は TTL 経過後に裏で行われる)"""
+        self._store(args, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._budget.clear()
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self._budget.max_bytes = max_bytes
+            evicted = self._budget.overflow()
+            for k in evicted:
+                self._entries.pop(k, None)
+            self.stats["evictions"] += len(evicted)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._budget.total,
+                    "hits": self.stats["hits"] + self.stats["stale_hits"], "misses": self.stats["misses"],
+                    "evictions": self.stats["evictions"], "last_refresh": self.last_refresh}
@@ -0,0 +1,297 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import cache_registry
+from content_cache import SwrCache
+from lazy_imports import lazy_import
+from session_memory import deep_sizeof
+
+pd = lazy_import("pandas")
+
+# ==========================================
+# 🔹 コンテンツ読み込み元 (ローカル優先 + GitHub との同期)
+# ==========================================
+# data.csv / data_j.csv / user.csv はアプリと同じリポジトリに同梱されているので、
+# まずローカルのファイルを読み込み、GitHub 上の最新版は裏で定期的に確認する。
+# 内容のハッシュが変わったときだけ解析し直して新しい版に丸ごと差し替える。
+# ページの表示が GitHub の応答速度に左右されることはない。
+#
+#   MATERIAL_SOURCE = local_first_source("data.csv", GITHUB_DATA_URL)
+#   df = MATERIAL_SOURCE.get()
+#
+# リモートと同期しないファイル (shuffle_data/*.csv など) は LocalFileCache で読み込む。
+# どちらも解析結果はプロセスで 1 つだけ持ち、全セッションに同じオブジェクトを返す
+# (st.cache_data のように取り出すたびに pickle から復元しない)。
+# 返す DataFrame は freeze() で値を書き換え不可にしてあるので、列を足したり値を変えたりする場合は
+# .copy() してから行うこと。
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 設定するとこのリポジトリの GitHub URL をこのアドレスに置き換える (raw_server.py での計測・オフライン用)
+GITHUB_RAW_BASE = os.environ.get("GITHUB_RAW_BASE", "")
+REPO_URL_PREFIXES = (
+    "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/",
+    "https://raw.githubusercontent.com/boost-ogawa/english-booster/refs/heads/main/",
+    "https://github.com/boost-ogawa/english-booster/blob/main/",
+    "https://media.githubusercontent.com/media/boost-ogawa/english-booster/refs/heads/main/",
+)
+DEFAULT_SYNC_INTERVAL = 600   # GitHub の更新を確認する間隔 (秒)
+REMOTE_TIMEOUT = 10           # GitHub からの取得のタイムアウト (秒)
+
+
+class ContentVersion(NamedTuple):
+    data: object          # 解析済みのデータ (DataFrame など)
+    content_hash: str     # 元ファイルの sha256
+    origin: str           # "local" / "remote"
+    loaded_at: float
+
+
+def _sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _read_csv(content: bytes):
+    return pd.read_csv(io.BytesIO(content))
+
+
+def freeze(data):
+    """共有するデータを読み取り専用にする (DataFrame は値の配列を書き換え不可に、list は tuple に)"""
+    if isinstance(data, list):
+        return tuple(data)
+    blocks = getattr(getattr(data, "_mgr", None), "blocks", ())
+    for block in blocks:
+        values = getattr(block, "values", None)
+        flags = getattr(values, "flags", None)
+        if flags is not None and hasattr(flags, "writeable"):
+            try:
+                flags.writeable = False
+            except ValueError:
+                pass   # 他の配列のビューなどは元の配列側で保護される
+    return data
+
+
+def repo_url(url):
+    """GITHUB_RAW_BASE が設定されていれば、このリポジトリの URL をそちらに向け直す"""
+    if not GITHUB_RAW_BASE or not isinstance(url, str):
+        return url
+    for prefix in REPO_URL_PREFIXES:
+        if url.startswith(prefix):
+            return GITHUB_RAW_BASE.rstrip("/") + "/" + url[len(prefix):].split("?")[0]
+    return url
+
+
+def fetch_bytes(url: str, timeout: float = REMOTE_TIMEOUT) -> bytes:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+class LocalFirstSource:
+    """同梱ファイルを先に使い、リモートの更新を裏で取り込む読み込み元"""
+
+    def __init__(self, local_path: str, remote_url: Optional[str] = None,
+                 parser: Optional[Callable[[bytes], object]] = None,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        self.local_path = local_path
+        self.remote_url = repo_url(remote_url)
+        self.parser = parser or _read_csv
+        # 期限切れ後も古い版を返し続け、リモートの確認は 1 本だけ裏で走らせる
+        self._cache = SwrCache(self._sync, ttl=sync_interval, max_stale=float("inf"),
+                               name=f"content_source:{os.path.basename(local_path)}")
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _load_local(self) -> Optional[ContentVersion]:
+        try:
+            with open(self.local_path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        return ContentVersion(freeze(self.parser(content)), _sha256(content), "local", time.time())
+
+    def _sync(self) -> ContentVersion:
+        """リモートの内容を取得し、変わっていれば新しい版を返す (変わっていなければ今の版)"""
+        if not self.remote_url:
+            return self.current_version() or self._load_local()
+        content = fetch_bytes(self.remote_url)
+        content_hash = _sha256(content)
+        current = self.current_version()
+        if current is not None and current.content_hash == content_hash:
+            return current
+        version = ContentVersion(freeze(self.parser(content)), content_hash, "remote", time.time())
+        print(f"{os.path.basename(self.local_path)} をリモートの新しい版に差し替えました ({content_hash[:12]})")
+        return version
+
+    def _ensure_initialized(self):
+        # 診断ページでキャッシュが消去された場合も、まずローカルファイルから読み直す
+        if self._initialized and self._cache.peek() is not None:
+            return
+        with self._init_lock:
+            if self._initialized and self._cache.peek() is not None:
+                return
+            version = self._load_local()
+            if version is not None:
+                self._cache.prime(version)
+            # ローカルファイルがなければ最初の get() でリモートから同期的に読み込む
+            self._initialized = True
+
+    def current_version(self) -> Optional[ContentVersion]:
+        return self._cache.peek()
+
+    def get_version(self) -> ContentVersion:
+        self._ensure_initialized()
+        return self._cache.get()
+
+    def get(self):
+        """現在の版のデータを返す (全セッションで共有されるため書き換えないこと)"""
+        return self.get_version().data
+
+
+class LocalFileCache:
+    """ローカルファイルの解析結果をプロセスで共有する読み取り専用キャッシュ
+
+    取り出すたびにファイルの更新時刻とサイズだけを確認し、変わっていたら読み直す。
+    内容のハッシュが変わったときだけ解析し直す (版はハッシュで区別する)。
+    ファイルと派生データの合計が max_bytes を超えたら、最近使われていないものから追い出す。
+    """
+
+    policy = "LRU"
+
+    def __init__(self, parser: Optional[Callable[[bytes], object]] = None, name: str = "files", max_bytes: int = 0):
+        self.parser = parser or _read_csv
+        self.name = name
+        self._entries: Dict[str, Tuple[Tuple[int, int], ContentVersion]] = {}
+        self._derived: Dict[Tuple[str, str], object] = {}   # {(内容のハッシュ, 名前): 派生データ}
+        self._lock = threading.Lock()
+        # キーは ("file", パス) / ("derived", 内容のハッシュ, 名前)
+        self._budget = cache_registry.ByteBudget(max_bytes)
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "unchanged": 0, "evictions": 0}
+        self.last_refresh: Optional[float] = None
+        cache_registry.register(self)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._budget.max_bytes
+
+    def _evict(self, keys):
+        """ロックの中で呼ぶこと"""
+        for key in keys:
+            if key[0] == "file":
+                self._entries.pop(key[1], None)
+            else:
+                self._derived.pop(key[1:], None)
+            self._budget.discard(key)
+        self.stats["evictions"] += len(keys)
+
+    def get_version(self, path: str) -> ContentVersion:
+        stat = os.stat(path)   # ファイルがなければ FileNotFoundError
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.stats["hits"] += 1
+                self._budget.touch(("file", path))
+                return entry[1]
+            self.stats["misses"] += 1
+        with open(path, "rb") as f:
+            content = f.read()
+        content_hash = _sha256(content)
+        if entry is not None and entry[1].content_hash == content_hash:
+            version = entry[1]   # 更新時刻だけが変わった
+            self.stats["unchanged"] += 1
+        else:
+            version = ContentVersion(freeze(self.parser(content)), content_hash, "local", time.time())
+            self.stats["loads"] += 1
+        size = deep_sizeof(version.data)
+        with self._lock:
+            self._entries[path] = (stamp, version)
+            self.last_refresh = time.time()
+            if entry is not None and entry[1].content_hash != content_hash:
+                # 古い版から作った派生データはもう使われない
+                self._evict([("derived",) + key for key in self._derived if key[0] == entry[1].content_hash])
+            self._evict(self._budget.add(("file", path), size))
+        return version
+
+    def get(self, path: str):
+        """現在の版のデータを返す (全セッションで共有されるため書き換えないこと)"""
+        return self.get_version(path).data
+
+    def derive(self, path: str, name: str, build: Callable[[object], object]):
+        """ファイルの版ごとに一度だけ作る派生データ (索引など)。ファイルが変わると作り直される"""
+        version = self.get_version(path)
+        key = (version.content_hash, name)
+        with self._lock:
+            if key in self._derived:
+                self._budget.touch(("derived",) + key)
+                return self._derived[key]
+        value = freeze(build(version.data))
+        size = deep_sizeof(value)
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = value
+                self._evict(self._budget.add(("derived",) + key, size))
+            return self._derived.get(key, value)
+
+    def versions(self) -> Dict[str, ContentVersion]:
+        """読み込み済みのファイルと版 (診断用)"""
+        with self._lock:
+            return {path: entry[1] for path, entry in self._entries.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._derived.clear()
+            self._budget.clear()
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self._budget.max_bytes = max_bytes
+            self._evict(self._budget.overflow())
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries) + len(self._derived), "bytes": self._budget.total,
+                    "hits": self.stats["hits"], "misses": self.stats["misses"],
+                    "evictions": self.stats["evictions"], "last_refresh": self.last_refresh}
+
+
+_sources: Dict[str, LocalFirstSource] = {}
+_sources_lock = threading.Lock()
+_file_caches: Dict[str, LocalFileCache] = {}
+
+
+def local_first_source(relpath: str, remote_url: Optional[str] = None, **kwargs) -> LocalFirstSource:
+    """リポジトリ内のファイルに対応する読み込み元を返す (プロセス内で 1 つだけ作られる)"""
+    local_path = os.path.join(BASE_DIR, relpath)
+    with _sources_lock:
+        source = _sources.get(local_path)
+        if source is None:
+            source = LocalFirstSource(local_path, remote_url, **kwargs)
+            _sources[local_path] = source
+        return source
+
+
+def local_file_cache(name: str, parser: Optional[Callable[[bytes], object]] = None,
+                     max_bytes: int = 0) -> LocalFileCache:
+    """名前ごとのファイルキャッシュを返す (プロセス内で 1 つだけ作られる)"""
+    with _sources_lock:
+        cache = _file_caches.get(name)
+        if cache is None:
+            cache = LocalFileCache(parser, name, max_bytes)
+            _file_caches[name] = cache
+        return cache
+
+
+def registered_sources() -> Dict[str, LocalFirstSource]:
+    """このプロセスで作られた読み込み元の一覧 (診断用)"""
+    with _sources_lock:
+        return dict(_sources)
+
+
+def registered_file_caches() -> Dict[str, LocalFileCache]:
+    """このプロセスで作られたファイルキャッシュの一覧 (診断用)"""
+    with _sources_lock:
+        return dict(_file_caches)
@@ -0,0 +1,147 @@
+import os
+import time
+
+import streamlit as st
+
+import cache_registry
+import content_source
+import firestore_trace
+import perf_metrics
+import session_memory
+from lazy_imports import import_times
+from warmup import warmup_status
+
+# ==========================================
+# 🔹 管理者用 診断ページ
+# ==========================================
+# 各アプリの隠しページ (管理者のみ) から呼び出す。
+# このプロセスで集計した値のみを表示する (Streamlit Cloud の再起動でリセットされる)。
+
+
+def render_diagnostics():
+    st.title("🩺 診断 (管理者のみ)")
+
+    st.subheader("ページ別 描画時間")
+    rows = perf_metrics.page_stats()
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    else:
+        st.info("まだ計測データがありません。")
+
+    st.subheader("ステップ別 所要時間")
+    rows = perf_metrics.step_stats()
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    else:
+        st.info("まだ計測データがありません。")
+
+    if st.button("計測値をリセット", key="diagnostics_reset_perf"):
+        perf_metrics.reset_stats()
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("Firestore 操作")
+    rows = firestore_trace.op_stats()
+    if rows:
+        total_reads = sum(r["reads"] for r in rows)
+        total_writes = sum(r["writes"] for r in rows)
+        st.write(f"読み取り **{total_reads}** 件 / 書き込み **{total_writes}** 件")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.caption("ユーザー別")
+        st.dataframe(firestore_trace.user_stats(), hide_index=True, use_container_width=True)
+    else:
+        st.info("まだ Firestore の操作はありません。")
+
+    events = firestore_trace.budget_events()
+    if events:
+        st.warning(f"読み取り上限を超えた再実行: {len(events)} 回")
+        st.dataframe([{**e, "ts": time.strftime("%m/%d %H:%M:%S", time.localtime(e["ts"]))} for e in events],
+                     hide_index=True, use_container_width=True)
+
+    if st.button("Firestore の集計をリセット", key="diagnostics_reset_firestore"):
+        firestore_trace.reset_stats()
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("セッションのメモリ")
+    sessions = session_memory.session_report()
+    if sessions:
+        sizes = [r["kb"] for r in sessions]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("セッション数", len(sessions))
+        col2.metric("合計", f"{sum(sizes) / 1024:.1f} MB")
+        col3.metric("平均", f"{sum(sizes) / len(sizes):.0f} KB")
+        col4.metric("最大", f"{max(sizes):.0f} KB")
+        st.dataframe(sessions, hide_index=True, use_container_width=True)
+        st.caption("キー別 (全セッション合計の大きい順)")
+        st.dataframe(session_memory.key_report()[:20], hide_index=True, use_container_width=True)
+    else:
+        st.info("まだ登録されたセッションはありません。")
+
+    evicted = session_memory.eviction_stats()
+    st.caption(f"アイドルセッションの整理: {session_memory.IDLE_EXPIRE_SECONDS / 60:.0f} 分で破棄 "
+               f"(これまでに破棄 {evicted['expired_sessions']} セッション・{evicted['freed_bytes'] / 1024:.0f} KB)")
+    if st.button("アイドルセッションを今すぐ整理", key="diagnostics_evict_sessions"):
+        session_memory.evict_idle_sessions(force=True)
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("共有コンテンツ")
+    versions = [(path, source.current_version()) for path, source in content_source.registered_sources().items()]
+    for cache in content_source.registered_file_caches().values():
+        versions += list(cache.versions().items())
+    rows = [{"file": os.path.relpath(path, content_source.BASE_DIR), "hash": version.content_hash[:12],
+             "origin": version.origin, "loaded_at": time.strftime("%m/%d %H:%M:%S", time.localtime(version.loaded_at))}
+            for path, version in versions if version is not None]
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    else:
+        st.info("まだ読み込まれたコンテンツはありません。")
+
+    st.markdown("---")
+    st.subheader("キャッシュ")
+    rows = cache_registry.report()
+    if rows:
+        st.write(f"合計 **{cache_registry.total_bytes() / 1024:.0f} KB** "
+                 f"(上限は CACHE_BUDGET_SCALE={cache_registry.BUDGET_SCALE:g} 倍)")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        col_name, col_budget, col_actions = st.columns([2, 1, 2])
+        with col_name:
+            name = st.selectbox("キャッシュ", [row["cache"] for row in rows], key="diagnostics_cache_name")
+        with col_budget:
+            budget_kb = st.number_input("上限 (KB, 0 で無制限)", min_value=0, step=256,
+                                        value=int((next(r["budget_kb"] for r in rows if r["cache"] == name) or 0)),
+                                        key=f"diagnostics_cache_budget_{name}")
+        with col_actions:
+            st.markdown("<div style='margin-top: 28px;'></div>", unsafe_allow_html=True)
+            col_apply, col_flush = st.columns(2)
+            if col_apply.button("上限を変更", key="diagnostics_cache_set_budget"):
+                cache_registry.set_budget(name, int(budget_kb * 1024))
+                st.rerun()
+            if col_flush.button("このキャッシュを消去", key="diagnostics_cache_flush"):
+                cache_registry.flush(name)
+                st.rerun()
+    else:
+        st.info("登録されたキャッシュはありません。")
+
+    st.markdown("---")
+    st.subheader("起動時ウォームアップ")
+    status = warmup_status()
+    if status["started_at"]:
+        finished = status["finished_at"] or time.time()
+        st.write(f"状態: **{status['state']}** / {finished - status['started_at']:.2f} 秒")
+        st.dataframe(
+            [{"source": name, "ms": round(info["seconds"] * 1000, 1), "ok": info["ok"], "error": info["error"]}
+             for name, info in status["sources"].items()],
+            hide_index=True, use_container_width=True,
+        )
+    else:
+        st.info("ウォームアップは実行されていません。")
+
+    st.subheader("遅延インポート")
+    times = import_times()
+    if times:
+        st.dataframe([{"module": name, "ms": round(sec * 1000, 1)} for name, sec in times.items()],
+                     hide_index=True, use_container_width=True)
+    else:
+        st.info("遅延インポートされたモジュールはまだありません。")
@@ -0,0 +1,280 @@
+"""Firestore の結果コレクションを Parquet に書き出す管理者向けツール
+
+コレクションをドキュメント ID 順に order_by + start_after のカーソルで BATCH_SIZE 件ずつ読み、
+1 バッチを Parquet の 1 行グループとして書くので、コレクションの大きさに関係なくメモリは一定。
+
+    exports/{collection}/part-00000.parquet, part-00001.parquet, ...
+    exports/{collection}/_cursor.json   最後に書き終えたパートと、その最後のドキュメント ID
+
+パートは ROWS_PER_FILE 行ごとに閉じ (書き込み中は _part-xxxxx.parquet.tmp、閉じたら名前を変える)、
+閉じるたびにカーソルを保存する。途中で止まっても、もう一度実行すれば保存済みのカーソルの続きから書き出す。
+自動 ID は順序がランダムなので、書き出し後に追加されたドキュメントまで含めるときは --restart で最初から書き出すこと。
+
+列はコレクションごとの SCHEMAS で型を固定する:
+  - id / material_id のように int と str が混在する値は文字列にそろえる
+  - timestamp は ISO 形式の文字列と Firestore の日時のどちらも UTC の timestamp にする
+  - 配列・マップは JSON 文字列 ("english.wpm" のようにマップの中の値を列にすることもできる)
+  - スキーマにないフィールドは _extra 列に JSON でまとめる
+
+    python export_results.py                                  # すべての結果コレクション
+    python export_results.py results shuffle_attempts --batch-size 200
+    FIRESTORE_BACKEND=fake python export_results.py --out /tmp/exports
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from lazy_imports import lazy_import
+import fake_firestore
+
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "exports")
+DEFAULT_CREDENTIALS = "serviceAccountKey.json"
+BATCH_SIZE = 500               # 1 回のクエリで読むドキュメント数 (= Parquet の行グループ)
+ROWS_PER_FILE = 100_000        # パート 1 つあたりの最大行数
+DOCUMENT_ID = "__name__"       # FieldPath.document_id()
+
+# {コレクション: {列名 (ドット区切りでマップの中): 型}}  型: str / int / float / bool / timestamp / json
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "results": {
+        "nickname": "str", "timestamp": "timestamp", "month": "str", "material_id": "str",
+        "wpm": "float", "correct_answers": "int", "practice_count": "int", "practice": "json",
+        "updated_at": "timestamp",
+    },
+    "shuffle_results": {
+        "user_id": "str", "nickname": "str", "quiz_set": "str", "quiz_type": "str", "id": "str",
+        "user_answer": "str", "is_correct": "bool", "timestamp": "timestamp",
+    },
+    "shuffle_attempts": {
+        "user_id": "str", "nickname": "str", "quiz_set": "str", "started_at": "timestamp",
+        "total_questions": "int", "answered": "int", "correct": "int", "incorrect": "int",
+        "answers": "json", "updated_at": "timestamp",
+    },
+    "english_results": {
+        "nickname": "str", "timestamp": "timestamp", "material_id": "str", "wpm": "float",
+        "comprehension_score": "int", "is_correct_q1_text": "bool", "is_correct_q2_text": "bool",
+    },
+    "english_text_results": {
+        "nickname": "str", "timestamp": "timestamp", "material_id": "str",
+        "is_correct_q1_text": "bool", "is_correct_q2_text": "bool",
+        "user_answer_q1": "json", "user_answer_q2": "json",
+    },
+    "japanese_results": {
+        "nickname": "str", "timestamp": "timestamp", "material_id": "str", "wpm_japanese": "float",
+        "is_correct_q1_ja": "bool", "is_correct_q2_ja": "bool", "is_correct_q3_ja": "bool",
+    },
+    "reading_attempts": {
+        "nickname": "str", "material_id": "str", "started_at": "timestamp", "updated_at": "timestamp",
+        "english.wpm": "float", "english.comprehension_score": "int", "english.timestamp": "timestamp",
+        "english_text.is_correct_q1_text": "bool", "english_text.is_correct_q2_text": "bool",
+        "english_text.user_answer_q1": "json", "english_text.user_answer_q2": "json",
+        "english_text.timestamp": "timestamp",
+        "japanese.wpm_japanese": "float", "japanese.is_correct_q1_ja": "bool",
+        "japanese.is_correct_q2_ja": "bool", "japanese.is_correct_q3_ja": "bool",
+        "japanese.timestamp": "timestamp",
+    },
+}
+DEFAULT_COLLECTIONS = tuple(SCHEMAS)
+
+
+# ==========================================
+# 🔹 値の正規化
+# ==========================================
+def _to_timestamp(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):   # Firestore の DatetimeWithNanoseconds も datetime のサブクラス
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _to_str(value) -> Optional[str]:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)                # 3.0 と "3" を同じ ID にそろえる
+    return str(value)
+
+
+def _to_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+_CONVERTERS = {
+    "str": _to_str,
+    "int": lambda v: int(v) if not isinstance(v, str) or v.strip().lstrip("-").isdigit() else None,
+    "float": float,
+    "bool": lambda v: v if isinstance(v, bool) else None,
+    "timestamp": _to_timestamp,
+    "json": _to_json,
+}
+
+
+def arrow_schema(columns: Dict[str, str]):
+    types = {
+        "str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"), "json": pa.string(),
+    }
+    fields = [pa.field("_doc_id", pa.string(), nullable=False)]
+    fields += [pa.field(name, types[kind]) for name, kind in columns.items()]
+    fields.append(pa.field("_extra", pa.string()))
+    return pa.schema(fields)
+
+
+def _get_path(data: dict, path: str):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def normalize_row(doc_id: str, data: dict, columns: Dict[str, str]) -> dict:
+    """ドキュメントをスキーマどおりの 1 行にする (変換できない値は None、スキーマにない値は _extra)"""
+    row = {"_doc_id": doc_id}
+    for name, kind in columns.items():
+        value = _get_path(data, name)
+        try:
+            row[name] = None if value is None else _CONVERTERS[kind](value)
+        except (TypeError, ValueError):
+            row[name] = None
+    covered = {name.split(".")[0] for name in columns}
+    extra = {key: value for key, value in data.items() if key not in covered}
+    row["_extra"] = _to_json(extra) if extra else None
+    return row
+
+
+# ==========================================
+# 🔹 カーソルでのページング・書き出し
+# ==========================================
+def iter_batches(db, collection: str, batch_size: int, last_id: Optional[str]) -> Iterator[List]:
+    """ドキュメント ID 順に batch_size 件ずつ返す (前のバッチの最後の ID から続ける)"""
+    while True:
+        query = db.collection(collection).order_by(DOCUMENT_ID).limit(batch_size)
+        if last_id is not None:
+            query = query.start_after({DOCUMENT_ID: last_id})
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield docs
+        last_id = docs[-1].id
+        if len(docs) < batch_size:
+            return
+
+
+def _cursor_path(out_dir: str) -> str:
+    return os.path.join(out_dir, "_cursor.json")
+
+
+def load_cursor(out_dir: str) -> dict:
+    try:
+        with open(_cursor_path(out_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_id": None, "part": 0, "rows": 0}
+
+
+def save_cursor(out_dir: str, cursor: dict):
+    tmp = _cursor_path(out_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cursor, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _cursor_path(out_dir))
+
+
+def export_collection(db, collection: str, out_root: str, batch_size: int = BATCH_SIZE,
+                      rows_per_file: int = ROWS_PER_FILE, restart: bool = False) -> dict:
+    """1 つのコレクションを書き出し、{"collection", "rows", "parts", "seconds"} を返す"""
+    out_dir = os.path.join(out_root, collection)
+    os.makedirs(out_dir, exist_ok=True)
+    if restart:
+        for name in os.listdir(out_dir):
+            if name.startswith(("part-", "_part-")) or name == "_cursor.json":
+                os.remove(os.path.join(out_dir, name))
+    cursor = load_cursor(out_dir)
+    columns = SCHEMAS.get(collection, {})
+    schema = arrow_schema(columns)
+
+    start = time.perf_counter()
+    new_rows = 0
+    writer, part_path, tmp_path, part_rows, part_last_id = None, None, None, 0, None
+
+    def close_part():
+        nonlocal writer, part_rows
+        writer.close()
+        os.replace(tmp_path, part_path)
+        cursor.update(last_id=part_last_id, part=cursor["part"] + 1, rows=cursor["rows"] + part_rows)
+        save_cursor(out_dir, cursor)
+        writer, part_rows = None, 0
+
+    for docs in iter_batches(db, collection, batch_size, cursor["last_id"]):
+        if writer is None:
+            part_name = f"part-{cursor['part']:05d}.parquet"
+            part_path = os.path.join(out_dir, part_name)
+            tmp_path = os.path.join(out_dir, f"_{part_name}.tmp")   # "_" で始まるファイルは Parquet の読み込みで無視される
+            writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+        rows = [normalize_row(doc.id, doc.to_dict() or {}, columns) for doc in docs]
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        part_rows += len(rows)
+        new_rows += len(rows)
+        part_last_id = docs[-1].id
+        if part_rows >= rows_per_file:
+            close_part()
+    if writer is not None:
+        close_part()
+
+    return {"collection": collection, "rows": new_rows, "total_rows": cursor["rows"],
+            "parts": cursor["part"], "seconds": round(time.perf_counter() - start, 1)}
+
+
+def client(credentials_path: str = DEFAULT_CREDENTIALS):
+    """コマンドライン用の Firestore クライアント (FIRESTORE_BACKEND=fake ならインメモリ)"""
+    if fake_firestore.enabled():
+        return firestore.client()
+    import firebase_admin
+    from firebase_admin import credentials
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+    return firestore.client()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firestore の結果コレクションを Parquet に書き出す")
+    parser.add_argument("collections", nargs="*", default=list(DEFAULT_COLLECTIONS),
+                        help=f"書き出すコレクション (既定: {', '.join(DEFAULT_COLLECTIONS)})")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="書き出し先のディレクトリ")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="1 回のクエリで読むドキュメント数")
+    parser.add_argument("--rows-per-file", type=int, default=ROWS_PER_FILE, help="パート 1 つあたりの最大行数")
+    parser.add_argument("--restart", action="store_true", help="保存済みのカーソルとパートを消して最初から書き出す")
+    parser.add_argument("--credentials", default=DEFAULT_CREDENTIALS, help="サービスアカウントキーの JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        pa.__version__
+    except ImportError:
+        print("pyarrow が必要です: pip install pyarrow")
+        return 1
+
+    db = client(args.credentials)
+    for collection in args.collections:
+        if collection not in SCHEMAS:
+            print(f"⚠️ {collection} のスキーマがないため、すべてのフィールドを _extra に書き出します")
+        result = export_collection(db, collection, args.out, args.batch_size, args.rows_per_file, args.restart)
+        print(f"{result['collection']:<24} 今回 {result['rows']:>8} 行 / 合計 {result['total_rows']:>8} 行 "
+              f"/ パート {result['parts']} / {result['seconds']} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,665 @@
+import copy
+import enum
+import os
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# ==========================================
+# 🔹 インメモリの Firestore (オフラインでの動作確認・ベンチマーク用)
+# ==========================================
+# firebase_admin.firestore と同じ名前 (client / SERVER_TIMESTAMP / ArrayUnion など) を持つので、
+# アプリ側ではモジュールを差し替えるだけで使える。データはプロセス内のメモリにだけ保持する。
+#
+#   FIRESTORE_BACKEND=fake streamlit run app_j.py
+#
+# 呼び出しごとの遅延と失敗は環境変数または configure() で設定する:
+#   FAKE_FIRESTORE_LATENCY_MS   RPC 1 回あたりの遅延 (ミリ秒)
+#   FAKE_FIRESTORE_JITTER_MS    遅延の揺らぎ (± ミリ秒)
+#   FAKE_FIRESTORE_FAILURE_RATE RPC が Unavailable で失敗する確率 (0-1)
+#
+# 対応しているのはアプリで使っている範囲のみ:
+#   collection().add / document().get / set(merge) / update / create / delete,
+#   where / order_by (ドキュメント ID の "__name__" を含む) / limit / offset / start_after の連結, get / stream,
+#   on_snapshot (クエリの結果が変わるたびに、リスナーごとのスレッドからコールバックを呼ぶ),
+#   SERVER_TIMESTAMP / ArrayUnion / ArrayRemove / Increment / Maximum / Minimum / DELETE_FIELD, batch,
+#   transaction + transactional (実行中はクライアントのロックを持つだけの簡易版)
+
+
+def enabled() -> bool:
+    """FIRESTORE_BACKEND=fake のとき、アプリは本物の代わりにこのモジュールを使う"""
+    return os.environ.get("FIRESTORE_BACKEND", "").lower() == "fake"
+
+
+# --- 例外 (google.api_core.exceptions と同じ名前) ---
+class NotFound(Exception):
+    pass
+
+
+class AlreadyExists(Exception):
+    pass
+
+
+class Unavailable(Exception):
+    pass
+
+
+# --- 値の変換 (センチネル) ---
+class _Sentinel:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"<{self.name}>"
+
+
+SERVER_TIMESTAMP = _Sentinel("SERVER_TIMESTAMP")
+DELETE_FIELD = _Sentinel("DELETE_FIELD")
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class Maximum:
+    def __init__(self, value):
+        self.value = value
+
+
+class Minimum:
+    def __init__(self, value):
+        self.value = value
+
+
+def _transform(value, current):
+    """センチネルを実際の値に置き換える。本物の firebase_admin のセンチネルも名前で判定する"""
+    kind = type(value).__name__
+    if value is SERVER_TIMESTAMP or (kind == "Sentinel" and "timestamp" in str(getattr(value, "description", "")).lower()):
+        return datetime.now(timezone.utc)
+    if kind == "ArrayUnion":
+        result = list(current) if isinstance(current, list) else []
+        for v in value.values:
+            if v not in result:
+                result.append(v)
+        return result
+    if kind == "ArrayRemove":
+        result = list(current) if isinstance(current, list) else []
+        return [v for v in result if v not in value.values]
+    if kind == "Increment":
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if kind in ("Maximum", "Minimum"):
+        if not isinstance(current, (int, float)):
+            return value.value
+        return max(current, value.value) if kind == "Maximum" else min(current, value.value)
+    return copy.deepcopy(value)
+
+
+def _is_delete(value) -> bool:
+    return value is DELETE_FIELD or (type(value).__name__ == "Sentinel"
+                                     and "delete" in str(getattr(value, "description", "")).lower())
+
+
+def _get_field(data: dict, field_path: str):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+
+def _apply_fields(data: dict, fields: dict, dotted: bool) -> dict:
+    """fields を data に書き込む (update はドット区切りのパスを入れ子として扱う)"""
+    for key, value in fields.items():
+        parts = key.split(".") if dotted else [key]
+        target = data
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+        last = parts[-1]
+        if _is_delete(value):
+            target.pop(last, None)
+        elif isinstance(value, dict) and not dotted:
+            target[last] = _apply_fields(target.get(last) if isinstance(target.get(last), dict) else {}, value, False)
+        else:
+            target[last] = _transform(value, target.get(last))
+    return data
+
+
+# --- スナップショット ---
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[dict],
+                 create_time: Optional[datetime] = None, update_time: Optional[datetime] = None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = datetime.now(timezone.utc)
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str):
+        if self._data is None:
+            return None
+        return copy.deepcopy(_get_field(self._data, field_path))
+
+
+# --- 参照とクエリ ---
+DOCUMENT_ID = "__name__"
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client: "FakeFirestoreClient", path: str, filters=(), orders=(),
+                 limit_count: Optional[int] = None, offset_count: int = 0, cursor=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._offset = offset_count
+        self._cursor = cursor
+
+    def _copy(self, **changes) -> "Query":
+        params = dict(filters=self._filters, orders=self._orders, limit_count=self._limit,
+                      offset_count=self._offset, cursor=self._cursor)
+        params.update(changes)
+        return Query(self._client, self._path, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:   # FieldFilter(field_path, op_string, value)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"未対応の演算子です: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit_count=count)
+
+    def offset(self, count: int):
+        return self._copy(offset_count=count)
+
+    def start_after(self, document_fields):
+        return self._copy(cursor=document_fields)
+
+    def select(self, field_paths):
+        return self   # 取得するフィールドの絞り込みは件数に影響しないので無視する
+
+    def _matches(self, data: dict) -> bool:
+        for field_path, op_string, value in self._filters:
+            try:
+                field_value = _get_field(data, field_path)
+            except KeyError:
+                return False
+            try:
+                if not _OPERATORS[op_string](field_value, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _sort_key(self, snapshot: DocumentSnapshot):
+        key = []
+        for field_path, _ in self._orders:
+            try:
+                key.append(_order_value(snapshot, field_path))
+            except KeyError:
+                key.append(None)
+        return key
+
+    def _run(self) -> List[DocumentSnapshot]:
+        snapshots = [s for s in self._client._collection_snapshots(self._path) if self._matches(s._data)]
+        # order_by のフィールドを持たないドキュメントは Firestore と同様に結果から外れる
+        for field_path, _ in self._orders:
+            snapshots = [s for s in snapshots if field_path == DOCUMENT_ID or _has_field(s._data, field_path)]
+        for field_path, direction in reversed(self._orders):
+            snapshots.sort(key=lambda s: _order_value(s, field_path), reverse=(direction == Query.DESCENDING))
+        if self._cursor is not None:
+            snapshots = self._after_cursor(snapshots)
+        snapshots = snapshots[self._offset:]
+        if self._limit is not None:
+            snapshots = snapshots[:self._limit]
+        return snapshots
+
+    def _after_cursor(self, snapshots: List[DocumentSnapshot]) -> List[DocumentSnapshot]:
+        cursor = self._cursor
+        if isinstance(cursor, DocumentSnapshot):
+            for i, s in enumerate(snapshots):
+                if s.reference.path == cursor.reference.path:
+                    return snapshots[i + 1:]
+            cursor = {field_path: _order_value(cursor, field_path) for field_path, _ in self._orders}
+        if isinstance(cursor, dict):
+            cursor = [cursor.get(field_path) for field_path, _ in self._orders]
+        cursor = list(cursor)
+        for i, s in enumerate(snapshots):
+            key = self._sort_key(s)[:len(cursor)]
+            descending = self._orders and self._orders[0][1] == Query.DESCENDING
+            if (key < cursor) if descending else (key > cursor):
+                return snapshots[i:]
+        return []
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        self._client._rpc("query")
+        return self._run()
+
+    def on_snapshot(self, callback) -> "Watch":
+        """callback(docs, changes, read_time) を、最初に 1 回と、結果が変わるたびに呼ぶ"""
+        self._client._rpc("listen")
+        return self._client._listen(self, callback)
+
+    def stream(self, transaction=None):
+        self._client._rpc("query")
+        yield from self._run()
+
+
+def _order_value(snapshot: DocumentSnapshot, field_path: str):
+    """order_by("__name__") (FieldPath.document_id()) はドキュメント ID で並べる"""
+    if field_path == DOCUMENT_ID:
+        return snapshot.id
+    return _get_field(snapshot._data, field_path)
+
+
+# --- リスナー (on_snapshot) ---
+class ChangeType(enum.Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, change_type: ChangeType, document: DocumentSnapshot, old_index: int, new_index: int):
+        self.type = change_type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+class Watch:
+    """on_snapshot の戻り値。unsubscribe() で止める
+
+    本物と同じく、コールバックは書き込んだスレッドではなくリスナーごとのスレッドから呼ぶ。
+    続けて書き込まれたときは、まとめて 1 回のコールバックになることがある。
+    """
+
+    def __init__(self, client: "FakeFirestoreClient", query: "Query", callback):
+        self._client = client
+        self._query = query
+        self._callback = callback
+        self._known: Dict[str, Tuple[int, Optional[datetime]]] = {}   # ID -> (位置, 更新時刻)
+        self._lock = threading.Lock()
+        self._initial = True
+        self._pending = threading.Event()
+        self._thread = threading.Thread(target=self._dispatch, name="fake_firestore_watch", daemon=True)
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+        self._pending.set()
+        self._client._unlisten(self)
+
+    def _start(self):
+        self._pending.set()   # 最初の結果
+        self._thread.start()
+
+    def _wake(self):
+        self._pending.set()
+
+    def _dispatch(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            if not self.active:
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"fake firestore: リスナーのコールバックでエラーが発生しました: {e}")
+
+    def _refresh(self):
+        with self._lock:
+            if not self.active:
+                return
+            docs = self._query._run()
+            current = {s.id: (i, s.update_time) for i, s in enumerate(docs)}
+            changes = []
+            for i, s in enumerate(docs):
+                previous = self._known.get(s.id)
+                if previous is None:
+                    changes.append(DocumentChange(ChangeType.ADDED, s, -1, i))
+                elif previous[1] != s.update_time:
+                    changes.append(DocumentChange(ChangeType.MODIFIED, s, previous[0], i))
+            for doc_id, (index, _) in self._known.items():
+                if doc_id not in current:
+                    changes.append(DocumentChange(ChangeType.REMOVED, self._client._snapshot(
+                        DocumentReference(self._client, f"{self._query._path}/{doc_id}")), index, -1))
+            self._known = current
+            initial, self._initial = self._initial, False
+            if changes or initial:
+                self._callback(docs, changes, datetime.now(timezone.utc))
+
+
+def _has_field(data: dict, field_path: str) -> bool:
+    try:
+        _get_field(data, field_path)
+        return True
+    except KeyError:
+        return False
+
+
+def _auto_id() -> str:
+    return "".join(random.choices(string.ascii_letters + string.digits, k=20))
+
+
+class CollectionReference(Query):
+
+    def __init__(self, client: "FakeFirestoreClient", path: str):
+        super().__init__(client, path)
+
+    @property
+    def id(self) -> str:
+        return self._path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> "DocumentReference":
+        return DocumentReference(self._client, f"{self._path}/{document_id or _auto_id()}")
+
+    def add(self, document_data: dict, document_id: Optional[str] = None) -> Tuple[datetime, "DocumentReference"]:
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self):
+        return [s.reference for s in self._client._collection_snapshots(self._path)]
+
+
+class DocumentReference:
+
+    def __init__(self, client: "FakeFirestoreClient", path: str):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        self._client._rpc("get")
+        return self._client._snapshot(self)
+
+    def set(self, document_data: dict, merge: bool = False):
+        self._client._rpc("set")
+        self._client._write(self, "set", document_data, merge=merge)
+
+    def update(self, field_updates: dict):
+        self._client._rpc("update")
+        self._client._write(self, "update", field_updates)
+
+    def create(self, document_data: dict):
+        self._client._rpc("create")
+        self._client._write(self, "create", document_data)
+
+    def delete(self):
+        self._client._rpc("delete")
+        self._client._write(self, "delete", None)
+
+
+class WriteBatch:
+    """commit() 時にまとめて反映する (途中で失敗した場合は何も反映しない)"""
+
+    def __init__(self, client: "FakeFirestoreClient"):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: DocumentReference, document_data: dict, merge: bool = False):
+        self._writes.append((reference, "set", document_data, merge))
+        return self
+
+    def update(self, reference: DocumentReference, field_updates: dict):
+        self._writes.append((reference, "update", field_updates, False))
+        return self
+
+    def create(self, reference: DocumentReference, document_data: dict):
+        self._writes.append((reference, "create", document_data, False))
+        return self
+
+    def delete(self, reference: DocumentReference):
+        self._writes.append((reference, "delete", None, False))
+        return self
+
+    def commit(self):
+        self._client._rpc("commit")
+        writes = self._apply()
+        self._notify(writes)
+        return [datetime.now(timezone.utc) for _ in writes]
+
+    def _apply(self) -> list:
+        with self._client._lock:
+            backup = copy.deepcopy(self._client._docs)
+            try:
+                for reference, kind, data, merge in self._writes:
+                    self._client._apply_write(reference, kind, data, merge=merge)
+            except Exception:
+                self._client._docs = backup
+                raise
+        writes, self._writes = self._writes, []
+        return writes
+
+    def _notify(self, writes: list):
+        if self._client._watches:
+            for reference in {reference.path: reference for reference, _, _, _ in writes}.values():
+                self._client._notify(reference)
+
+
+class Transaction(WriteBatch):
+    """transactional() の関数の中で get(transaction=...) と set / update などを行い、最後にまとめて反映する"""
+
+    def _commit(self) -> list:
+        """本物と同じく transactional() から呼ばれる。反映した書き込みを返す (通知はロックを放してから)"""
+        return self._apply()
+
+
+def transactional(func):
+    """firestore.transactional と同じ呼び方。実行中はクライアントのロックを持つので、読み取りから反映までにほかの書き込みは入らない"""
+    def run(transaction: Transaction, *args, **kwargs):
+        client = transaction._client
+        client._rpc("commit")
+        with client._lock:
+            result = func(transaction, *args, **kwargs)
+            writes = transaction._commit()
+        transaction._notify(writes)
+        return result
+    return run
+
+
+# --- クライアント ---
+class FakeFirestoreClient:
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self._docs: Dict[str, dict] = {}   # パス -> {"data", "create_time", "update_time"}
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._fail_next: List[Optional[str]] = []
+        self.rpc_counts: Dict[str, int] = {}
+        self._watches: List[Watch] = []
+        self.configure(latency_ms=latency_ms, jitter_ms=jitter_ms, failure_rate=failure_rate)
+
+    def configure(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                  failure_rate: Optional[float] = None):
+        """遅延と失敗率を変更する (None の項目はそのまま)"""
+        if latency_ms is not None:
+            self.latency_ms = latency_ms
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if failure_rate is not None:
+            self.failure_rate = failure_rate
+
+    def fail_next(self, count: int = 1, op: Optional[str] = None):
+        """次の count 回の RPC (op を指定した場合はその種類のみ) を Unavailable で失敗させる"""
+        with self._lock:
+            self._fail_next.extend([op] * count)
+
+    def _rpc(self, op: str):
+        with self._lock:
+            self.rpc_counts[op] = self.rpc_counts.get(op, 0) + 1
+            delay_ms = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+            fail = self._random.random() < self.failure_rate
+            for i, target in enumerate(self._fail_next):
+                if target is None or target == op:
+                    del self._fail_next[i]
+                    fail = True
+                    break
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        if fail:
+            raise Unavailable(f"503 fake firestore: {op} に失敗しました (故意の失敗)")
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def document(self, path: str) -> DocumentReference:
+        return DocumentReference(self, path)
+
+    def collections(self) -> List[CollectionReference]:
+        with self._lock:
+            names = sorted({path.split("/", 1)[0] for path in self._docs})
+        return [CollectionReference(self, name) for name in names]
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    def _snapshot(self, reference: DocumentReference) -> DocumentSnapshot:
+        with self._lock:
+            stored = self._docs.get(reference.path)
+            if stored is None:
+                return DocumentSnapshot(reference, None)
+            return DocumentSnapshot(reference, copy.deepcopy(stored["data"]),
+                                    stored["create_time"], stored["update_time"])
+
+    def _collection_snapshots(self, path: str) -> List[DocumentSnapshot]:
+        depth = path.count("/") + 1
+        with self._lock:
+            paths = [p for p in self._docs if p.startswith(path + "/") and p.count("/") == depth]
+            return [self._snapshot(DocumentReference(self, p)) for p in sorted(paths)]
+
+    def _listen(self, query: "Query", callback) -> Watch:
+        watch = Watch(self, query, callback)
+        with self._lock:
+            self._watches.append(watch)
+        watch._start()
+        return watch
+
+    def _unlisten(self, watch: Watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, reference: DocumentReference):
+        collection_path = reference.path.rsplit("/", 1)[0]
+        with self._lock:
+            watches = [w for w in self._watches if w._query._path == collection_path]
+        for watch in watches:
+            watch._wake()
+
+    def _write(self, reference: DocumentReference, kind: str, data: Optional[dict], merge: bool = False):
+        self._apply_write(reference, kind, data, merge)
+        if self._watches:
+            self._notify(reference)
+
+    def _apply_write(self, reference: DocumentReference, kind: str, data: Optional[dict], merge: bool = False):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            stored = self._docs.get(reference.path)
+            if kind == "delete":
+                self._docs.pop(reference.path, None)
+                return
+            if kind == "create" and stored is not None:
+                raise AlreadyExists(f"409 Document already exists: {reference.path}")
+            if kind == "update" and stored is None:
+                raise NotFound(f"404 No document to update: {reference.path}")
+            if kind == "update":
+                new_data = _apply_fields(copy.deepcopy(stored["data"]), data, dotted=True)
+            elif kind == "set" and merge and stored is not None:
+                new_data = _apply_fields(copy.deepcopy(stored["data"]), data, dotted=False)
+            else:
+                new_data = _apply_fields({}, data, dotted=False)
+            self._docs[reference.path] = {
+                "data": new_data,
+                "create_time": stored["create_time"] if stored is not None else now,
+                "update_time": now,
+            }
+
+    def reset(self):
+        """保存されているドキュメントと RPC の回数を消す"""
+        with self._lock:
+            self._docs.clear()
+            self.rpc_counts.clear()
+            self._fail_next.clear()
+            watches, self._watches = self._watches, []
+        for watch in watches:
+            watch.active = False
+            watch._wake()
+
+
+_client: Optional[FakeFirestoreClient] = None
+_client_lock = threading.Lock()
+
+
+def client(app=None) -> FakeFirestoreClient:
+    """プロセス内で共有するクライアント (firebase_admin.firestore.client() と同じ呼び方)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FakeFirestoreClient(
+                latency_ms=float(os.environ.get("FAKE_FIRESTORE_LATENCY_MS", "0")),
+                jitter_ms=float(os.environ.get("FAKE_FIRESTORE_JITTER_MS", "0")),
+                failure_rate=float(os.environ.get("FAKE_FIRESTORE_FAILURE_RATE", "0")),
+            )
+        return _client
@@ -0,0 +1,322 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import perf_metrics
+
+# ==========================================
+# 🔹 Firestore 操作のトレース
+# ==========================================
+# Firestore は読み取り・書き込みの件数で課金されるため、クライアントを薄いラッパーで包み、
+# 操作ごとに (アプリ, ページ, ユーザー, 呼び出し元) 単位で件数と RPC の所要時間を集計する。
+# 再実行 1 回の読み取り件数がページごとの上限を超えたら警告として記録する。
+#
+#   @st.cache_resource
+#   def init_firestore():
+#       ...
+#       return trace_client(firestore.client())
+#
+# 件数は Firestore の課金の数え方に合わせる:
+#   - ドキュメントの get() は 1 件 (存在しなくても 1 件)
+#   - クエリは返ってきたドキュメント数 (0 件でも 1 件)
+#   - add / set / update / create / delete は 1 件、バッチ・トランザクションは含まれる書き込みの数
+#   - リスナー (on_snapshot) は最初の結果のドキュメント数 (0 件でも 1 件)、その後は変わったドキュメントの数
+#     (コールバックはリスナーのスレッドで呼ばれるので、どの再実行にも数えず LISTEN_PAGE に記録する)
+
+DEFAULT_READ_BUDGET = int(os.environ.get("FIRESTORE_READ_BUDGET", "50"))  # 再実行 1 回あたりの読み取り上限
+PAGE_READ_BUDGETS: Dict[Tuple[str, str], int] = {
+    # 復習問題の抽出で不正解の記録をまとめて読むため
+    ("app_j", "selection"): 500,
+}
+MAX_BUDGET_EVENTS = 100
+LISTEN_PAGE = ("background", "listen")
+
+_lock = threading.Lock()
+# (app, page, collection, op, call_site) -> {"calls", "reads", "writes", "total_ms", "max_ms"}
+_op_stats: Dict[Tuple[str, str, str, str, str], dict] = {}
+# nickname -> {"reads", "writes"}
+_user_stats: Dict[str, dict] = {}
+_budget_events: deque = deque(maxlen=MAX_BUDGET_EVENTS)
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _call_site() -> str:
+    """このモジュールの外で最初に見つかった呼び出し元 (ファイル名:行番号 関数名)"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename != _THIS_FILE:
+            return f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "-"
+
+
+def _current_user() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        import streamlit as st
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return "-"
+        return str(st.session_state.get("nickname") or st.session_state.get("user_id") or "-")
+    except Exception:
+        return "-"
+
+
+def _record(op: str, collection: str, call_site: str, elapsed_ms: float, reads: int = 0, writes: int = 0,
+            page: Optional[Tuple[str, str]] = None):
+    """page を指定したときは、このスレッドで計測中の再実行の読み取り件数には加えない"""
+    in_rerun = page is None
+    app, page = page or perf_metrics.current_page()
+    user = _current_user()
+    with _lock:
+        stats = _op_stats.setdefault((app, page, collection, op, call_site),
+                                     {"calls": 0, "reads": 0, "writes": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["calls"] += 1
+        stats["reads"] += reads
+        stats["writes"] += writes
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        user_stats = _user_stats.setdefault(user, {"reads": 0, "writes": 0})
+        user_stats["reads"] += reads
+        user_stats["writes"] += writes
+    if reads and in_rerun:
+        perf_metrics.count("firestore_reads", reads)
+    if writes and in_rerun:
+        perf_metrics.count("firestore_writes", writes)
+
+
+def _check_read_budget(app: str, page: str, elapsed_ms: float, steps: dict, counters: dict):
+    reads = counters.get("firestore_reads", 0)
+    budget = PAGE_READ_BUDGETS.get((app, page), DEFAULT_READ_BUDGET)
+    if reads > budget:
+        print(f"⚠️ Firestore の読み取りが上限を超えました: {app}/{page} {reads} 件 (上限 {budget} 件)")
+        with _lock:
+            _budget_events.append({"ts": time.time(), "app": app, "page": page, "user": _current_user(),
+                                   "reads": reads, "budget": budget,
+                                   "writes": counters.get("firestore_writes", 0)})
+
+
+perf_metrics.add_rerun_listener(_check_read_budget)
+
+
+class _Traced:
+    """元のオブジェクトを包み、トレースしないメソッドはそのまま委譲する"""
+
+    def __init__(self, wrapped, path: str):
+        self._wrapped = wrapped
+        self._path = path
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def _timed(self, op: str, func, *args, reads: int = 0, writes: int = 0, **kwargs):
+        call_site = _call_site()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(op, self._path, call_site, (time.perf_counter() - start) * 1000, reads=reads, writes=writes)
+
+
+class TracedQuery(_Traced):
+    """コレクション / クエリ。結果のドキュメント数を読み取り件数として数える"""
+
+    def _chain(self, name, *args, **kwargs):
+        return TracedQuery(getattr(self._wrapped, name)(*args, **kwargs), self._path)
+
+    def where(self, *args, **kwargs):
+        return self._chain("where", *args, **kwargs)
+
+    def order_by(self, *args, **kwargs):
+        return self._chain("order_by", *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._chain("limit", *args, **kwargs)
+
+    def offset(self, *args, **kwargs):
+        return self._chain("offset", *args, **kwargs)
+
+    def start_after(self, *args, **kwargs):
+        return self._chain("start_after", *args, **kwargs)
+
+    def start_at(self, *args, **kwargs):
+        return self._chain("start_at", *args, **kwargs)
+
+    def select(self, *args, **kwargs):
+        return self._chain("select", *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        call_site = _call_site()
+        start = time.perf_counter()
+        docs = []
+        try:
+            docs = list(self._wrapped.get(*args, **kwargs))
+            return docs
+        finally:
+            _record("query.get", self._path, call_site, (time.perf_counter() - start) * 1000,
+                    reads=max(len(docs), 1))
+
+    def stream(self, *args, **kwargs):
+        """ストリームは読み切った (または途中でやめた) 時点で件数と時間を記録する"""
+        call_site = _call_site()
+        start = time.perf_counter()
+        n = 0
+        try:
+            for doc in self._wrapped.stream(*args, **kwargs):
+                n += 1
+                yield doc
+        finally:
+            _record("query.stream", self._path, call_site, (time.perf_counter() - start) * 1000,
+                    reads=max(n, 1))
+
+    def on_snapshot(self, callback):
+        """コールバックが呼ばれるたびに、変わったドキュメントの数を読み取り件数として記録する"""
+        call_site = _call_site()
+        path = self._path
+        first = [True]
+
+        def traced_callback(docs, changes, read_time):
+            reads = max(len(changes), 1) if first[0] else len(changes)
+            first[0] = False
+            _record("listen", path, call_site, 0.0, reads=reads, page=LISTEN_PAGE)
+            return callback(docs, changes, read_time)
+
+        return self._wrapped.on_snapshot(traced_callback)
+
+
+class TracedCollection(TracedQuery):
+
+    def document(self, *args, **kwargs):
+        ref = self._wrapped.document(*args, **kwargs)
+        return TracedDocument(ref, self._path)
+
+    def add(self, *args, **kwargs):
+        return self._timed("add", self._wrapped.add, *args, writes=1, **kwargs)
+
+
+class TracedDocument(_Traced):
+
+    def collection(self, name: str):
+        return TracedCollection(self._wrapped.collection(name), f"{self._path}/*/{name}")
+
+    def get(self, *args, **kwargs):
+        if isinstance(kwargs.get("transaction"), TracedTransaction):
+            kwargs["transaction"] = kwargs["transaction"]._wrapped
+        return self._timed("doc.get", self._wrapped.get, *args, reads=1, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._timed("doc.set", self._wrapped.set, *args, writes=1, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._timed("doc.update", self._wrapped.update, *args, writes=1, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._timed("doc.create", self._wrapped.create, *args, writes=1, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed("doc.delete", self._wrapped.delete, *args, writes=1, **kwargs)
+
+
+class TracedBatch(_Traced):
+    """バッチに積んだ書き込みの数を commit() 時に記録する"""
+
+    def __init__(self, wrapped, path: str = "batch"):
+        super().__init__(wrapped, path)
+        self._writes = 0
+
+    def _unwrap(self, ref):
+        return ref._wrapped if isinstance(ref, _Traced) else ref
+
+    def set(self, ref, *args, **kwargs):
+        self._writes += 1
+        return self._wrapped.set(self._unwrap(ref), *args, **kwargs)
+
+    def update(self, ref, *args, **kwargs):
+        self._writes += 1
+        return self._wrapped.update(self._unwrap(ref), *args, **kwargs)
+
+    def create(self, ref, *args, **kwargs):
+        self._writes += 1
+        return self._wrapped.create(self._unwrap(ref), *args, **kwargs)
+
+    def delete(self, ref, *args, **kwargs):
+        self._writes += 1
+        return self._wrapped.delete(self._unwrap(ref), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        writes, self._writes = self._writes, 0
+        return self._timed("batch.commit", self._wrapped.commit, *args, writes=writes, **kwargs)
+
+
+class TracedTransaction(TracedBatch):
+    """トランザクションの書き込みの数を反映 (_commit) 時に記録する
+
+    firestore.transactional は試行ごとに _clean_up() してから関数を呼び直すので、数え直しもそこで行う。
+    """
+
+    def __init__(self, wrapped, path: str = "transaction"):
+        super().__init__(wrapped, path)
+
+    def _clean_up(self):
+        self._writes = 0
+        return self._wrapped._clean_up()
+
+    def _commit(self):
+        writes, self._writes = self._writes, 0
+        return self._timed("transaction.commit", self._wrapped._commit, writes=writes)
+
+
+class TracedClient(_Traced):
+
+    def collection(self, name: str):
+        return TracedCollection(self._wrapped.collection(name), name)
+
+    def document(self, path: str, *args):
+        return TracedDocument(self._wrapped.document(path, *args), path.split("/")[0])
+
+    def batch(self):
+        return TracedBatch(self._wrapped.batch())
+
+    def transaction(self, **kwargs):
+        return TracedTransaction(self._wrapped.transaction(**kwargs))
+
+
+def trace_client(client):
+    """Firestore クライアントをトレース付きのラッパーで包む"""
+    if client is None or isinstance(client, TracedClient):
+        return client
+    return TracedClient(client, "")
+
+
+def op_stats() -> List[dict]:
+    """操作ごとの集計 (読み取り件数の多い順)"""
+    with _lock:
+        rows = [{"app": app, "page": page, "collection": collection, "op": op, "call_site": call_site,
+                 "calls": s["calls"], "reads": s["reads"], "writes": s["writes"],
+                 "avg_ms": round(s["total_ms"] / s["calls"], 1), "max_ms": round(s["max_ms"], 1)}
+                for (app, page, collection, op, call_site), s in _op_stats.items()]
+    return sorted(rows, key=lambda r: (r["reads"], r["writes"]), reverse=True)
+
+
+def user_stats() -> List[dict]:
+    """ユーザーごとの読み取り・書き込み件数 (読み取りの多い順)"""
+    with _lock:
+        rows = [{"user": user, **s} for user, s in _user_stats.items()]
+    return sorted(rows, key=lambda r: r["reads"], reverse=True)
+
+
+def budget_events() -> List[dict]:
+    """読み取り上限を超えた再実行 (新しい順)"""
+    with _lock:
+        return list(reversed(_budget_events))
+
+
+def reset_stats():
+    with _lock:
+        _op_stats.clear()
+        _user_stats.clear()
+        _budget_events.clear()
@@ -0,0 +1,192 @@
+"""問題ごとの集計 (先生向けの正答率・よくある誤答)
+
+解答を保存するたびに、item_stats の集計ドキュメントを書き込み時に更新する。
+先生向けの画面やこのスクリプトは集計だけを読むので、読み取り件数は 問題数 × NUM_SHARDS で頭打ちになり、
+shuffle_attempts / shuffle_results をすべて読み直す必要がない。
+
+    item_stats/{quiz_set}_{id}_{shard}
+      attempts / correct / incorrect   解答数・正解数・不正解数 (Increment)
+      users                            この問題に初めて解答した生徒の数 (Increment)
+      top_wrong                        よくある誤答 [{answer, count, error}] (最大 TOP_WRONG_SIZE 件)
+
+同じ問題に多くの生徒が同時に解答しても 1 つのドキュメントに書き込みが集中しないよう、
+student_key のハッシュで NUM_SHARDS 個のシャードに分ける (同じ生徒はいつも同じシャード)。
+表示するときにシャードを合計する。
+
+attempts などは読み取りなしで書けるので、アプリの解答の保存と同じ WriteBatch に入れる (add_answer)。
+生徒数とよくある誤答は解答の画面を待たせないよう、バックグラウンドのスレッドで更新する (submit_answer_details):
+  - users は item_stats_users/{quiz_set}_{id}_{student_key} の create() が成功したとき (その生徒の初めての解答) だけ 1 増やす
+  - top_wrong は Space-Saving 法の有限サイズの上位リストで、不正解のときだけシャードのトランザクションで読んで更新する
+
+    FIRESTORE_BACKEND=fake python item_stats.py 関係代名詞目的格_3.csv
+    python item_stats.py questions_01.csv --csv item_stats.csv
+"""
+import argparse
+import csv
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from lazy_imports import lazy_import
+import fake_firestore
+from result_rollups import client, create_if_absent
+
+# FIRESTORE_BACKEND=fake のときはインメモリの Firestore を使う (アプリと同じ)
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
+
+ITEM_STATS_COLLECTION = "item_stats"
+ITEM_USERS_COLLECTION = "item_stats_users"
+NUM_SHARDS = 8
+TOP_WRONG_SIZE = 10      # シャードごとに残す誤答の数
+TOP_WRONG_SHOWN = 3      # 表示する誤答の数
+MAX_ANSWER_LENGTH = 200
+DEFAULT_CREDENTIALS = "serviceAccountKey.json"
+
+# 生徒数・よくある誤答の更新用 (解答の保存とは別のスレッド)
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="item_stats")
+
+
+def shard_for(student_key: str) -> int:
+    return zlib.crc32(str(student_key).encode("utf-8")) % NUM_SHARDS
+
+
+def item_key(quiz_set: str, item_id) -> str:
+    return f"{quiz_set}_{item_id}".replace("/", "-")
+
+
+def add_wrong_answer(top_wrong: List[dict], answer: str, size: int = TOP_WRONG_SIZE) -> List[dict]:
+    """Space-Saving: 上位リストに誤答を 1 件加える。いっぱいなら最小の項目を置き換え、その数を error に残す"""
+    entries = [dict(e) for e in top_wrong]
+    for entry in entries:
+        if entry.get("answer") == answer:
+            entry["count"] = entry.get("count", 0) + 1
+            return entries
+    if len(entries) < size:
+        entries.append({"answer": answer, "count": 1, "error": 0})
+        return entries
+    smallest = min(entries, key=lambda e: e.get("count", 0))
+    floor = smallest.get("count", 0)
+    smallest.update({"answer": answer, "count": floor + 1, "error": floor})
+    return entries
+
+
+def shard_ref(db, quiz_set: str, item_id, student_key: str):
+    return db.collection(ITEM_STATS_COLLECTION).document(f"{item_key(quiz_set, item_id)}_{shard_for(student_key)}")
+
+
+def add_answer(batch, db, quiz_set: str, item_id, quiz_type: str, student_key: str, is_correct: bool):
+    """解答数・正解数・不正解数の加算を batch に加える (読み取りなし)"""
+    batch.set(shard_ref(db, quiz_set, item_id, student_key), {
+        "quiz_set": quiz_set, "id": item_id, "quiz_type": quiz_type, "shard": shard_for(student_key),
+        "attempts": firestore.Increment(1),
+        "correct": firestore.Increment(1 if is_correct else 0),
+        "incorrect": firestore.Increment(0 if is_correct else 1),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+
+def _update_top_wrong(transaction, ref, answer: str):
+    snapshot = ref.get(transaction=transaction)
+    top_wrong = (snapshot.to_dict() or {}).get("top_wrong", []) if snapshot.exists else []
+    transaction.set(ref, {"top_wrong": add_wrong_answer(top_wrong, answer)}, merge=True)
+
+
+def record_answer_details(db, quiz_set: str, item_id, student_key: str, user_answer, is_correct: bool,
+                          check_user: bool = True) -> bool:
+    """生徒数とよくある誤答を更新する。失敗しても解答の保存には影響しないよう、例外は出さずに False を返す
+
+    check_user が False のとき (このセッションですでにこの問題に解答している) は users の確認を省く。
+    """
+    key = item_key(quiz_set, item_id)
+    try:
+        ref = shard_ref(db, quiz_set, item_id, student_key)
+        if check_user and create_if_absent(
+                db.collection(ITEM_USERS_COLLECTION).document(f"{key}_{student_key}".replace("/", "-")),
+                {"quiz_set": quiz_set, "id": item_id, "student_key": student_key,
+                 "first_at": firestore.SERVER_TIMESTAMP}):
+            ref.set({"users": firestore.Increment(1)}, merge=True)
+        if not is_correct:
+            answer = str(user_answer).strip()[:MAX_ANSWER_LENGTH]
+            firestore.transactional(_update_top_wrong)(db.transaction(), ref, answer)
+        return True
+    except Exception as e:
+        print(f"問題の集計の更新に失敗しました ({key}): {e}")
+        return False
+
+
+def submit_answer_details(db, quiz_set: str, item_id, student_key: str, user_answer, is_correct: bool,
+                          check_user: bool = True):
+    """record_answer_details をバックグラウンドのスレッドで実行する (正解で確認も不要なら何もしない)"""
+    if is_correct and not check_user:
+        return None
+    return _executor.submit(record_answer_details, db, quiz_set, item_id, student_key, user_answer, is_correct,
+                            check_user)
+
+
+# ==========================================
+# 🔹 表示 (集計ドキュメントだけを読む)
+# ==========================================
+def load_item_stats(db, quiz_set: str) -> List[dict]:
+    """問題セットのシャードを問題ごとに合計し、正答率の低い順に返す"""
+    items: Dict[str, dict] = {}
+    wrong: Dict[str, Dict[str, int]] = {}
+    for doc in db.collection(ITEM_STATS_COLLECTION).where("quiz_set", "==", quiz_set).get():
+        data = doc.to_dict()
+        qid = str(data.get("id"))
+        item = items.setdefault(qid, {"id": qid, "quiz_type": data.get("quiz_type"),
+                                      "attempts": 0, "correct": 0, "incorrect": 0, "users": 0})
+        for field in ("attempts", "correct", "incorrect", "users"):
+            item[field] += data.get(field, 0)
+        counts = wrong.setdefault(qid, {})
+        for entry in data.get("top_wrong", []):
+            counts[entry["answer"]] = counts.get(entry["answer"], 0) + entry.get("count", 0)
+
+    rows = []
+    for qid, item in items.items():
+        attempts = item["attempts"]
+        top = sorted(wrong[qid].items(), key=lambda kv: kv[1], reverse=True)[:TOP_WRONG_SHOWN]
+        rows.append({
+            **item,
+            "accuracy": round(item["correct"] / attempts * 100, 1) if attempts else None,
+            "top_wrong": [{"answer": answer, "count": count} for answer, count in top],
+        })
+    return sorted(rows, key=lambda r: (r["accuracy"] if r["accuracy"] is not None else 101, r["id"]))
+
+
+def format_top_wrong(top_wrong: List[dict]) -> str:
+    return " / ".join(f"{e['answer']} ({e['count']})" for e in top_wrong)
+
+
+def write_csv(rows: List[dict], path: str):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "attempts", "correct", "users", "accuracy", "top_wrong"])
+        for r in rows:
+            writer.writerow([r["id"], r["attempts"], r["correct"], r["users"], r["accuracy"],
+                             format_top_wrong(r["top_wrong"])])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題ごとの正答率とよくある誤答を表示する")
+    parser.add_argument("quiz_set", help="問題セットの CSV 名 (例: questions_01.csv)")
+    parser.add_argument("--csv", help="結果を書き出す CSV ファイル")
+    parser.add_argument("--credentials", default=DEFAULT_CREDENTIALS, help="サービスアカウントキーの JSON")
+    args = parser.parse_args(argv)
+
+    rows = load_item_stats(client(args.credentials), args.quiz_set)
+    if not rows:
+        print("集計がありません。")
+        return 1
+    print(f"{'id':>6}{'attempts':>10}{'users':>8}{'accuracy':>10}  top_wrong")
+    for r in rows:
+        accuracy = "-" if r["accuracy"] is None else f"{r['accuracy']}%"
+        print(f"{r['id']:>6}{r['attempts']:>10}{r['users']:>8}{accuracy:>10}  {format_top_wrong(r['top_wrong'])}")
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"\n{args.csv} に書き出しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import importlib
+import threading
+import time
+from typing import Dict
+
+# ==========================================
+# 🔹 重いモジュールの遅延インポート
+# ==========================================
+# pandas / matplotlib / firebase_admin などは、実際に属性へアクセスした時点で
+# 初めてインポートする。ログインページなど使わないページでは読み込まれない。
+#
+#   pd = lazy_import("pandas")
+#   df = pd.read_csv(...)   # ← ここで初めて pandas がインポートされる
+
+_import_times: Dict[str, float] = {}  # {モジュール名: インポートにかかった秒数}
+_import_lock = threading.Lock()
+
+
+class _LazyModule:
+    """属性アクセス時にモジュールを読み込むプロキシ"""
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_module", None)
+
+    def _load(self):
+        module = object.__getattribute__(self, "_lazy_module")
+        if module is None:
+            name = object.__getattribute__(self, "_lazy_name")
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            elapsed = time.perf_counter() - start
+            with _import_lock:
+                _import_times.setdefault(name, elapsed)
+            object.__setattr__(self, "_lazy_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        name = object.__getattribute__(self, "_lazy_name")
+        loaded = object.__getattribute__(self, "_lazy_module") is not None
+        return f"<lazy module '{name}' ({'loaded' if loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str):
+    """モジュールの遅延インポート用プロキシを返す"""
+    return _LazyModule(name)
+
+
+def import_times() -> Dict[str, float]:
+    """このプロセスで遅延インポートされたモジュールと所要秒数"""
+    with _import_lock:
+        return dict(_import_times)
@@ -0,0 +1,486 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+from typing import Callable, Dict, List, Optional
+
+# ==========================================
+# 🔹 同時アクセスの負荷試験
+# ==========================================
+# 実際のアプリのスクリプト (app.py / app_j.py / app_j_summer.py) を Streamlit の AppTest で動かし、
+# N 人の生徒が同時に典型的な流れをたどったときのページごとの再実行時間・CPU・メモリを測る。
+# Firestore はインメモリの fake_firestore、GitHub は raw_server.py を使うのでネットワーク不要。
+#
+#   python load_test.py --students 10                 # 10 人で 1 回ずつ
+#   python load_test.py --students 5,10,20,40 --p95-budget-ms 1500   # 段階的に増やして上限人数を求める
+#
+# 生徒の流れ:
+#   app.py          ログイン → 動画 → スピード測定 → 問題 → 結果 → 日本語訳
+#   app_j.py        ログイン → 問題セット選択 → 並べかえ 10 問 → 結果 → 復習
+#   app_j_summer.py ログイン → 英語 (読む → 問題 → 結果 → 音声 → テキスト問題) → 国語 (読む → 問題 → 結果)
+#
+# すべての生徒は 1 つのプロセス内のスレッドとして動くため、キャッシュ・GIL を本番の
+# Streamlit サーバーと同じように共有する。
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APPS = ("app.py", "app_j.py", "app_j_summer.py")
+RUN_TIMEOUT = 120          # 再実行 1 回のタイムアウト (秒)
+SAMPLE_INTERVAL = 0.5      # CPU・メモリを記録する間隔 (秒)
+
+
+class FlowError(Exception):
+    pass
+
+
+# ==========================================
+# 🔹 AppTest を複数スレッドで同時に動かすための準備
+# ==========================================
+def prepare_concurrent_apptest(secrets: dict):
+    """AppTest は実行のたびに Runtime・st.secrets・設定をグローバルに差し替えて戻すため、
+    同時に動かすと他の生徒の実行中に消されてしまう。共有のものを一度だけ設定し、差し替えを止める。
+
+    スクリプトのキャッシュ (ScriptCache) も実行のたびに作られ、毎回コンパイルし直すことになる。
+    Python 3.11 では同じスクリプトを同時に ast.parse すると失敗することがあるため、全員で 1 つを共有して返す。"""
+    from unittest.mock import MagicMock
+
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    try:
+        from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+        runtime.dataframe_source_mgr = DataframeSourceManager()
+    except ImportError:
+        pass
+    Runtime._instance = runtime
+    # AppTest が差し替える Runtime は使われないダミーに向ける
+    app_test.Runtime = types.SimpleNamespace(_instance=None)
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+    shared_secrets = Secrets()
+    shared_secrets._secrets = secrets
+    st.secrets = shared_secrets
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = lambda: script_cache
+    local_script_runner.ScriptCache = lambda: script_cache
+    return script_cache
+
+
+def compile_apps(script_cache, apps: List[str]) -> List[str]:
+    """生徒のスレッドを始める前に、アプリを 1 つずつコンパイルしておく。失敗したアプリのエラーを返す"""
+    errors = []
+    for app in apps:
+        try:
+            script_cache.get_bytecode(os.path.join(BASE_DIR, app))
+        except Exception as e:
+            errors.append(f"{app}: {type(e).__name__}: {e}")
+    return errors
+
+
+def make_secrets(n_students: int) -> dict:
+    import bcrypt
+    salt = bcrypt.gensalt(rounds=4)   # ログイン時の照合コストは本番と変わるが、試験の準備を速くする
+    users = [{"nickname": student_name(i), "user_id": bcrypt.hashpw(student_password(i).encode(), salt).decode()}
+             for i in range(n_students)]
+    return {"users": users}
+
+
+def student_name(i: int) -> str:
+    return f"student_{i:03d}"
+
+
+def student_password(i: int) -> str:
+    return f"pw{i:03d}"
+
+
+def seed_firestore(n_students: int):
+    import fake_firestore
+    db = fake_firestore.client()
+    db.collection("settings").document("app_config").set({"fixed_row_index": 2})
+    for i in range(n_students):
+        db.collection("user_profiles").document(student_name(i)).set({"enrollment_date": "2025-04-01"})
+
+
+# ==========================================
+# 🔹 生徒 1 人分の操作
+# ==========================================
+class Student:
+    def __init__(self, index: int, script: str, think_ms: float, correct_rate: float, recorder: "Recorder"):
+        from streamlit.testing.v1 import AppTest
+        self.index = index
+        self.name = student_name(index)
+        self.password = student_password(index)
+        self.script = script
+        self.app = os.path.splitext(script)[0]
+        self.think_ms = think_ms
+        self.correct_rate = correct_rate
+        self.recorder = recorder
+        self.random = random.Random(index)
+        self.at = AppTest.from_file(os.path.join(BASE_DIR, script), default_timeout=RUN_TIMEOUT)
+
+    def think(self, factor: float = 1.0):
+        if self.think_ms:
+            time.sleep(self.think_ms * factor * self.random.uniform(0.5, 1.5) / 1000)
+
+    def run(self, action: str):
+        start = time.perf_counter()
+        try:
+            self.at.run()
+        except Exception as e:
+            raise FlowError(f"{action}: {e}")
+        finally:
+            self.recorder.action(self.app, action, (time.perf_counter() - start) * 1000)
+        if self.at.exception:
+            raise FlowError(f"{action}: {self.at.exception[0].value}")
+
+    def state(self, key: str, default=None):
+        try:
+            return self.at.session_state[key]
+        except KeyError:
+            return default
+
+    def button(self, label: Optional[str] = None, key: Optional[str] = None):
+        for b in self.at.button:
+            if (key is None or b.key == key) and (label is None or b.label == label) and not b.disabled:
+                return b
+        raise FlowError(f"ボタンが見つかりません: label={label} key={key} (page={self.state('page')})")
+
+    def click(self, action: str, label: Optional[str] = None, key: Optional[str] = None):
+        self.button(label, key).click()
+        self.run(action)
+
+    def login(self, password_key: str, submit_label: str):
+        self.run("open")
+        self.think()
+        self.at.text_input(key="nickname_input").input(self.name)
+        self.at.text_input(key=password_key).input(self.password)
+        self.click("login", label=submit_label)
+
+
+def flow_app(s: Student):
+    """app.py: ログイン → 動画 → スピード測定 → 問題 → 結果 → 日本語訳"""
+    s.login("user_id_input", "次へ")
+    s.think()
+    videos = [r for r in s.at.radio if r.key == "video_radio"]
+    if videos and videos[0].options:
+        videos[0].set_value(s.random.choice(videos[0].options))
+        s.run("video")
+        s.think()
+    s.click("start_reading", key="start_reading_button")
+    s.think(3)   # 英文を読む
+    s.click("stop", label="Stop")
+    s.think()
+    for key in ("q1", "q2"):
+        radio = s.at.radio(key=key)
+        radio.set_value(s.random.choice(radio.options))
+    s.click("submit", label="Submit")
+    s.think()
+    s.click("translation", label="意味を確認")
+    s.think()
+    s.click("finish", label="終了")
+
+
+def _answer_quiz(s: Student, prefix: str, max_questions: int):
+    """表示中のクイズに max_questions 問まで答える (並べかえは correct_rate の確率で正しい順に押す)"""
+    for _ in range(max_questions):
+        if s.state("app_mode") not in ("quiz", "review_quiz"):
+            return
+        index = s.state("index", 0)
+        word_buttons = [b for b in s.at.button if b.key and b.key.startswith(f"word_{prefix}_{index}_")]
+        if word_buttons:
+            order = [b.key for b in word_buttons]
+            if s.random.random() < s.correct_rate:
+                tokens = list(s.state("correct_tokens") or [])
+                remaining = list(word_buttons)
+                order = []
+                for token in tokens:
+                    match = next((b for b in remaining if b.label.lower() == token.lower()), None)
+                    if match is not None:
+                        remaining.remove(match)
+                        order.append(match.key)
+                order += [b.key for b in remaining]
+            for key in order:
+                s.think(0.3)
+                s.click("word_tap", key=key)
+        else:
+            option = next((b for b in s.at.button if b.key and b.key.startswith(f"mc_option_{index}_")), None)
+            if option is None:
+                raise FlowError(f"問題のボタンが見つかりません (index={index})")
+            s.think()
+            s.click("choice", key=option.key)
+        s.think()
+        last = any(b.label == "結果を確認 ✅" for b in s.at.button)
+        s.click("next_question", label="結果を確認 ✅" if last else "次の問題へ ▶")
+    if s.state("app_mode") in ("quiz", "review_quiz"):
+        s.click("back_to_selection", key="back_to_selection_main")
+
+
+def flow_app_j(s: Student, max_questions: int = 10):
+    """app_j.py: ログイン → 問題セット選択 → 並べかえ → 結果 → 復習"""
+    s.login("user_id_input", "ログイン")
+    s.think()
+    s.at.radio(key="dd_grade").set_value("中2")
+    s.run("select_grade")
+    lesson = s.at.radio(key="dd_lesson")
+    lesson.set_value(s.random.choice(lesson.options))
+    s.run("select_lesson")
+    instruction = s.at.radio(key="dd_set_instruction")
+    instruction.set_value(s.random.choice(instruction.options))
+    s.run("select_set")
+    s.think()
+    s.click("start_quiz", key="start_quiz_new")
+    _answer_quiz(s, "quiz", max_questions)
+    if s.state("app_mode") == "quiz_result":
+        s.think()
+        s.click("back_to_selection", label="📚 問題セット選択に戻る")
+    s.think()
+    s.click("review", key="review_quiz_new")
+    _answer_quiz(s, "review", max_questions)
+    if s.state("app_mode") == "quiz_result":
+        s.click("back_to_selection", label="📚 問題セット選択に戻る")
+
+
+def flow_app_j_summer(s: Student):
+    """app_j_summer.py: ログイン → 英語 (読む → 問題 → 結果 → 音声 → テキスト問題) → 国語"""
+    s.login("password_input", "次へ")
+    s.think()
+    s.click("start_english", key="english_start_button")
+    s.think(3)
+    s.click("stop", label="Stop")
+    s.think()
+    for key in ("q1", "q2"):
+        radio = s.at.radio(key=key)
+        radio.set_value(s.random.choice(radio.options))
+    s.click("answer", label="次へ")
+    s.think()
+    s.click("result", label="次へ")
+    s.think()
+    s.click("audio", label="次の問題へ進む")
+    s.think()
+    s.at.checkbox(key="q2_0").check()
+    s.click("submit_text", label="提出")
+    s.think()
+    s.click("start_japanese", key="japanese_reading_from_page6")
+    s.think(3)
+    s.click("stop_japanese", key="stop_japanese_reading_button")
+    s.think()
+    for radio in s.at.radio:
+        if radio.key in ("q1_ja", "q2_ja", "q3_ja"):   # 問題の形式によって表示される設問が変わる
+            radio.set_value(s.random.choice(radio.options))
+    s.click("answer_japanese", label="次へ")
+    s.think()
+    s.click("home", label="ホームへ戻る")
+
+
+FLOWS: Dict[str, Callable[[Student], None]] = {
+    "app.py": flow_app,
+    "app_j.py": flow_app_j,
+    "app_j_summer.py": flow_app_j_summer,
+}
+
+
+# ==========================================
+# 🔹 計測
+# ==========================================
+class Recorder:
+    """操作ごとの所要時間 (生徒側から見た時間) と、プロセスの CPU・メモリを記録する"""
+
+    def __init__(self):
+        from perf_metrics import LatencyHistogram
+        self._histogram = LatencyHistogram
+        self._lock = threading.Lock()
+        self.actions: Dict[tuple, object] = {}
+        self.errors: List[str] = []
+        self.completed = 0
+        self.samples: List[tuple] = []   # (経過秒, CPU %, RSS MB)
+        self._stop = threading.Event()
+
+    def action(self, app: str, action: str, ms: float):
+        with self._lock:
+            self.actions.setdefault((app, action), self._histogram()).add(ms)
+
+    def error(self, message: str):
+        with self._lock:
+            self.errors.append(message)
+
+    def done(self):
+        with self._lock:
+            self.completed += 1
+
+    def _sample(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            wall, cpu = time.perf_counter(), time.process_time()
+            cpu_percent = (cpu - last_cpu) / (wall - last_wall) * 100
+            self.samples.append((wall - start, cpu_percent, rss_mb()))
+            last_wall, last_cpu = wall, cpu
+
+    def start_sampling(self):
+        threading.Thread(target=self._sample, name="load-test-sampler", daemon=True).start()
+
+    def stop_sampling(self):
+        self._stop.set()
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        # Linux 以外は最大使用量で代用する (macOS はバイト単位)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_level(n_students: int, apps: List[str], think_ms: float, correct_rate: float, max_questions: int) -> dict:
+    """n_students 人を同時に動かし、結果をまとめて返す"""
+    import firestore_trace
+    import perf_metrics
+
+    perf_metrics.reset_stats()
+    firestore_trace.reset_stats()
+    recorder = Recorder()
+
+    def student_main(i: int):
+        script = apps[i % len(apps)]
+        try:
+            s = Student(i, script, think_ms, correct_rate, recorder)
+            time.sleep(random.uniform(0, think_ms / 1000))   # 全員が同時に押さないようにずらす
+            if script == "app_j.py":
+                flow_app_j(s, max_questions)
+            else:
+                FLOWS[script](s)
+            recorder.done()
+        except Exception as e:
+            recorder.error(f"{student_name(i)} ({script}) {e}")
+
+    threads = [threading.Thread(target=student_main, args=(i,), name=f"student-{i}") for i in range(n_students)]
+    recorder.start_sampling()
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    recorder.stop_sampling()
+
+    page_rows = perf_metrics.page_stats()
+    cpu = [c for _, c, _ in recorder.samples]
+    rss = [m for _, _, m in recorder.samples] or [rss_mb()]
+    ops = firestore_trace.op_stats()
+    return {
+        "students": n_students,
+        "completed": recorder.completed,
+        "errors": recorder.errors,
+        "seconds": round(elapsed, 1),
+        "pages": page_rows,
+        "actions": sorted(({"app": app, "action": action, **hist.summary()}
+                           for (app, action), hist in recorder.actions.items()),
+                          key=lambda r: r["p95_ms"], reverse=True),
+        "worst_page_p95_ms": max((r["p95_ms"] for r in page_rows), default=0.0),
+        "cpu_avg_percent": round(sum(cpu) / len(cpu), 1) if cpu else 0.0,
+        "cpu_max_percent": round(max(cpu), 1) if cpu else 0.0,
+        "rss_max_mb": round(max(rss), 1),
+        "firestore_reads": sum(r["reads"] for r in ops),
+        "firestore_writes": sum(r["writes"] for r in ops),
+    }
+
+
+def print_level(result: dict):
+    print(f"\n=== {result['students']} 人 / {result['seconds']} 秒 / 完了 {result['completed']} 人 / "
+          f"エラー {len(result['errors'])} 件 ===")
+    print(f"CPU 平均 {result['cpu_avg_percent']}% (最大 {result['cpu_max_percent']}%)  "
+          f"RSS 最大 {result['rss_max_mb']} MB  "
+          f"Firestore 読み取り {result['firestore_reads']} / 書き込み {result['firestore_writes']}")
+    print(f"{'app':<14}{'page':<16}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (再実行 ms)")
+    for row in result["pages"]:
+        print(f"{row['app']:<14}{row['page']:<16}{row['count']:>7}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+              f"{row['p99_ms']:>9}{row['max_ms']:>9}")
+    for message in result["errors"][:10]:
+        print(f"  ❌ {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="実際のアプリを使った同時アクセスの負荷試験")
+    parser.add_argument("--students", default="10", help="同時に動かす生徒数 (カンマ区切りで段階的に増やす)")
+    parser.add_argument("--apps", default=",".join(APPS), help="対象のアプリ (カンマ区切り)")
+    parser.add_argument("--think-ms", type=float, default=300.0, help="操作の間の考える時間 (ミリ秒)")
+    parser.add_argument("--correct-rate", type=float, default=0.6, help="並べかえで正しい順に押す確率")
+    parser.add_argument("--max-questions", type=int, default=10, help="app_j.py で解く問題数")
+    parser.add_argument("--firestore-latency-ms", type=float, default=30.0, help="Firestore の 1 回あたりの遅延")
+    parser.add_argument("--raw-latency-ms", type=float, default=100.0, help="GitHub raw の 1 回あたりの遅延")
+    parser.add_argument("--raw-bandwidth-kbps", type=float, default=0.0, help="GitHub raw の帯域 (0 で無制限)")
+    parser.add_argument("--p95-budget-ms", type=float, default=0.0,
+                        help="段階試験で、全ページの再実行 p95 がこの値以下だった最大人数を上限として報告する")
+    parser.add_argument("--json", help="結果を JSON で書き出すファイル")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.students.split(",") if n.strip()]
+    apps = [a.strip() for a in args.apps.split(",") if a.strip()]
+    for app in apps:
+        if app not in FLOWS:
+            parser.error(f"未対応のアプリです: {app}")
+
+    # アプリのモジュールを読み込む前に、外部サービスの代わりを設定する
+    import raw_server
+    server, raw_base = raw_server.start_in_background(options=raw_server.RawServerOptions(
+        latency_ms=args.raw_latency_ms, bandwidth_kbps=args.raw_bandwidth_kbps))
+    os.environ["GITHUB_RAW_BASE"] = raw_base
+    os.environ["FIRESTORE_BACKEND"] = "fake"
+    os.environ["FAKE_FIRESTORE_LATENCY_MS"] = str(args.firestore_latency_ms)
+    os.environ.setdefault("PERF_LOG_DIR", tempfile.mkdtemp(prefix="load_test_logs_"))
+
+    max_students = max(levels)
+    script_cache = prepare_concurrent_apptest(make_secrets(max_students))
+    compile_errors = compile_apps(script_cache, apps)
+    if compile_errors:
+        # 生徒のエラーではなく試験の準備の失敗として報告する
+        for message in compile_errors:
+            print(f"❌ アプリをコンパイルできませんでした: {message}")
+        server.shutdown()
+        sys.exit(2)
+    seed_firestore(max_students)
+
+    results = []
+    for n in levels:
+        result = run_level(n, apps, args.think_ms, args.correct_rate, args.max_questions)
+        print_level(result)
+        results.append(result)
+
+    if args.p95_budget_ms:
+        passed = [r["students"] for r in results
+                  if not r["errors"] and r["worst_page_p95_ms"] <= args.p95_budget_ms]
+        capacity = max(passed) if passed else 0
+        print(f"\n同時 {capacity} 人まで全ページの再実行 p95 が {args.p95_budget_ms:.0f} ms 以下でした")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "raw_server": server.stats},
+                      f, ensure_ascii=False, indent=2)
+    server.shutdown()
+    sys.exit(1 if any(r["errors"] for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ==========================================
+# 🔹 ページ描画時間の計測
+# ==========================================
+# 各ページ (app_j.py はモード) の再実行 1 回ごとの所要時間と、その中の名前付きステップ
+# (content_load / firestore_read / firestore_write / chart_render) の時間をメモリ上の
+# ヒストグラムに集計する。1 回ごとの記録はローテーションするログファイルにも書き出す。
+#
+#   with page_timer("app", st.session_state.page):
+#       ...
+#       with step("firestore_read"):
+#           doc = ref.get()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PERF_LOG_DIR = os.environ.get("PERF_LOG_DIR", os.path.join(BASE_DIR, "logs"))
+PERF_LOG_MAX_BYTES = 1_000_000
+PERF_LOG_BACKUP_COUNT = 5
+
+# ヒストグラムのバケット上限 (ミリ秒)
+BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float("inf")]
+
+
+class LatencyHistogram:
+    """固定バケットの所要時間ヒストグラム"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_BOUNDS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """p (0-100) パーセンタイルが含まれるバケットの上限 (最後のバケットは最大値)"""
+        if self.count == 0:
+            return 0.0
+        threshold = self.count * p / 100
+        running = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS_MS, self.counts):
+            running += bucket_count
+            if running >= threshold:
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+_lock = threading.Lock()
+_page_histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+_step_histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+_local = threading.local()   # Streamlit はセッションごとのスレッドでスクリプトを実行する
+_logger: Optional[logging.Logger] = None
+_rerun_listeners: List[Callable] = []
+
+
+def _perf_logger() -> Optional[logging.Logger]:
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("english_booster.perf")
+        logger.propagate = False
+        try:
+            os.makedirs(PERF_LOG_DIR, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(PERF_LOG_DIR, "perf_metrics.log"),
+                                          maxBytes=PERF_LOG_MAX_BYTES, backupCount=PERF_LOG_BACKUP_COUNT,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        except OSError as e:
+            print(f"計測ログファイルを開けませんでした: {e}")
+        _logger = logger
+    return _logger
+
+
+def current_page() -> Tuple[str, str]:
+    """このスレッドで計測中の (アプリ名, ページ名)。計測外なら ("background", "-")"""
+    return getattr(_local, "page", None) or ("background", "-")
+
+
+@contextmanager
+def page_timer(app: str, page):
+    """ページ (モード) の描画 1 回を計測する。st.rerun() / st.stop() で抜けた場合も記録する"""
+    key = (app, str(page))
+    previous = getattr(_local, "page", None)
+    previous_steps = getattr(_local, "steps", None)
+    previous_counters = getattr(_local, "counters", None)
+    _local.page = key
+    _local.steps = {}
+    _local.counters = {}
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        steps = _local.steps
+        counters = _local.counters
+        _local.page = previous
+        _local.steps = previous_steps
+        _local.counters = previous_counters
+        with _lock:
+            _page_histograms.setdefault(key, LatencyHistogram()).add(elapsed_ms)
+            listeners = list(_rerun_listeners)
+        for listener in listeners:
+            try:
+                listener(app, str(page), elapsed_ms, steps, counters)
+            except Exception as e:
+                print(f"計測リスナーでエラーが発生しました: {e}")
+        logger = _perf_logger()
+        if logger is not None:
+            logger.info(json.dumps({
+                "ts": round(time.time(), 3),
+                "app": app,
+                "page": str(page),
+                "ms": round(elapsed_ms, 1),
+                "steps": {name: round(ms, 1) for name, ms in steps.items()},
+                "counters": counters,
+            }, ensure_ascii=False))
+
+
+@contextmanager
+def step(name: str):
+    """ページ内の名前付きステップを計測する"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        app, page = current_page()
+        steps = getattr(_local, "steps", None)
+        if steps is not None:
+            steps[name] = steps.get(name, 0.0) + elapsed_ms
+        with _lock:
+            _step_histograms.setdefault((app, page, name), LatencyHistogram()).add(elapsed_ms)
+
+
+def count(name: str, n: int = 1):
+    """計測中の再実行 1 回分のカウンター (Firestore の読み取り件数など) に加算する"""
+    counters = getattr(_local, "counters", None)
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + n
+
+
+def add_rerun_listener(listener: Callable):
+    """再実行 1 回の計測が終わるたびに listener(app, page, elapsed_ms, steps, counters) を呼ぶ"""
+    with _lock:
+        if listener not in _rerun_listeners:
+            _rerun_listeners.append(listener)
+
+
+def timed_step(name: str):
+    """関数全体をステップとして計測するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with step(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def page_stats() -> List[dict]:
+    """ページごとの集計 (遅い順)"""
+    with _lock:
+        rows = [{"app": app, "page": page, **hist.summary()} for (app, page), hist in _page_histograms.items()]
+    return sorted(rows, key=lambda r: r["p95_ms"], reverse=True)
+
+
+def step_stats() -> List[dict]:
+    """ページ・ステップごとの集計 (遅い順)"""
+    with _lock:
+        rows = [{"app": app, "page": page, "step": name, **hist.summary()}
+                for (app, page, name), hist in _step_histograms.items()]
+    return sorted(rows, key=lambda r: r["p95_ms"], reverse=True)
+
+
+def reset_stats():
+    with _lock:
+        _page_histograms.clear()
+        _step_histograms.clear()
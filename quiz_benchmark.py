@@ -0,0 +1,249 @@
+"""app_j.py のクイズ処理 (純粋な関数) のマイクロベンチマーク
+
+shuffle_data/*.csv のすべての英文と、大きな固有名詞リスト (合成) に対して
+tokenize / detokenize / shuffle_question / generate_shuffling_data / init_session_state /
+handle_word_click / normalize_user_answer のスループットを計測する。
+content_hit[shared] / content_hit[pickle] は問題データ (全問題CSV・問題セット一覧・固有名詞) の
+取り出し 1 回あたりの速さで、共有キャッシュと st.cache_data 相当 (取り出すたびに pickle から復元) を比べる。
+
+    python quiz_benchmark.py --save-baseline      # 現在の値を基準として保存
+    python quiz_benchmark.py                      # 基準と比較 (20% 以上遅くなったら終了コード 1)
+    python quiz_benchmark.py -k tokenize --threshold 0.1
+
+基準値はマシンに依存するため、同じマシン (同じ Python) で保存したものと比較すること。
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SHUFFLE_DIR = os.path.join(BASE_DIR, "shuffle_data")
+DEFAULT_BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "quiz_baseline.json")
+DEFAULT_THRESHOLD = 0.2       # 基準よりこの割合以上スループットが落ちたら失敗
+DEFAULT_ROUNDS = 7
+MIN_ROUND_SECONDS = 0.05      # 1 ラウンドの最低計測時間 (この時間を超えるまで繰り返す)
+SYNTHETIC_NOUN_COUNTS = (1000, 5000)
+SYNTHETIC_SAMPLE = 10         # 合成リストのケースは固有名詞 1 つごとに正規表現を使うため英文を間引く
+SEED = 20240401
+
+NON_QUESTION_CSV = {"questions_select.csv", "proper_nouns.csv"}
+
+
+def question_csv_names() -> List[str]:
+    return [name for name in sorted(os.listdir(SHUFFLE_DIR))
+            if name.endswith(".csv") and name not in NON_QUESTION_CSV]
+
+
+def load_sentences() -> List[str]:
+    """問題 CSV の english 列をすべて読み込む"""
+    import pandas as pd
+    sentences = []
+    for name in question_csv_names():
+        df = pd.read_csv(os.path.join(SHUFFLE_DIR, name))
+        if "english" in df.columns:
+            sentences.extend(str(s).strip() for s in df["english"].dropna())
+    return sentences
+
+
+def synthetic_proper_nouns(base: List[str], count: int) -> List[str]:
+    """実際の固有名詞に、1〜3 語の架空の固有名詞を加えて count 個にする"""
+    rng = random.Random(SEED + count)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    nouns = list(base)
+    while len(nouns) < count:
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        nouns.append(" ".join(words))
+    return nouns
+
+
+def build_cases(app_j, sentences: List[str], proper_nouns: List[str]) -> Dict[str, Tuple[Callable[[], None], int]]:
+    """{ケース名: (1 回分の処理, 1 回で処理する件数)}"""
+    import pandas as pd
+    import streamlit as st
+
+    cases: Dict[str, Tuple[Callable[[], None], int]] = {}
+    n = len(sentences)
+
+    def tokenize_all(targets, nouns):
+        def run():
+            for s in targets:
+                app_j.tokenize(s, nouns)
+        return run
+
+    cases["tokenize"] = (tokenize_all(sentences, proper_nouns), n)
+    sample = sentences[::max(n // SYNTHETIC_SAMPLE, 1)][:SYNTHETIC_SAMPLE]
+    for count in SYNTHETIC_NOUN_COUNTS:
+        cases[f"tokenize[{count} nouns]"] = (tokenize_all(sample, synthetic_proper_nouns(proper_nouns, count)),
+                                             len(sample))
+
+    token_lists = [app_j.tokenize(s, proper_nouns) for s in sentences]
+
+    def detokenize_all():
+        for tokens in token_lists:
+            app_j.detokenize(tokens)
+    cases["detokenize"] = (detokenize_all, n)
+
+    def shuffle_all():
+        for s in sentences:
+            app_j.shuffle_question(s, proper_nouns)
+    cases["shuffle_question"] = (shuffle_all, n)
+
+    def generate_all():
+        for s in sentences:
+            app_j.generate_shuffling_data(s, proper_nouns)
+    cases["generate_shuffling_data"] = (generate_all, n)
+
+    df = pd.DataFrame({"id": range(n), "english": sentences, "japanese": [""] * n})
+
+    def init_all():
+        st.session_state.quiz_type = "shuffling"
+        st.session_state.app_mode = "quiz"
+        for i in range(n):
+            st.session_state.index = i
+            app_j.init_session_state(df, proper_nouns)
+    cases["init_session_state"] = (init_all, n)
+
+    shuffled = [app_j.generate_shuffling_data(s, proper_nouns)[0] for s in sentences]
+
+    def click_all():
+        # 1 問分の語句をすべて押す (先頭の大文字化を含む)
+        st.session_state.quiz_complete = False
+        for words in shuffled:
+            st.session_state.selected = []
+            st.session_state.used_indices = []
+            for i, word in enumerate(words):
+                app_j.handle_word_click(i, word)
+    cases["handle_word_click"] = (click_all, n)
+
+    def normalize_all():
+        for words in shuffled:
+            app_j.normalize_user_answer(words)
+    cases["normalize_user_answer"] = (normalize_all, n)
+
+    csv_names = question_csv_names()
+    content_count = len(csv_names) + 2
+
+    def shared_hits():
+        for name in csv_names:
+            app_j.load_quiz_data(name)
+        app_j.load_selection_data()
+        app_j.load_proper_nouns()
+    cases["content_hit[shared]"] = (shared_hits, content_count)
+
+    pickled = [pickle.dumps(app_j.load_quiz_data(name)) for name in csv_names]
+    pickled += [pickle.dumps(app_j.load_selection_data()), pickle.dumps(list(app_j.load_proper_nouns()))]
+
+    def pickle_hits():
+        for data in pickled:
+            pickle.loads(data)
+    cases["content_hit[pickle]"] = (pickle_hits, content_count)
+    return cases
+
+
+def measure(func: Callable[[], None], items: int, rounds: int) -> dict:
+    """ラウンドごとに MIN_ROUND_SECONDS を超えるまで繰り返し、件数/秒の中央値を返す"""
+    func()   # ウォームアップ (正規表現のコンパイルなど)
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_ROUND_SECONDS:
+            break
+        loops *= 2
+    rates = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        rates.append(items * loops / (time.perf_counter() - start))
+    return {
+        "ops_per_sec": round(statistics.median(rates), 1),
+        "min_ops_per_sec": round(min(rates), 1),
+        "stdev_percent": round(statistics.pstdev(rates) / statistics.mean(rates) * 100, 1),
+        "loops": loops,
+    }
+
+
+def machine_info() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "processor": platform.processor() or platform.machine()}
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: Dict[str, dict]):
+    """-k で一部のケースだけ実行した場合は、そのケースの基準値だけを置き換える"""
+    previous = load_baseline(path)
+    merged = dict(previous["results"]) if previous and previous.get("machine") == machine_info() else {}
+    merged.update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"machine": machine_info(), "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "results": merged}, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="クイズ処理のマイクロベンチマーク")
+    parser.add_argument("-k", dest="keyword", help="名前にこの文字列を含むケースだけ実行する")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基準値の JSON ファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果を基準値として保存する")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="基準からのスループット低下の許容割合 (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    import app_j
+    random.seed(SEED)
+    sentences = load_sentences()
+    proper_nouns = app_j.load_proper_nouns()
+    cases = build_cases(app_j, sentences, proper_nouns)
+    if args.keyword:
+        cases = {name: case for name, case in cases.items() if args.keyword in name}
+
+    print(f"英文 {len(sentences)} 件 / 固有名詞 {len(proper_nouns)} 件\n")
+    results = {}
+    for name, (func, items) in cases.items():
+        results[name] = measure(func, items, args.rounds)
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    if baseline and baseline.get("machine") != machine_info():
+        print(f"⚠️ 基準値は別の環境で保存されています ({baseline.get('machine')})\n")
+
+    ok = True
+    print(f"{'case':<28}{'件/秒':>14}{'ばらつき':>10}{'基準':>14}{'変化':>9}")
+    for name, result in results.items():
+        line = f"{name:<28}{result['ops_per_sec']:>14,.0f}{result['stdev_percent']:>9.1f}%"
+        base = (baseline or {}).get("results", {}).get(name)
+        if base:
+            change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+            regressed = change < -args.threshold
+            ok = ok and not regressed
+            line += f"{base['ops_per_sec']:>14,.0f}{change * 100:>+8.1f}%" + ("  ❌ 低下" if regressed else "")
+        print(line)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n基準値を保存しました: {args.baseline}")
+    elif baseline is None:
+        print(f"\n基準値がありません ({args.baseline})。--save-baseline で保存してください。")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# ==========================================
+# 🔹 GitHub raw の代わりになるローカル HTTP サーバー (ベンチマーク・オフライン用)
+# ==========================================
+# リポジトリ内の CSV / MP3 / 画像を GitHub と同じパス構成で配信する。
+# 遅延・帯域・エラーを設定できるので、コンテンツ読み込みの計測を毎回同じ条件で行える。
+#
+#   python raw_server.py --port 8765 --latency-ms 150 --bandwidth-kbps 2000 --error-rate 0.05
+#   GITHUB_RAW_BASE=http://127.0.0.1:8765/ streamlit run app.py
+#
+# 対応しているパス (いずれもリポジトリ直下からの相対パスに対応付ける):
+#   /boost-ogawa/english-booster/main/<path>                  (raw.githubusercontent.com)
+#   /boost-ogawa/english-booster/refs/heads/main/<path>       (raw.githubusercontent.com)
+#   /boost-ogawa/english-booster/blob/main/<path>?raw=true    (github.com)
+#   /media/boost-ogawa/english-booster/refs/heads/main/<path> (media.githubusercontent.com)
+#   /<path>
+# /__stats でリクエスト数などの集計を JSON で返す。
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_PATH_PREFIXES = (
+    "/media/boost-ogawa/english-booster/refs/heads/main/",
+    "/boost-ogawa/english-booster/refs/heads/main/",
+    "/boost-ogawa/english-booster/blob/main/",
+    "/boost-ogawa/english-booster/main/",
+)
+CONTENT_TYPES = {
+    ".csv": "text/plain; charset=utf-8",   # raw.githubusercontent.com と同じ
+    ".mp3": "audio/mpeg",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+CHUNK_SIZE = 16 * 1024
+
+
+class RawServerOptions:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, bandwidth_kbps: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, etag: bool = True, max_age: int = 300):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bandwidth_kbps = bandwidth_kbps   # 0 なら帯域制限なし
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.etag = etag
+        self.max_age = max_age
+
+
+def resolve_path(url_path: str) -> Optional[str]:
+    """URL のパスをリポジトリ内のファイルに対応付ける (配信対象外なら None)"""
+    path = urllib.parse.unquote(url_path.split("?", 1)[0])
+    for prefix in REPO_PATH_PREFIXES:
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    relpath = path.lstrip("/")
+    if not relpath or any(part.startswith(".") for part in relpath.split("/")):
+        return None   # .streamlit/secrets.toml などは配信しない
+    if os.path.splitext(relpath)[1].lower() not in CONTENT_TYPES:
+        return None
+    full_path = os.path.normpath(os.path.join(BASE_DIR, relpath))
+    if not full_path.startswith(BASE_DIR + os.sep) or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+
+class _FileCache:
+    """ファイル内容と ETag (更新時刻が変わったら読み直す)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Tuple[bytes, str]:
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                return entry[1], entry[2]
+        with open(path, "rb") as f:
+            content = f.read()
+        etag = f'"{hashlib.sha256(content).hexdigest()[:16]}"'
+        with self._lock:
+            self._entries[path] = (mtime, content, etag)
+        return content, etag
+
+
+class RawRequestHandler(BaseHTTPRequestHandler):
+    server_version = "raw-server/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key: str, n: int = 1):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + n
+
+    def _delay(self):
+        options = self.server.options
+        delay_ms = max(0.0, options.latency_ms + random.uniform(-options.jitter_ms, options.jitter_ms))
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+    def _send_body(self, body: bytes):
+        kbps = self.server.options.bandwidth_kbps
+        if not kbps:
+            self.wfile.write(body)
+            return
+        bytes_per_sec = kbps * 1000 / 8
+        for i in range(0, len(body), CHUNK_SIZE):
+            chunk = body[i:i + CHUNK_SIZE]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bytes_per_sec)
+
+    def _send_stats(self):
+        with self.server.stats_lock:
+            body = json.dumps(self.server.stats, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, send_body: bool):
+        if self.path.split("?", 1)[0] == "/__stats":
+            self._send_stats()
+            return
+        self._count("requests")
+        self._delay()
+        options = self.server.options
+        if options.error_rate and random.random() < options.error_rate:
+            self._count("errors")
+            self.send_error(options.error_status, "injected error")
+            return
+
+        path = resolve_path(self.path)
+        if path is None:
+            self._count("not_found")
+            self.send_error(404)
+            return
+        content, etag = self.server.files.get(path)
+
+        if options.etag and self.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        status, body = 200, content
+        content_range = None
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            # 音声のシーク用 (bytes=start-end の単一範囲のみ)
+            start_s, _, end_s = range_header[len("bytes="):].partition("-")
+            try:
+                start = int(start_s) if start_s else max(len(content) - int(end_s), 0)
+                end = min(int(end_s), len(content) - 1) if start_s and end_s else len(content) - 1
+            except ValueError:
+                start, end = 0, len(content) - 1
+            if start <= end:
+                status, body = 206, content[start:end + 1]
+                content_range = f"bytes {start}-{end}/{len(content)}"
+
+        self._count("ok")
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES[os.path.splitext(path)[1].lower()])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", f"max-age={options.max_age}")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        if options.etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self._count("bytes", len(body))
+            try:
+                self._send_body(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, options: Optional[RawServerOptions] = None,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), RawRequestHandler)
+    server.daemon_threads = True
+    server.options = options or RawServerOptions()
+    server.files = _FileCache()
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.verbose = verbose
+    return server
+
+
+def start_in_background(host: str = "127.0.0.1", port: int = 0,
+                        options: Optional[RawServerOptions] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """別スレッドでサーバーを起動し、(サーバー, GITHUB_RAW_BASE に渡す URL) を返す (port=0 で空きポート)"""
+    server = make_server(host, port, options)
+    threading.Thread(target=server.serve_forever, name="raw-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="リポジトリのファイルを GitHub raw と同じパスで配信するローカルサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="リクエストごとの遅延 (ミリ秒)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="遅延の揺らぎ (± ミリ秒)")
+    parser.add_argument("--bandwidth-kbps", type=float, default=0.0, help="帯域 (kbps, 0 で無制限)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラーを返す確率 (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="エラー時のステータスコード")
+    parser.add_argument("--no-etag", action="store_true", help="ETag / If-None-Match に対応しない")
+    parser.add_argument("--max-age", type=int, default=300, help="Cache-Control の max-age (秒)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="リクエストごとにログを出す")
+    args = parser.parse_args()
+
+    options = RawServerOptions(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               bandwidth_kbps=args.bandwidth_kbps, error_rate=args.error_rate,
+                               error_status=args.error_status, etag=not args.no_etag, max_age=args.max_age)
+    server = make_server(args.host, args.port, options, verbose=args.verbose)
+    print(f"配信中: http://{args.host}:{server.server_address[1]}/ ({BASE_DIR})")
+    print(f"  GITHUB_RAW_BASE=http://{args.host}:{server.server_address[1]}/ を設定してアプリを起動してください")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
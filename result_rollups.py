@@ -0,0 +1,207 @@
+"""読書結果の月別集計 (先生向けレポート・CSV 出力用)
+
+結果を保存するたびに、monthly_rollups の集計ドキュメントを書き込み時に更新する。
+レポートや CSV はこの集計だけを読むので、結果のドキュメントをすべて読み直す必要がない。
+
+    {source}_{YYYY-MM}_user_{nickname}   生徒ごと: count / first・last・best WPM / WPM 合計 / 正答数・問題数
+    {source}_{YYYY-MM}_class_{class_id}  クラスごと: count / students / best WPM / WPM 合計 / 正答数・問題数
+
+生徒の集計はその月の最初の結果で create() し、2 回目以降は update() で加算・更新するため読み取りは発生しない。
+create() が成功したとき (その月の新しい生徒) だけクラスの students を 1 増やす。
+アプリは書き込んだ生徒の集計の ID (user_rollup_id) をセッションに残し、次からは known_user=True で
+失敗するとわかっている create() を省いて update() だけにする。
+生徒のクラスの情報はまだないので、class_id は全員をまとめた "all" だけ。
+
+source はアプリと結果の種類: english (app.py) / summer_english・summer_japanese (app_j_summer.py)
+
+    FIRESTORE_BACKEND=fake python result_rollups.py --source english --month 2026-10
+    python result_rollups.py --source english --user-csv user.csv             # user.csv と同じ形式 (各月初回の WPM)
+    python result_rollups.py --source summer_japanese --pivot-csv results_j.csv  # 生徒 × 月 (各月初回の WPM)
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from lazy_imports import lazy_import
+import fake_firestore
+
+# FIRESTORE_BACKEND=fake のときはインメモリの Firestore を使う (アプリと同じ)
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
+
+ROLLUP_COLLECTION = "monthly_rollups"
+DEFAULT_CLASS_ID = "all"
+DEFAULT_CREDENTIALS = "serviceAccountKey.json"
+
+
+def create_if_absent(doc_ref, data) -> bool:
+    """ドキュメントがなければ作成して True、すでにあれば False を返す"""
+    try:
+        doc_ref.create(data)
+        return True
+    except Exception as e:
+        # google.api_core.exceptions.AlreadyExists (Conflict) / fake_firestore.AlreadyExists
+        if type(e).__name__ in ("AlreadyExists", "Conflict"):
+            return False
+        raise
+
+
+def rollup_id(source: str, month: str, kind: str, key: str) -> str:
+    return f"{source}_{month}_{kind}_{key}".replace("/", "-")
+
+
+def user_rollup_id(source: str, measured_at: datetime, nickname: str) -> str:
+    return rollup_id(source, measured_at.strftime("%Y-%m"), "user", nickname)
+
+
+def record_result(db, source: str, nickname: str, measured_at: datetime, wpm: Optional[float],
+                  correct: int, questions: int, class_id: str = DEFAULT_CLASS_ID, known_user: bool = False) -> bool:
+    """1 件の結果を生徒・クラスの月別集計に加える。失敗しても結果の保存は止めないよう、例外は出さずに False を返す
+
+    known_user が True (このセッションですでに user_rollup_id の集計に書き込んだ) なら create() を試さずに update() する。
+    """
+    month = measured_at.strftime("%Y-%m")
+    wpm = round(float(wpm or 0.0), 1)
+    at = measured_at.isoformat()
+    updates = {
+        "count": firestore.Increment(1),
+        "last_wpm": wpm, "last_at": at,
+        "best_wpm": firestore.Maximum(wpm), "wpm_sum": firestore.Increment(wpm),
+        "correct": firestore.Increment(correct), "questions": firestore.Increment(questions),
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+    try:
+        collection = db.collection(ROLLUP_COLLECTION)
+        user_ref = collection.document(user_rollup_id(source, measured_at, nickname))
+        new_student = False
+        if known_user:
+            try:
+                user_ref.update(updates)
+            except Exception as e:
+                # 集計が消されていた場合は、初めての結果として作り直す
+                if type(e).__name__ != "NotFound":
+                    raise
+                known_user = False
+        if not known_user:
+            new_student = create_if_absent(user_ref, {
+                "source": source, "month": month, "kind": "user", "nickname": nickname, "class_id": class_id,
+                "count": 1,
+                "first_wpm": wpm, "first_at": at,
+                "last_wpm": wpm, "last_at": at,
+                "best_wpm": wpm, "wpm_sum": wpm,
+                "correct": correct, "questions": questions,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+            if not new_student:
+                user_ref.update(updates)
+        collection.document(rollup_id(source, month, "class", class_id)).set({
+            "source": source, "month": month, "kind": "class", "class_id": class_id,
+            "count": firestore.Increment(1),
+            "students": firestore.Increment(1 if new_student else 0),
+            "best_wpm": firestore.Maximum(wpm), "wpm_sum": firestore.Increment(wpm),
+            "correct": firestore.Increment(correct), "questions": firestore.Increment(questions),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        return True
+    except Exception as e:
+        print(f"月別集計の更新に失敗しました ({source} {month} {nickname}): {e}")
+        return False
+
+
+# ==========================================
+# 🔹 レポート (集計ドキュメントだけを読む)
+# ==========================================
+def load_rollups(db, source: str, kind: str = "user", month: Optional[str] = None) -> List[dict]:
+    query = db.collection(ROLLUP_COLLECTION).where("source", "==", source).where("kind", "==", kind)
+    if month:
+        query = query.where("month", "==", month)
+    return [doc.to_dict() for doc in query.get()]
+
+
+def report_rows(rollups: List[dict]) -> List[dict]:
+    """表示用に平均 WPM と正答率を加え、月・名前の順に並べる"""
+    rows = []
+    for r in rollups:
+        count = r.get("count", 0)
+        questions = r.get("questions", 0)
+        rows.append({
+            "month": r.get("month"),
+            "name": r.get("nickname") or r.get("class_id"),
+            "count": count,
+            "students": r.get("students"),
+            "first_wpm": r.get("first_wpm"),
+            "last_wpm": r.get("last_wpm"),
+            "best_wpm": r.get("best_wpm"),
+            "avg_wpm": round(r.get("wpm_sum", 0) / count, 1) if count else None,
+            "accuracy": round(r.get("correct", 0) / questions * 100, 1) if questions else None,
+        })
+    return sorted(rows, key=lambda row: (row["month"] or "", str(row["name"])))
+
+
+def write_user_csv(rollups: List[dict], path: str):
+    """user.csv と同じ形式 (nickname,date,wpm) で、各月初回の結果を書き出す"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["nickname", "date", "wpm"])
+        for r in sorted(rollups, key=lambda r: (r["nickname"], r["first_at"]), reverse=True):
+            first_at = datetime.fromisoformat(r["first_at"])
+            writer.writerow([r["nickname"], f"{first_at.year}/{first_at.month}/{first_at.day}", r["first_wpm"]])
+
+
+def write_pivot_csv(rollups: List[dict], path: str):
+    """results_j.csv と同じ形式 (user_id × 年月) で、各月初回の WPM を書き出す"""
+    months = sorted({r["month"] for r in rollups})
+    table: Dict[str, Dict[str, float]] = {}
+    for r in rollups:
+        table.setdefault(r["nickname"], {})[r["month"]] = r["first_wpm"]
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id"] + [f"{int(m[:4])}年{int(m[5:])}月" for m in months])
+        for nickname in sorted(table):
+            writer.writerow([nickname] + [table[nickname].get(m, "") for m in months])
+
+
+def client(credentials_path: str = DEFAULT_CREDENTIALS):
+    """コマンドライン用の Firestore クライアント (FIRESTORE_BACKEND=fake ならインメモリ)"""
+    if fake_firestore.enabled():
+        return firestore.client()
+    import firebase_admin
+    from firebase_admin import credentials
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+    return firestore.client()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="読書結果の月別集計を表示・CSV に書き出す")
+    parser.add_argument("--source", required=True, help="english / summer_english / summer_japanese")
+    parser.add_argument("--month", help="対象の年月 (YYYY-MM)。省略するとすべての月")
+    parser.add_argument("--classes", action="store_true", help="生徒ごとではなくクラスごとの集計を表示する")
+    parser.add_argument("--user-csv", help="user.csv と同じ形式で書き出すファイル")
+    parser.add_argument("--pivot-csv", help="results_j.csv と同じ形式 (生徒 × 年月) で書き出すファイル")
+    parser.add_argument("--credentials", default=DEFAULT_CREDENTIALS, help="サービスアカウントキーの JSON")
+    args = parser.parse_args(argv)
+
+    db = client(args.credentials)
+    rollups = load_rollups(db, args.source, "class" if args.classes else "user", args.month)
+    if not rollups:
+        print("集計がありません。")
+        return 1
+
+    columns = ("month", "name", "count", "students", "first_wpm", "last_wpm", "best_wpm", "avg_wpm", "accuracy")
+    print("".join(f"{c:>12}" for c in columns))
+    for row in report_rows(rollups):
+        print("".join(f"{'-' if row[c] is None else row[c]!s:>12}" for c in columns))
+
+    if args.user_csv and not args.classes:
+        write_user_csv(rollups, args.user_csv)
+        print(f"\n{args.user_csv} に書き出しました")
+    if args.pivot_csv and not args.classes:
+        write_pivot_csv(rollups, args.pivot_csv)
+        print(f"\n{args.pivot_csv} に書き出しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
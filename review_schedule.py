@@ -0,0 +1,116 @@
+"""復習の出題予定 (ライトナー方式)
+
+生徒ごとに 1 つのドキュメント review_schedules/{student_key} (ニックネームのハッシュ。app_j.student_key) を持ち、間違えた問題ごとの箱と次の出題日時を入れておく。
+
+    items.{key} = {quiz_set, id, box, due, lapses}
+
+  - 間違えたら箱 0 に戻し、すぐに出題する (lapses を 1 増やす)
+  - 正解したら次の箱に進め、INTERVAL_DAYS[箱] 日後に出題する
+  - 最後の箱で正解したら予定から外す (覚えた問題は復習に出なくなる)
+  - 予定にない問題に正解したときは何も書き込まない
+
+復習では出題日時を過ぎた問題だけを、箱の小さい順・出題日時の古い順に REVIEW_LIMIT 問まで出す。
+予定を読むのは復習を始めるとき (load_schedule) と、セッションで最初に解答を保存するとき (read_schedule) だけ。
+解答の保存ではセッションに持っている予定を使い、変わった問題の分だけを merge で書く (add_review_answer):
+  - 不正解は予定によらず決まる (箱 0・今すぐ・lapses は Increment)
+  - 正解で箱を進める・予定から外すのは、読んだ予定にその問題があるとき
+まだ seeded でない生徒は、復習を始めたときに以前の結果から間違えた問題を集めて (1 回だけ) 予定に加える。
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from lazy_imports import lazy_import
+import fake_firestore
+
+# FIRESTORE_BACKEND=fake のときはインメモリの Firestore を使う (アプリと同じ)
+firestore = fake_firestore if fake_firestore.enabled() else lazy_import("firebase_admin.firestore")
+
+SCHEDULE_COLLECTION = "review_schedules"
+INTERVAL_DAYS = (0, 1, 3, 7, 14, 30)   # 箱ごとの次の出題までの日数
+REVIEW_LIMIT = 20
+
+
+def schedule_key(quiz_set: str, item_id) -> str:
+    """items のキー (フィールド名に使えない "." と "/" を置き換える)"""
+    return f"{quiz_set}#{item_id}".replace(".", "_").replace("/", "-")
+
+
+def next_entry(entry: Optional[dict], quiz_set: str, item_id, is_correct: bool, now: datetime) -> Optional[dict]:
+    """解答後の予定を返す。予定から外すとき (覚えた・予定にない問題に正解) は None"""
+    if is_correct:
+        if entry is None or entry.get("box", 0) + 1 >= len(INTERVAL_DAYS):
+            return None
+        box = entry.get("box", 0) + 1
+        return {**entry, "box": box, "due": now + timedelta(days=INTERVAL_DAYS[box])}
+    lapses = (entry or {}).get("lapses", 0) + 1
+    return {"quiz_set": quiz_set, "id": item_id, "box": 0, "due": now, "lapses": lapses}
+
+
+def _read(doc_ref) -> dict:
+    snapshot = doc_ref.get()
+    return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+
+def read_schedule(db, student_key: str) -> Dict[str, dict]:
+    """生徒の予定を読むだけ (以前の結果からは作らない)。ドキュメントがなければ空"""
+    return dict(_read(db.collection(SCHEDULE_COLLECTION).document(student_key)).get("items", {}))
+
+
+def load_schedule(db, student_key: str, seed: Callable[[], Iterable[Tuple[str, object]]]) -> Dict[str, dict]:
+    """生徒の予定を読む。まだ seeded でなければ、seed() の (quiz_set, id) のうち予定にないものを今すぐ出題する予定として加える"""
+    doc_ref = db.collection(SCHEDULE_COLLECTION).document(student_key)
+    data = _read(doc_ref)
+    items = dict(data.get("items", {}))
+    if data.get("seeded"):
+        return items
+
+    now = datetime.now(timezone.utc)
+    added = {}
+    for quiz_set, item_id in seed():
+        key = schedule_key(quiz_set, item_id)
+        if key not in items and key not in added:
+            added[key] = next_entry(None, quiz_set, item_id, False, now)
+    doc_ref.set({"student_key": student_key, "items": added, "seeded": True,
+                 "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    items.update(added)
+    return items
+
+
+def add_review_answer(batch, db, student_key: str, items: Optional[Dict[str, dict]], quiz_set: str, item_id,
+                      is_correct: bool) -> bool:
+    """解答を予定に反映する書き込みを batch に加える (読み取りなし)。加えたら True
+
+    items はこのセッションで読んだ予定 (まだ読んでいなければ None) で、書き込む内容に合わせて更新する。
+    """
+    key = schedule_key(quiz_set, item_id)
+    entry = items.get(key) if items is not None else None
+    if entry is None and is_correct:
+        return False
+    now = datetime.now(timezone.utc)
+    updated = next_entry(entry, quiz_set, item_id, is_correct, now)
+    if is_correct:
+        # 箱と出題日時だけを書く (lapses はほかのタブでの不正解の Increment を上書きしない)
+        value = firestore.DELETE_FIELD if updated is None else {"box": updated["box"], "due": updated["due"]}
+    else:
+        value = {"quiz_set": quiz_set, "id": item_id, "box": 0, "due": now, "lapses": firestore.Increment(1)}
+    if items is not None:
+        if updated is None:
+            items.pop(key, None)
+        else:
+            items[key] = updated
+    batch.set(db.collection(SCHEDULE_COLLECTION).document(student_key), {
+        "student_key": student_key,
+        "items": {key: value},
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    return True
+
+
+def due_items(items: Dict[str, dict], quiz_set: Optional[str] = None, limit: Optional[int] = REVIEW_LIMIT,
+              now: Optional[datetime] = None) -> List[Tuple[str, object]]:
+    """出題日時を過ぎた (quiz_set, id) を、箱の小さい順・出題日時の古い順に limit 件まで (None ならすべて) 返す"""
+    now = now or datetime.now(timezone.utc)
+    due = [e for e in items.values()
+           if e.get("due") is not None and e["due"] <= now and (quiz_set is None or e.get("quiz_set") == quiz_set)]
+    due.sort(key=lambda e: (e.get("box", 0), e["due"]))
+    return [(e["quiz_set"], e["id"]) for e in due[:limit]]
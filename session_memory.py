@@ -0,0 +1,202 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# ==========================================
+# 🔹 セッションごとのメモリ使用量と、アイドルセッションの整理
+# ==========================================
+# 各アプリは再実行のたびに track_session() を呼び、このプロセスで生きているセッションの
+# session_state を登録する。自動で再実行される st.fragment (run_every) は touch_session() で操作中とみなす。
+# 診断ページではセッションごとの深いサイズ (参照先まで含めたサイズ) とキーごとの合計を表示する。
+#
+# SESSION_IDLE_EXPIRE_MIN 分 (既定 180) 操作のないセッションは、session_state をすべて消す
+# (次の操作でログイン画面に戻る)。確認は CHECK_INTERVAL 秒に 1 回。
+#
+#   track_session("app")
+
+IDLE_EXPIRE_SECONDS = float(os.environ.get("SESSION_IDLE_EXPIRE_MIN", "180")) * 60
+CHECK_INTERVAL = 60
+TOP_KEYS = 3
+
+
+class _SessionRecord:
+    __slots__ = ("app", "state", "first_seen", "last_active")
+
+    def __init__(self, app: str, state):
+        self.app = app
+        self.state = state            # SafeSessionState (スレッドセーフ)
+        self.first_seen = time.time()
+        self.last_active = self.first_seen
+
+
+_lock = threading.Lock()
+_sessions: Dict[str, _SessionRecord] = {}
+_last_check = 0.0
+_eviction_stats = {"expired_sessions": 0, "freed_bytes": 0}
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """参照先まで含めたおおよそのサイズ (バイト)。DataFrame / Series は pandas の計算を使う"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    type_name = type(obj).__name__
+    if type_name in ("DataFrame", "Series", "Index") and hasattr(obj, "memory_usage"):
+        try:
+            usage = obj.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        except Exception:
+            pass
+    if type_name == "ndarray" and hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            size += deep_sizeof(key, _seen) + deep_sizeof(value, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in list(obj):
+            size += deep_sizeof(item, _seen)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), _seen)
+    return size
+
+
+def _current_ctx():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def track_session(app: str):
+    """現在のセッションを登録し、最終操作時刻を更新する (各アプリの再実行ごとに呼ぶ)"""
+    ctx = _current_ctx()
+    if ctx is None:
+        return
+    with _lock:
+        record = _sessions.get(ctx.session_id)
+        if record is None:
+            record = _SessionRecord(app, ctx.session_state)
+            _sessions[ctx.session_id] = record
+        record.last_active = time.time()
+    evict_idle_sessions()
+
+
+def touch_session():
+    """登録済みのセッションの最終操作時刻だけを更新する (st.fragment の自動再実行から呼ぶ)"""
+    ctx = _current_ctx()
+    if ctx is None:
+        return
+    with _lock:
+        record = _sessions.get(ctx.session_id)
+        if record is not None:
+            record.last_active = time.time()
+
+
+def _is_alive(session_id: str) -> bool:
+    try:
+        from streamlit.runtime import Runtime
+        return not Runtime.exists() or bool(Runtime.instance().is_active_session(session_id))
+    except Exception:
+        return True
+
+
+def evict_idle_sessions(force: bool = False) -> int:
+    """終了したセッションの登録を外し、アイドルセッションを破棄する。破棄したセッション数を返す"""
+    global _last_check
+    now = time.time()
+    with _lock:
+        if not force and now - _last_check < CHECK_INTERVAL:
+            return 0
+        _last_check = now
+        records = list(_sessions.items())
+
+    count = 0
+    for session_id, record in records:
+        if not _is_alive(session_id):
+            with _lock:
+                _sessions.pop(session_id, None)
+            continue
+        if now - record.last_active < IDLE_EXPIRE_SECONDS:
+            continue
+        try:
+            state = record.state.filtered_state
+            keys = list(state)
+            freed = sum(deep_sizeof(state[k]) for k in keys)
+            for key in keys:
+                try:
+                    del record.state[key]
+                except KeyError:
+                    pass
+        except Exception as e:
+            print(f"セッションの整理に失敗しました ({session_id[:8]}): {e}")
+            continue
+        count += 1
+        with _lock:
+            _sessions.pop(session_id, None)
+            _eviction_stats["expired_sessions"] += 1
+            _eviction_stats["freed_bytes"] += freed
+    return count
+
+
+def session_report() -> List[dict]:
+    """生きているセッションごとのサイズ (大きい順)"""
+    now = time.time()
+    with _lock:
+        records = list(_sessions.items())
+    rows = []
+    for session_id, record in records:
+        try:
+            state = record.state.filtered_state
+        except Exception:
+            continue
+        sizes = {key: deep_sizeof(value) for key, value in state.items()}
+        top = sorted(sizes.items(), key=lambda x: x[1], reverse=True)[:TOP_KEYS]
+        rows.append({
+            "session": session_id[:8],
+            "app": record.app,
+            "nickname": state.get("nickname") or "-",
+            "idle_min": round((now - record.last_active) / 60, 1),
+            "keys": len(state),
+            "kb": round(sum(sizes.values()) / 1024, 1),
+            "largest_keys": ", ".join(f"{k} ({v / 1024:.1f} KB)" for k, v in top),
+        })
+    return sorted(rows, key=lambda r: r["kb"], reverse=True)
+
+
+def key_report() -> List[dict]:
+    """キーごとの全セッション合計 (大きい順)"""
+    with _lock:
+        records = list(_sessions.values())
+    totals: Dict[tuple, dict] = {}
+    for record in records:
+        try:
+            state = record.state.filtered_state
+        except Exception:
+            continue
+        for key, value in state.items():
+            size = deep_sizeof(value)
+            row = totals.setdefault((record.app, key), {"app": record.app, "key": key, "sessions": 0,
+                                                        "total_kb": 0.0, "max_kb": 0.0})
+            row["sessions"] += 1
+            row["total_kb"] += size / 1024
+            row["max_kb"] = max(row["max_kb"], size / 1024)
+    rows = list(totals.values())
+    for row in rows:
+        row["total_kb"] = round(row["total_kb"], 1)
+        row["max_kb"] = round(row["max_kb"], 1)
+    return sorted(rows, key=lambda r: r["total_kb"], reverse=True)
+
+
+def eviction_stats() -> dict:
+    with _lock:
+        return dict(_eviction_stats)
@@ -0,0 +1,100 @@
+"""Streamlit エントリーポイントの起動時インポート時間を計測するスクリプト
+
+各アプリのトップレベルの import 文だけを新しいプロセスで実行し、
+`python -X importtime` の結果からモジュールごとの所要時間を集計して予算と比較する。
+
+    python startup_profile.py app.py app_j.py app_j_summer.py --budget-ms 800
+
+予算を超えたアプリがあれば終了コード 1 を返す。
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_BUDGET_MS = 800.0          # アプリ1つあたりのトップレベル import の合計予算
+DEFAULT_MODULE_BUDGET_MS = 300.0   # モジュール1つあたりの予算
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# `streamlit run` ではスクリプト実行前にサーバー側で読み込み済みのため集計から除外する
+PRELOADED_BY_SERVER = ("streamlit",)
+
+
+def top_level_imports(script_path: str) -> Tuple[List[str], List[str]]:
+    """スクリプトのモジュールレベルの import 文と、そのモジュール名を抜き出す"""
+    with open(script_path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source, filename=script_path)
+    statements, modules = [], []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.module != "__future__":
+            modules.append(node.module)
+        else:
+            continue
+        statements.append(ast.get_source_segment(source, node))
+    return statements, list(dict.fromkeys(modules))
+
+
+def measure_imports(statements: List[str], modules: List[str]) -> Dict[str, float]:
+    """import 文を新しいプロセスで実行し、{モジュール名: cumulative ms} を返す
+
+    先に読み込まれたモジュールの依存として既に読み込まれていた場合は 0 になる。
+    """
+    preload = [f"import {name}" for name in PRELOADED_BY_SERVER]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(preload + statements)],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else "import failed")
+
+    timings = {module: 0.0 for module in modules if module not in PRELOADED_BY_SERVER}
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name in timings:
+            timings[name] = max(timings[name], int(cumulative_us) / 1000)
+    return timings
+
+
+def profile_script(script_path: str, budget_ms: float, module_budget_ms: float) -> bool:
+    statements, modules = top_level_imports(script_path)
+    timings = measure_imports(statements, modules)
+    total_ms = sum(timings.values())
+
+    print(f"=== {os.path.basename(script_path)} ===")
+    for name, cumulative in sorted(timings.items(), key=lambda x: x[1], reverse=True):
+        mark = "  ⚠️ 予算超過" if cumulative > module_budget_ms else ""
+        print(f"  {cumulative:9.1f} ms  {name}{mark}")
+    within_budget = total_ms <= budget_ms
+    status = "OK" if within_budget else "予算超過"
+    print(f"  合計 {total_ms:.1f} ms / 予算 {budget_ms:.0f} ms ... {status}\n")
+    return within_budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="エントリーポイントの起動時インポート時間を計測する")
+    parser.add_argument("scripts", nargs="*", default=["app.py", "app_j.py", "app_j_summer.py"])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--module-budget-ms", type=float, default=DEFAULT_MODULE_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for script in args.scripts:
+        ok = profile_script(os.path.join(BASE_DIR, script), args.budget_ms, args.module_budget_ms) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import streamlit as st
+
+import cache_registry
+from session_memory import deep_sizeof
+
+# ==========================================
+# 🔹 静的アセット配信
+# ==========================================
+# ヘッダー画像・テーマCSS・images_jp を static/ にコンテンツハッシュ付きの
+# ファイル名でコピーし、/app/static/ 経由で配信する。
+# ページ側は <link> / <img> の短いタグで参照するだけなので、
+# 再実行ごとに大きな <style> ブロックや GitHub のリダイレクトを経由しない。
+# (.streamlit/config.toml の server.enableStaticServing = true が必要)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL_PREFIX = "app/static"
+
+# このリポジトリの raw URL の接頭辞 (ローカルファイルへの対応付けに使用)
+REPO_RAW_PREFIXES = (
+    "https://raw.githubusercontent.com/boost-ogawa/english-booster/main/",
+    "https://raw.githubusercontent.com/boost-ogawa/english-booster/refs/heads/main/",
+    "https://github.com/boost-ogawa/english-booster/blob/main/",
+)
+
+_manifest: Dict[str, str] = {}
+_manifest_lock = threading.Lock()
+_manifest_stats = {"hits": 0, "misses": 0, "last_refresh": None}
+
+
+class _ManifestCache:
+    """キャッシュ一覧に出すための窓口 (消去すると次の参照でハッシュを計算し直す。static/ のファイルは残る)"""
+    name = "static_assets"
+    policy = "なし (パスごとに 1 件)"
+    max_bytes = 0
+
+    def cache_stats(self) -> dict:
+        with _manifest_lock:
+            return {"entries": len(_manifest), "bytes": deep_sizeof(_manifest), "hits": _manifest_stats["hits"],
+                    "misses": _manifest_stats["misses"], "evictions": 0,
+                    "last_refresh": _manifest_stats["last_refresh"]}
+
+    def clear(self):
+        with _manifest_lock:
+            _manifest.clear()
+
+    def set_max_bytes(self, max_bytes: int):
+        pass   # URL の対応表だけなので上限は設けない
+
+
+cache_registry.register(_ManifestCache())
+
+
+def _hashed_name(relpath: str, digest: str) -> str:
+    """'English Booster_header.jpg' -> 'English_Booster_header.<hash>.jpg'"""
+    stem, ext = os.path.splitext(os.path.basename(relpath))
+    return f"{stem.replace(' ', '_')}.{digest}{ext}"
+
+
+def asset_url(relpath: str, fallback_url: Optional[str] = None) -> Optional[str]:
+    """リポジトリ内のファイルをハッシュ付きで static/ に配置し、その URL を返す
+
+    ファイルが存在しない場合は fallback_url を返す。
+    ハッシュが変わらない限り URL も変わらないため、ブラウザ側で安全にキャッシュできる。
+    """
+    with _manifest_lock:
+        if relpath in _manifest:
+            _manifest_stats["hits"] += 1
+            return _manifest[relpath]
+        _manifest_stats["misses"] += 1
+
+        src_path = os.path.join(BASE_DIR, relpath)
+        if not os.path.isfile(src_path):
+            return fallback_url
+
+        try:
+            with open(src_path, "rb") as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            subdir = os.path.dirname(relpath)
+            dest_dir = os.path.join(STATIC_DIR, subdir)
+            dest_path = os.path.join(dest_dir, _hashed_name(relpath, digest))
+
+            if not os.path.exists(dest_path):
+                os.makedirs(dest_dir, exist_ok=True)
+                # 書き込み途中のファイルが配信されないよう一時ファイル経由で置き換える
+                tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, dest_path)
+        except OSError as e:
+            print(f"静的アセットの配置に失敗しました ({relpath}): {e}")
+            return fallback_url
+
+        url_path = "/".join(p for p in (STATIC_URL_PREFIX, subdir.replace(os.sep, "/"), _hashed_name(relpath, digest)) if p)
+        # ?v= はハッシュが同じ限り不変であることをプロキシ/ブラウザに伝える
+        url = f"{url_path}?v={digest}"
+        _manifest[relpath] = url
+        _manifest_stats["last_refresh"] = time.time()
+        return url
+
+
+def local_media_url(url: str) -> Optional[str]:
+    """このリポジトリの GitHub URL をローカルの static URL に置き換える (対応がなければ None)"""
+    if not isinstance(url, str):
+        return None
+    for prefix in REPO_RAW_PREFIXES:
+        if url.startswith(prefix):
+            relpath = url[len(prefix):].split("?")[0].replace("%20", " ")
+            return asset_url(relpath)
+    return None
+
+
+def inject_css(relpath: str):
+    """CSS を <link> タグで読み込む (ファイルがなければ従来どおりインラインで埋め込む)"""
+    url = asset_url(relpath)
+    if url:
+        st.markdown(f'<link rel="stylesheet" href="{url}">', unsafe_allow_html=True)
+        return
+    try:
+        with open(os.path.join(BASE_DIR, relpath), encoding="utf-8") as f:
+            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    except OSError as e:
+        print(f"CSSの読み込みに失敗しました ({relpath}): {e}")
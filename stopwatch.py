@@ -1,39 +1,11 @@
 import streamlit as st
 import time
+from static_assets import inject_css
 
 st.set_page_config(page_title="STOPWATCH", layout="centered")
 
-# 💅 CSS（省略せずそのまま残してね）
-st.markdown("""
-<style>
-.main { background-color: #f9f9f9 !important; }
-body, .css-18e3th9 { color: #111111 !important; }
-.big-time {
-    font-size: 96px;
-    font-weight: bold;
-    color: #007acc !important;
-    text-align: center;
-    margin-top: 40px;
-    margin-bottom: 40px;
-}
-.centered-title {
-    text-align: center;
-    font-size: 48px;
-    font-weight: bold;
-    color: #003366 !important;
-    margin-bottom: 10px;
-}
-.stButton>button {
-    width: 100%;
-    height: 80px;
-    font-size: 28px;
-    font-weight: bold;
-    background-color: #007acc !important;
-    color: white !important;
-    border-radius: 12px;
-}
-</style>
-""", unsafe_allow_html=True)
+# 💅 CSS（assets/stopwatch.css を static/ から読み込む）
+inject_css("assets/stopwatch.css")
 
 # 🏷️ タイトル
 st.markdown("<div class='centered-title'>STOPWATCH ⏱️</div>", unsafe_allow_html=True)
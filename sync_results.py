@@ -0,0 +1,251 @@
+"""Firestore の結果コレクションを手元の SQLite に差分同期するツール (分析・管理者向け集計用)
+
+コレクションごとに「変更時刻のフィールド」と、最後に取り込んだ (値, ドキュメント ID) を高水位として記録し、
+order_by(フィールド, ドキュメント ID) + start_after(高水位) で新しいものだけを BATCH_SIZE 件ずつ読む。
+初回はすべてを読み (= 最初の書き出し)、2 回目以降の読み取り件数は増えた分・更新された分だけになる。
+
+    analytics/results.sqlite
+      {collection}   列は export_results.SCHEMAS と同じ (+ _doc_id 主キー / _extra / _synced_at)
+      _sync_state    コレクションごとの高水位・行数・最終同期時刻
+
+更新されるドキュメント (results / shuffle_attempts / reading_attempts) は updated_at で追い、同じ _doc_id の行を置き換える。
+バッチごとに行と高水位を 1 つのトランザクションで書くので、途中で止めても次回は続きから同期できる。
+以前の results は updated_at を持たない (order_by の結果に出てこない) ため、最初の同期と追うフィールドを
+変えたときだけ、ドキュメント ID の順にすべてを読んでから updated_at で追う。
+
+    python sync_results.py                         # すべての結果コレクションを同期
+    python sync_results.py results --batch-size 200
+    python sync_results.py --stats                 # 行数と高水位を表示
+    python sync_results.py --sql "SELECT nickname, avg(wpm) FROM results GROUP BY nickname"
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from export_results import DOCUMENT_ID, SCHEMAS, client, normalize_row
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "analytics", "results.sqlite")
+DEFAULT_CREDENTIALS = "serviceAccountKey.json"
+BATCH_SIZE = 500
+
+# コレクションごとの変更時刻のフィールド (ISO 形式の文字列か、SERVER_TIMESTAMP の日時)
+CHANGE_FIELDS: Dict[str, str] = {
+    "results": "updated_at",
+    "shuffle_results": "timestamp",
+    "shuffle_attempts": "updated_at",
+    "english_results": "timestamp",
+    "english_text_results": "timestamp",
+    "japanese_results": "timestamp",
+    "reading_attempts": "updated_at",
+}
+DEFAULT_COLLECTIONS = tuple(CHANGE_FIELDS)
+# 変更時刻のフィールドを持たない以前のドキュメントがあるコレクション
+FULL_SCAN_FIRST = ("results",)
+
+_SQL_TYPES = {"str": "TEXT", "int": "INTEGER", "float": "REAL", "bool": "INTEGER", "timestamp": "TEXT", "json": "TEXT"}
+
+
+# ==========================================
+# 🔹 SQLite (行と高水位)
+# ==========================================
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS _sync_state (
+        collection TEXT PRIMARY KEY, field TEXT, last_value TEXT, last_id TEXT,
+        rows INTEGER DEFAULT 0, synced_at TEXT)""")
+    return conn
+
+
+def ensure_table(conn: sqlite3.Connection, collection: str) -> List[str]:
+    """コレクションのテーブルを作り (スキーマに列が増えていれば追加し)、列名を返す"""
+    columns = SCHEMAS.get(collection, {})
+    names = ["_doc_id"] + list(columns) + ["_extra", "_synced_at"]
+    definitions = ["_doc_id TEXT PRIMARY KEY"] + [f"{_quote(n)} {_SQL_TYPES[k]}" for n, k in columns.items()]
+    definitions += ["_extra TEXT", "_synced_at TEXT"]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(collection)} ({', '.join(definitions)})")
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({_quote(collection)})")}
+    for name, kind in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {_quote(collection)} ADD COLUMN {_quote(name)} {_SQL_TYPES[kind]}")
+    return names
+
+
+def _encode_mark(value) -> str:
+    """高水位の値を、クエリのカーソルに戻せる形 (型つき) で保存する"""
+    if isinstance(value, datetime):
+        return json.dumps({"datetime": value.isoformat()})
+    return json.dumps({"value": value}, ensure_ascii=False, default=str)
+
+
+def _decode_mark(text: Optional[str]):
+    if not text:
+        return None
+    data = json.loads(text)
+    return datetime.fromisoformat(data["datetime"]) if "datetime" in data else data["value"]
+
+
+def load_state(conn: sqlite3.Connection, collection: str) -> Tuple[Optional[str], object, Optional[str], int]:
+    """(追っているフィールド, 高水位の値, 高水位のドキュメント ID, 行数)"""
+    row = conn.execute("SELECT field, last_value, last_id, rows FROM _sync_state WHERE collection = ?",
+                       (collection,)).fetchone()
+    if row is None:
+        return None, None, None, 0
+    return row[0], _decode_mark(row[1]), row[2], row[3]
+
+
+def save_mark(conn: sqlite3.Connection, collection: str, field: str, last_value, last_id: Optional[str],
+              synced_at: str):
+    conn.execute("""INSERT INTO _sync_state (collection, field, last_value, last_id, rows, synced_at)
+                    VALUES (?, ?, ?, ?, 0, ?)
+                    ON CONFLICT(collection) DO UPDATE SET field = excluded.field,
+                        last_value = excluded.last_value, last_id = excluded.last_id,
+                        synced_at = excluded.synced_at""",
+                 (collection, field, _encode_mark(last_value), last_id, synced_at))
+
+
+def _sql_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# ==========================================
+# 🔹 差分の取り込み
+# ==========================================
+def iter_changes(db, collection: str, field: str, batch_size: int,
+                 last_value, last_id: Optional[str]) -> Iterator[List]:
+    """(field, ドキュメント ID) の順に、高水位より後ろのドキュメントを batch_size 件ずつ返す"""
+    while True:
+        query = db.collection(collection).order_by(field).order_by(DOCUMENT_ID).limit(batch_size)
+        if last_id is not None:
+            query = query.start_after({field: last_value, DOCUMENT_ID: last_id})
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield docs
+        last_value, last_id = docs[-1].get(field), docs[-1].id
+        if len(docs) < batch_size:
+            return
+
+
+def iter_all(db, collection: str, batch_size: int) -> Iterator[List]:
+    """ドキュメント ID の順に、すべてのドキュメントを batch_size 件ずつ返す"""
+    last_id = None
+    while True:
+        query = db.collection(collection).order_by(DOCUMENT_ID).limit(batch_size)
+        if last_id is not None:
+            query = query.start_after({DOCUMENT_ID: last_id})
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield docs
+        last_id = docs[-1].id
+        if len(docs) < batch_size:
+            return
+
+
+def _rows(docs: List, names: List[str], columns: Dict[str, str], synced_at: str) -> List[tuple]:
+    rows = []
+    for doc in docs:
+        row = normalize_row(doc.id, doc.to_dict() or {}, columns)
+        row["_synced_at"] = synced_at
+        rows.append(tuple(_sql_value(row.get(name)) for name in names))
+    return rows
+
+
+def sync_collection(db, conn: sqlite3.Connection, collection: str, batch_size: int = BATCH_SIZE) -> dict:
+    """1 つのコレクションの差分を取り込み、{"collection", "rows", "total_rows", "seconds"} を返す"""
+    field = CHANGE_FIELDS[collection]
+    columns = SCHEMAS.get(collection, {})
+    names = ensure_table(conn, collection)
+    insert = (f"INSERT OR REPLACE INTO {_quote(collection)} ({', '.join(_quote(n) for n in names)}) "
+              f"VALUES ({', '.join('?' for _ in names)})")
+    synced_field, last_value, last_id, _ = load_state(conn, collection)
+
+    start = time.perf_counter()
+    new_rows = 0
+    if collection in FULL_SCAN_FIRST and synced_field != field:
+        # 変更時刻のフィールドを持たないドキュメントも取り込む。高水位は終わってから field の先頭にする
+        for docs in iter_all(db, collection, batch_size):
+            rows = _rows(docs, names, columns, datetime.now(timezone.utc).isoformat())
+            with conn:
+                conn.executemany(insert, rows)
+            new_rows += len(rows)
+        last_value, last_id = None, None
+        with conn:
+            save_mark(conn, collection, field, None, None, datetime.now(timezone.utc).isoformat())
+    elif synced_field != field:
+        last_value, last_id = None, None
+    for docs in iter_changes(db, collection, field, batch_size, last_value, last_id):
+        synced_at = datetime.now(timezone.utc).isoformat()
+        rows = _rows(docs, names, columns, synced_at)
+        last_value, last_id = docs[-1].get(field), docs[-1].id
+        with conn:   # 行と高水位を同じトランザクションで書く
+            conn.executemany(insert, rows)
+            new_rows += len(rows)
+            save_mark(conn, collection, field, last_value, last_id, synced_at)
+    total = conn.execute(f"SELECT count(*) FROM {_quote(collection)}").fetchone()[0]
+    with conn:
+        conn.execute("UPDATE _sync_state SET rows = ? WHERE collection = ?", (total, collection))
+    return {"collection": collection, "rows": new_rows, "total_rows": total,
+            "seconds": round(time.perf_counter() - start, 1)}
+
+
+def print_stats(conn: sqlite3.Connection):
+    rows = conn.execute("SELECT collection, field, rows, last_value, synced_at FROM _sync_state "
+                        "ORDER BY collection").fetchall()
+    if not rows:
+        print("まだ同期していません。")
+        return
+    for collection, field, count, last_value, synced_at in rows:
+        print(f"{collection:<24} {count:>8} 行  {field} <= {_decode_mark(last_value)}  (同期 {synced_at})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firestore の結果コレクションを SQLite に差分同期する")
+    parser.add_argument("collections", nargs="*", default=list(DEFAULT_COLLECTIONS),
+                        help=f"同期するコレクション (既定: {', '.join(DEFAULT_COLLECTIONS)})")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite のファイル")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="1 回のクエリで読むドキュメント数")
+    parser.add_argument("--stats", action="store_true", help="同期せずに行数と高水位を表示する")
+    parser.add_argument("--sql", help="同期せずに SQL を実行して結果を表示する")
+    parser.add_argument("--credentials", default=DEFAULT_CREDENTIALS, help="サービスアカウントキーの JSON")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        if args.stats:
+            print_stats(conn)
+            return 0
+        if args.sql:
+            cursor = conn.execute(args.sql)
+            print("\t".join(d[0] for d in cursor.description or ()))
+            for row in cursor:
+                print("\t".join("" if v is None else str(v) for v in row))
+            return 0
+
+        unknown = [c for c in args.collections if c not in CHANGE_FIELDS]
+        if unknown:
+            parser.error(f"変更時刻のフィールドが決まっていないコレクションです: {', '.join(unknown)}")
+        db = client(args.credentials)
+        for collection in args.collections:
+            result = sync_collection(db, conn, collection, args.batch_size)
+            print(f"{result['collection']:<24} 今回 {result['rows']:>8} 行 / 合計 {result['total_rows']:>8} 行 "
+                  f"/ {result['seconds']} 秒")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, firestore
+from firestore_trace import trace_client
 
 # Firebase Admin SDKの初期化（1回だけ）
 if not firebase_admin._apps:
@@ -8,7 +9,7 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 
 # Firestoreクライアント取得
-db = firestore.client()
+db = trace_client(firestore.client())
 
 st.title("ユーザー管理画面")
 
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# ==========================================
+# 🔹 起動時ウォームアップ (キャッシュの事前読み込み)
+# ==========================================
+# デプロイ直後やスリープ復帰直後の最初の実行で、GitHub の CSV・ローカル CSV・
+# Firestore クライアントなどのキャッシュを並列に読み込んでおく。
+# プロセスにつき一度だけ実行され、最初の生徒がログイン情報を入力している間に終わる。
+#
+#   start_warmup({"material": lambda: load_material(...), "firestore": init_firestore})
+
+MAX_WORKERS = 8
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_status = {
+    "state": "idle",        # idle / running / ready
+    "started_at": None,
+    "finished_at": None,
+    "sources": {},          # {名前: {"seconds": 秒数, "ok": bool, "error": str | None}}
+}
+
+
+def _run_task(name: str, task: Callable):
+    start = time.perf_counter()
+    error = None
+    try:
+        task()
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _status["sources"][name] = {"seconds": elapsed, "ok": error is None, "error": error}
+
+
+def _run_all(tasks: Dict[str, Callable]):
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, max(len(tasks), 1)), thread_name_prefix="warmup") as pool:
+        for name, task in tasks.items():
+            pool.submit(_run_task, name, task)
+
+    with _lock:
+        _status["state"] = "ready"
+        _status["finished_at"] = time.time()
+        total = _status["finished_at"] - _status["started_at"]
+        sources = dict(_status["sources"])
+    _ready.set()
+
+    print(f"ウォームアップ完了: {len(sources)} 件 / {total:.2f} 秒")
+    for name, info in sorted(sources.items(), key=lambda x: x[1]["seconds"], reverse=True):
+        result = "OK" if info["ok"] else f"失敗 ({info['error']})"
+        print(f"  {info['seconds'] * 1000:8.1f} ms  {name}  {result}")
+
+
+def start_warmup(tasks: Dict[str, Callable]) -> bool:
+    """ウォームアップをバックグラウンドで開始する (プロセスで最初の呼び出しのみ有効)
+
+    開始した場合は True、既に開始済みの場合は False を返す。
+    """
+    with _lock:
+        if _status["state"] != "idle":
+            return False
+        _status["state"] = "running"
+        _status["started_at"] = time.time()
+
+    threading.Thread(target=_run_all, args=(dict(tasks),), name="warmup", daemon=True).start()
+    return True
+
+
+def is_ready() -> bool:
+    """ウォームアップが完了しているか"""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """ウォームアップの完了を待つ (timeout 秒で打ち切り)"""
+    return _ready.wait(timeout)
+
+
+def warmup_status() -> dict:
+    """ウォームアップの状態と読み込み元ごとの所要時間"""
+    with _lock:
+        status = dict(_status)
+        status["sources"] = {name: dict(info) for name, info in _status["sources"].items()}
+    return status